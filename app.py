@@ -3,19 +3,40 @@
 #----------------------------------------------------------------------------#
 
 import json
+import base64
+import hashlib
+import functools
 import dateutil.parser
 import babel
 import sys
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify
+import itertools
+import sqlite3
+import csv
+import io
+import zlib
+import click
+import calendar
+import re
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify, stream_with_context, make_response, session
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from flask_wtf import FlaskForm
 from forms import *
 from flask_migrate import Migrate
-from datetime import datetime
+from werkzeug.utils import import_string
+from werkzeug.exceptions import HTTPException
+from werkzeug.datastructures import MultiDict
+from datetime import datetime, timedelta
+from collections import namedtuple
+from instrumentation import RequestMetrics, QueryDiagnostics
+from routing import RoutingSQLAlchemy, DatabaseRouter, reads_from_replica, reads_from_primary, bind_engine_options
+from pages import default_artist_image_link, requested_page_size, page_url_values, \
+  is_not_modified, set_validators, recording_page, page_cache_key, page_last_modified, tag_page, \
+  venue_page, artist_page
 
 #----------------------------------------------------------------------------#
 # App Config.
@@ -24,11 +45,16 @@ from datetime import datetime
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
+db = RoutingSQLAlchemy(app)
 migrate = Migrate(app, db)
+search_cache = import_string(app.config['SEARCH_CACHE_BACKEND'])(
+  maxsize=app.config['SEARCH_CACHE_SIZE'], ttl=app.config['SEARCH_CACHE_TTL'])
+page_cache = import_string(app.config['PAGE_CACHE_BACKEND'])(
+  maxsize=app.config['PAGE_CACHE_SIZE'], ttl=app.config['PAGE_CACHE_TTL'])
+request_metrics = RequestMetrics(app)
+query_diagnostics = QueryDiagnostics(app)
+database_router = DatabaseRouter(app)
 
-default_artist_image_link = 'https://images.unsplash.com/photo-1569437061238-3cf61084f487?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=634&q=80'
-default_venue_image_link = 'https://assets.entrepreneur.com/content/3x2/2000/20190705133921-shutterstock-208432186.jpeg?width=700&crop=2:1'
 
 #----------------------------------------------------------------------------#
 # Models.
@@ -38,9 +64,42 @@ class Show(db.Model):
     __tablename__ = 'shows'
 
     id = db.Column(db.Integer, primary_key=True)
-    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'), nullable=False)
-    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
+    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'), nullable=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id', ondelete='CASCADE'), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+    __mapper_args__ = {'version_id_col': version}
+
+    # serve the per-venue and per-artist past/upcoming queries from an index
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+        db.Index('ix_shows_updated_at', 'updated_at'),
+    )
+
+class Genre(db.Model):
+    __tablename__ = 'genres'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+# Genre links; the (genre_id, entity_id) indexes answer "all venues/artists
+# of a genre" without touching the other rows
+venue_genres = db.Table('venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('venues.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_venue_genres_genre_id_venue_id', 'genre_id', 'venue_id'),
+)
+
+artist_genres = db.Table('artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_artist_genres_genre_id_artist_id', 'genre_id', 'artist_id'),
+)
 
 class Venue(db.Model):
     __tablename__ = 'venues'
@@ -56,8 +115,21 @@ class Venue(db.Model):
     website = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
-    genres = db.Column(db.String(120))
-    shows = db.relationship("Show", backref=db.backref('venue', lazy=True))
+    genres = db.relationship("Genre", secondary=venue_genres, order_by=Genre.name)
+    shows = db.relationship("Show", backref=db.backref('venue', lazy=True), passive_deletes=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+    __mapper_args__ = {'version_id_col': version}
+
+    __table_args__ = (
+        db.Index('ix_venues_updated_at', 'updated_at'),
+        db.Index('ix_venues_name_id', 'name', 'id'),
+        # the venues page's areas, see VENUE_AREA
+        db.Index('ix_venues_area_name_id', db.func.coalesce(state, ''), db.func.coalesce(city, ''), name, id),
+        # shows filtered by city find the city's venues through this index
+        db.Index('ix_venues_city', 'city'),
+    )
 
 class Artist(db.Model):
     __tablename__ = 'artists'
@@ -67,33 +139,674 @@ class Artist(db.Model):
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.relationship("Genre", secondary=artist_genres, order_by=Genre.name)
     image_link = db.Column(db.String(500))
     venue_image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
-    shows = db.relationship("Show", backref=db.backref('artist', lazy=True))
+    shows = db.relationship("Show", backref=db.backref('artist', lazy=True), passive_deletes=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+    __mapper_args__ = {'version_id_col': version}
+
+    __table_args__ = (
+        db.Index('ix_artists_updated_at', 'updated_at'),
+        db.Index('ix_artists_name_id', 'name', 'id'),
+    )
+
+# Changing only the genre links of a venue or artist does not UPDATE its row,
+# so touch the row to move updated_at and version all the same
+@db.event.listens_for(db.session, 'before_flush')
+def touch_genre_changes(session, flush_context, instances):
+  for obj in session.dirty:
+    if isinstance(obj, (Venue, Artist)) and db.inspect(obj).attrs.genres.history.has_changes():
+      obj.updated_at = datetime.utcnow()
+
+# Deleting a venue or artist removes its shows and genre links through ON
+# DELETE CASCADE, which SQLite only enforces when each connection asks for it
+@db.event.listens_for(Engine, 'connect')
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+  if isinstance(dbapi_connection, sqlite3.Connection):
+    dbapi_connection.execute('PRAGMA foreign_keys = ON')
+
+# Substring search on names is served by pg_trgm GIN indexes on PostgreSQL.
+# They are created there only: on other databases they would be plain
+# indexes duplicating ix_*_name_id. SQLite has no trigram operator class, so
+# there each table gets an FTS5 trigram index over its names, kept in sync by
+# triggers, when the database is created with SQLite 3.34 or later.
+SQLITE_TRIGRAM = sqlite3.sqlite_version_info >= (3, 34, 0)
+
+def sqlite_name_search_ddl(table):
+  fts = table + '_name_fts'
+  return [
+    "CREATE VIRTUAL TABLE %s USING fts5(name, content='%s', content_rowid='id', tokenize='trigram')" % (fts, table),
+    "CREATE TRIGGER %s_ai AFTER INSERT ON %s BEGIN "
+    "INSERT INTO %s(rowid, name) VALUES (new.id, new.name); END" % (fts, table, fts),
+    "CREATE TRIGGER %s_ad AFTER DELETE ON %s BEGIN "
+    "INSERT INTO %s(%s, rowid, name) VALUES ('delete', old.id, old.name); END" % (fts, table, fts, fts),
+    "CREATE TRIGGER %s_au AFTER UPDATE OF name ON %s BEGIN "
+    "INSERT INTO %s(%s, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO %s(rowid, name) VALUES (new.id, new.name); END" % (fts, table, fts, fts, fts),
+  ]
+
+def on_sqlite_with_trigram(ddl, target, bind, **kw):
+  return bind.dialect.name == 'sqlite' and SQLITE_TRIGRAM
+
+db.event.listen(db.metadata, 'before_create', db.DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
+for table in (Venue.__table__, Artist.__table__):
+  db.event.listen(table, 'after_create', db.DDL(
+    'CREATE INDEX ix_%s_name_trgm ON %s USING gin (name gin_trgm_ops)' % (table.name, table.name)).execute_if(dialect='postgresql'))
+  for statement in sqlite_name_search_ddl(table.name):
+    db.event.listen(table, 'after_create', db.DDL(statement).execute_if(callable_=on_sqlite_with_trigram))
+  db.event.listen(table, 'after_drop', db.DDL('DROP TABLE IF EXISTS %s_name_fts' % table.name).execute_if(dialect='sqlite'))
+
+# Whether searches on `engine` go through the FTS5 tables. That depends on
+# the SQLite the database was created or migrated with, not the one serving
+# it, so it is looked up in the schema, once per engine (and again after
+# create_all or drop_all).
+name_fts_engines = {}
+
+def has_name_fts(engine):
+  if engine not in name_fts_engines:
+    name_fts_engines[engine] = engine.dialect.name == 'sqlite' \
+      and all(db.inspect(engine).has_table(table + '_name_fts') for table in ('venues', 'artists'))
+  return name_fts_engines[engine]
+
+for schema_event in ('after_create', 'after_drop'):
+  db.event.listen(db.metadata, schema_event, lambda target, bind, **kw: name_fts_engines.pop(bind.engine, None))
+
+# On PostgreSQL a venue or an artist cannot be booked twice at once: an
+# exclusion constraint (over a GiST index, with btree_gist for the ids)
+# rejects overlapping shows even when two bookings race. Other databases rely
+# on the check in book_show.
+def show_overlap_ddl(column):
+  return "ALTER TABLE shows ADD CONSTRAINT shows_%s_no_overlap EXCLUDE USING gist " \
+    "(%s WITH =, tsrange(start_time, end_time) WITH &&)" % (column, column)
+
+db.event.listen(db.metadata, 'before_create', db.DDL('CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql'))
+for column in ('venue_id', 'artist_id'):
+  db.event.listen(Show.__table__, 'after_create', db.DDL(show_overlap_ddl(column)).execute_if(dialect='postgresql'))
+
+#----------------------------------------------------------------------------#
+# Row records.
+#----------------------------------------------------------------------------#
+
+# List pages select only the columns they render and keep them in these
+# fixed-layout records instead of hydrating full ORM entities per row.
+class ShowTile(object):
+  __slots__ = ('id', 'venue_id', 'venue_name', 'artist_id', 'artist_name', 'artist_image_link', 'start_time')
+
+  def __init__(self, row):
+    self.id = row.id
+    self.venue_id = row.venue_id
+    self.venue_name = row.venue_name
+    self.artist_id = row.artist_id
+    self.artist_name = row.artist_name
+    self.artist_image_link = row.artist_image_link or default_artist_image_link
+    self.start_time = row.start_time
+
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+
+# Read helpers are split into a *_query function that builds the query and
+# one that runs it (or a *_from/*_result one that reads its rows), so the
+# async views in async_app.py await exactly the same statements.
+
+# Columns rendered by a show tile, with the venue and artist joined in
+def show_tiles_query():
+  return db.session.query(
+    Show.id, Show.start_time, Show.venue_id, Venue.name.label('venue_name'),
+    Show.artist_id, Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link')
+  ).join(Venue, Venue.id == Show.venue_id).join(Artist, Artist.id == Show.artist_id)
+
+# Restrict a show query to the shows starting in [start, end) and, when
+# given, to one venue, one artist or the venues of one city. The start time
+# range is read from ix_shows_start_time_id, or from the (venue_id,
+# start_time) or (artist_id, start_time) index when a venue or an artist is
+# given. `query` must join Venue for the city filter, as show_tiles_query does.
+def filter_shows(query, start=None, end=None, venue_id=None, artist_id=None, city=None):
+  if start is not None:
+    query = query.filter(Show.start_time >= start)
+  if end is not None:
+    query = query.filter(Show.start_time < end)
+  if venue_id is not None:
+    query = query.filter(Show.venue_id == venue_id)
+  if artist_id is not None:
+    query = query.filter(Show.artist_id == artist_id)
+  if city:
+    query = query.filter(Venue.city == city)
+  return query
+
+DATE_ONLY = re.compile(r'^\s*\d{4}-\d{1,2}-\d{1,2}\s*$')
+
+# The filter_shows arguments of ?from=, ?to=, ?venue_id=, ?artist_id= and
+# ?city= in `args`. Raises ValueError, saying which, on a malformed time or id.
+def show_filters(args):
+  start, end = date_range(args)
+  try:
+    venue_id = int(args['venue_id']) if args.get('venue_id') else None
+    artist_id = int(args['artist_id']) if args.get('artist_id') else None
+  except ValueError:
+    raise ValueError('venue_id and artist_id must be integers')
+  return {
+    'start': start,
+    'end': end,
+    'venue_id': venue_id,
+    'artist_id': artist_id,
+    'city': args.get('city') or None
+  }
+
+# The ?from= and ?to= times in `args`, None when missing. Times are dates or
+# datetimes; a `to` date includes that whole day, so
+# ?from=2026-10-17&to=2026-10-18 is a weekend.
+def date_range(args):
+  start, end = args.get('from'), args.get('to')
+  try:
+    start = dateutil.parser.parse(start) if start else None
+    if end:
+      end_date = DATE_ONLY.match(end)
+      end = dateutil.parser.parse(end)
+      if end_date:
+        end += timedelta(days=1)
+  except (ValueError, OverflowError):
+    raise ValueError('from and to must be dates or datetimes')
+  return start, end or None
+
+# The first `per_day` shows of each day a show query finds, ranked in SQL
+# so a busy month does not send every one of its shows
+def shows_per_day_query(query, per_day):
+  day_rank = db.func.row_number().over(partition_by=show_day(), order_by=(Show.start_time, Show.id))
+  ranked = query.add_columns(day_rank.label('day_rank')).subquery()
+  return db.session.query(ranked).filter(ranked.c.day_rank <= per_day).order_by(ranked.c.start_time, ranked.c.id)
+
+# The number of shows of each day a show query finds, as {date: count}
+def day_counts(query):
+  return dict(query.with_entities(show_day(), db.func.count(Show.id)).group_by(show_day()))
+
+def show_day():
+  return db.func.date(Show.start_time, type_=db.Date)
+
+# The coming (or current) Saturday and Sunday
+def weekend_of(today):
+  saturday = today + timedelta(days=5 - today.weekday())
+  return saturday, saturday + timedelta(days=1)
+
+# Columns rendered by the artist list
+def artist_items_query():
+  return db.session.query(Artist.id, Artist.name)
+
+# Count the upcoming and past shows of a venue or artist against a single
+# "now", and find when the list of them last changed: the latest write to one
+# of the shows or the counterparts they are joined with, or the latest start
+# of a show that has since moved from upcoming to past
+def show_stats(entity_column, entity_id, counterpart, now):
+  return show_stats_from(show_stats_query(entity_column, entity_id, counterpart, now).one())
+
+def show_stats_query(entity_column, entity_id, counterpart, now):
+  upcoming = db.func.coalesce(db.func.sum(db.case((Show.start_time > now, 1), else_=0)), 0)
+  past = db.func.coalesce(db.func.sum(db.case((Show.start_time <= now, 1), else_=0)), 0)
+  started = db.func.max(db.case((Show.start_time <= now, Show.start_time)))
+  return db.session.query(upcoming, past, db.func.max(Show.updated_at), db.func.max(counterpart.updated_at), started) \
+    .join(counterpart).filter(entity_column == entity_id)
+
+def show_stats_from(row):
+  return row[0], row[1], latest(*row[2:])
+
+# The most recent of the given times, ignoring missing ones
+def latest(*times):
+  times = [time for time in times if time is not None]
+  return max(times) if times else None
+
+# Last-Modified time and a weak ETag for a list page, from the newest
+# updated_at (an index lookup) and the row count of each table it shows
+def list_validators(*models):
+  return list_validators_from(list_validators_query(*models).one(), request.full_path)
+
+def list_validators_query(*models):
+  columns = []
+  for model in models:
+    columns.append(db.session.query(db.func.max(model.updated_at)).scalar_subquery())
+    columns.append(db.session.query(db.func.count(model.id)).scalar_subquery())
+  return db.session.query(*columns)
+
+def list_validators_from(row, full_path):
+  etag = hashlib.sha1(repr((full_path,) + tuple(row)).encode()).hexdigest()
+  return latest(*row[0::2]), etag
+
+# Fetch one section (upcoming or past) of a venue's or artist's shows together
+# with the counterpart columns the page renders. Upcoming shows are ordered
+# soonest first and past shows latest first, optionally capped at `limit` rows.
+def show_section(entity_column, entity_id, counterpart, columns, now, upcoming, limit=None):
+  return show_section_query(entity_column, entity_id, counterpart, columns, now, upcoming, limit).all()
+
+def show_section_query(entity_column, entity_id, counterpart, columns, now, upcoming, limit=None):
+  query = db.session.query(Show.start_time, *columns).join(counterpart).filter(entity_column == entity_id)
+  if upcoming:
+    query = query.filter(Show.start_time > now).order_by(Show.start_time.asc(), Show.id.asc())
+  else:
+    query = query.filter(Show.start_time <= now).order_by(Show.start_time.desc(), Show.id.desc())
+  if limit:
+    query = query.limit(limit)
+  return query
+
+# Genre rows for the given names, creating the ones that do not exist yet
+def genres_from_names(names):
+  names = list(dict.fromkeys(name for name in names if name))
+  if not names:
+    return []
+  genres = dict((genre.name, genre) for genre in Genre.query.filter(Genre.name.in_(names)))
+  for name in names:
+    if name not in genres:
+      genres[name] = Genre(name=name)
+      db.session.add(genres[name])
+  return [genres[name] for name in names]
+
+# Restrict a venue or artist query to one genre through the genre link index
+def filter_genre(query, genres_relationship, genre):
+  if genre:
+    query = query.join(genres_relationship).filter(Genre.name == genre)
+  return query
+
+# Genre names of the given venues or artists, by id
+def genre_names(link_column, ids):
+  names = {}
+  for entity_id, name in genre_names_query(link_column, ids):
+    names.setdefault(entity_id, []).append(name)
+  return names
+
+def genre_names_query(link_column, ids):
+  return db.session.query(link_column, Genre.name).join(Genre, Genre.id == link_column.table.c.genre_id) \
+    .filter(link_column.in_(ids)).order_by(Genre.name)
+
+# Columns of a venue or artist an edit may change, and the link column of
+# its genres
+EDITABLE = {
+  Venue: (('name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link', 'website',
+    'seeking_talent', 'seeking_description'), venue_genres.c.venue_id),
+  Artist: (('name', 'city', 'state', 'phone', 'image_link', 'venue_image_link', 'facebook_link', 'website',
+    'seeking_venue', 'seeking_description'), artist_genres.c.artist_id)
+}
+
+class VersionConflict(Exception):
+  pass
+
+# Apply an edit to a venue or artist in place. Only the columns whose value
+# differs are written, in one UPDATE guarded by the version the editor
+# loaded, so a concurrent edit raises VersionConflict instead of being
+# silently overwritten. `genres` (a list of names) replaces the genre links
+# when given. Returns the row's version after the edit, or None if the row
+# does not exist. The caller commits.
+def update_versioned(model, entity_id, version, values, genres=None):
+  columns, link_column = EDITABLE[model]
+  table = model.__table__
+  current = db.session.query(*[table.c[name] for name in columns + ('version',)]) \
+    .filter(table.c.id == entity_id).first()
+  if current is None:
+    return None
+  if version is None:
+    version = current.version
+  changes = dict((name, value) for name, value in values.items() if getattr(current, name) != value)
+  if genres is not None:
+    genres = list(dict.fromkeys(genres))
+    if genres == genre_names(link_column, [entity_id]).get(entity_id, []):
+      genres = None
+  if not changes and genres is None and version == current.version:
+    return version
+
+  changes['version'] = table.c.version + 1
+  result = db.session.execute(table.update().where(table.c.id == entity_id).where(table.c.version == version)
+    .values(**changes))
+  if result.rowcount != 1:
+    raise VersionConflict()
+  if genres is not None:
+    genres = genres_from_names(genres)
+    db.session.flush()
+    db.session.execute(link_column.table.delete().where(link_column == entity_id))
+    if genres:
+      db.session.execute(link_column.table.insert(), [{link_column.key: entity_id, 'genre_id': genre.id} for genre in genres])
+  return version + 1
+
+# Delete venues or artists by id in a single statement; their shows and
+# genre links go with them through ON DELETE CASCADE. The artists or venues
+# they had shows with are touched first, as their pages list those shows.
+# Returns the number of rows deleted. The caller commits.
+def delete_entities(model, ids):
+  entity_column, counterpart, counterpart_column = {
+    Venue: (Show.venue_id, Artist, Show.artist_id),
+    Artist: (Show.artist_id, Venue, Show.venue_id)
+  }[model]
+  counterpart.query.filter(counterpart.id.in_(db.session.query(counterpart_column).filter(entity_column.in_(ids)))) \
+    .update({counterpart.updated_at: datetime.utcnow(), counterpart.version: counterpart.version + 1}, synchronize_session=False)
+  return model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+
+# Shows of a venue or an artist overlapping [start, end). Only shows starting
+# less than MAX_SHOW_MINUTES before `start` can reach into it, so this reads a
+# bounded range of the (venue_id, start_time) or (artist_id, start_time)
+# index however many shows are booked.
+def overlapping_shows_query(entity_column, entity_id, start, end):
+  query = db.session.query(Show.id, Show.start_time, Show.end_time).filter(entity_column == entity_id)
+  return filter_overlapping(query, start, end)
+
+# The same for several venues or artists at once, with the venue or artist id
+# of each show: one bounded index range per id, in a single query
+def overlapping_bookings_query(entity_column, entity_ids, start, end):
+  query = db.session.query(entity_column, Show.start_time, Show.end_time).filter(entity_column.in_(entity_ids))
+  return filter_overlapping(query, start, end)
+
+def filter_overlapping(query, start, end):
+  return query.filter(Show.start_time > start - timedelta(minutes=MAX_SHOW_MINUTES), Show.start_time < end) \
+    .filter(Show.end_time > start)
+
+class BookingError(Exception):
+  def __init__(self, messages, status):
+    Exception.__init__(self, *messages)
+    self.messages = messages
+    self.status = status
+
+# Add a show once its venue and artist are known to exist and to be free for
+# its whole duration; raises BookingError saying why not otherwise (404 for a
+# missing venue or artist, 409 for a clash). The caller commits.
+def book_show(artist_id, venue_id, start_time, minutes):
+  if not 0 < minutes <= MAX_SHOW_MINUTES:
+    raise BookingError(['A show lasts between 1 and %d minutes.' % MAX_SHOW_MINUTES], 400)
+  end_time = start_time + timedelta(minutes=minutes)
+  missing = []
+  for label, model, entity_id in (('venue', Venue, venue_id), ('artist', Artist, artist_id)):
+    if db.session.query(model.id).filter(model.id == entity_id).first() is None:
+      missing.append('There is no %s %s.' % (label, entity_id))
+  if missing:
+    raise BookingError(missing, 404)
+  clashes = []
+  for label, column, entity_id in (('venue', Show.venue_id, venue_id), ('artist', Show.artist_id, artist_id)):
+    clash = overlapping_shows_query(column, entity_id, start_time, end_time).order_by(Show.start_time).first()
+    if clash is not None:
+      clashes.append('The %s is already booked from %s to %s.' % (
+        label, format_datetime(clash.start_time, 'full'), format_datetime(clash.end_time, 'full')))
+  if clashes:
+    raise BookingError(clashes, 409)
+  show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time, end_time=end_time)
+  db.session.add(show)
+  try:
+    db.session.flush()
+  except IntegrityError as e:
+    # the exclusion constraint caught a booking made since the check
+    if getattr(e.orig, 'pgcode', None) == '23P01':
+      raise BookingError(['The venue or the artist was booked at that time meanwhile.'], 409)
+    raise
+  return show
+
+# Gaps of at least `minutes` between the shows of a venue in [start, end), as
+# (start, end) pairs, from one bounded range scan of its shows
+def free_slots(venue_id, start, end, minutes):
+  slots = []
+  free_from = start
+  for show in overlapping_shows_query(Show.venue_id, venue_id, start, end).order_by(Show.start_time):
+    if show.start_time - free_from >= timedelta(minutes=minutes):
+      slots.append((free_from, show.start_time))
+    free_from = max(free_from, show.end_time)
+  if end - free_from >= timedelta(minutes=minutes):
+    slots.append((free_from, end))
+  return slots
+
+# Check values against a form's validators as if they had been submitted.
+# Blank optional fields are not checked. With partial=True a missing required
+# field is not an error, but one sent as None or blank still is.
+def form_errors(form_class, values, partial=False):
+  data = MultiDict()
+  for name, value in values.items():
+    for item in (value if isinstance(value, list) else [value]):
+      if item is not None:
+        data.add(name, str(item))
+  form = form_class(formdata=data, meta={'csrf': False})
+  form.validate()
+  return form, dict((name, messages) for name, messages in form.errors.items()
+    if data.get(name) or (form[name].flags.required and (name in values or not partial)))
+
+# Case-insensitive partial match on a venue or artist name, using the name
+# index of the database the query runs on (by default the one the session
+# routes reads to)
+def name_matches(model, search_term, engine=None):
+  pattern = '%' + search_term + '%'
+  if has_name_fts(engine or db.session.get_bind()):
+    fts = db.table(model.__tablename__ + '_name_fts', db.column('rowid'), db.column('name'))
+    return model.id.in_(db.select(fts.c.rowid).where(fts.c.name.like(pattern)))
+  return model.name.ilike(pattern)
+
+# Search venues or artists by name, returning the total number of matches and
+# the first SEARCH_RESULT_LIMIT of them from a single query
+def search_by_name(model, search_term):
+  return search_results(search_query(model, search_term).all())
+
+def search_query(model, search_term, engine=None):
+  total = db.func.count().over().label('total')
+  return db.session.query(model.id, model.name, total).filter(name_matches(model, search_term, engine)) \
+    .order_by(model.name, model.id).limit(app.config['SEARCH_RESULT_LIMIT'])
+
+def search_results(rows):
+  num_results = rows[0].total if rows else 0
+  return num_results, [{"id": row.id, "name": row.name} for row in rows]
+
+# Search terms differing only in case or spacing share one cache entry
+def normalize_search_term(search_term):
+  return ' '.join(search_term.split()).lower()
+
+def search_cache_key(model, search_term):
+  return (model.__tablename__, search_term)
+
+# search_by_name through the search cache, keyed on entity type and term
+def cached_search(model, search_term):
+  search_term = normalize_search_term(search_term)
+  key = search_cache_key(model, search_term)
+  result = search_cache.get(key)
+  if result is None:
+    result = search_by_name(model, search_term)
+    if not database_router.may_be_stale():
+      search_cache.set(key, result)
+  return result
+
+# The (state, city) of a venue's area. Venues without a city or state are
+# grouped under '', since a NULL key would never match the area it came from.
+VENUE_AREA = (db.func.coalesce(Venue.state, '').label('state'), db.func.coalesce(Venue.city, '').label('city'))
+
+# City/state areas with their venue counts, for paging through in (state,
+# city) order
+def venue_areas_query(genre=None):
+  query = db.session.query(*VENUE_AREA, db.func.count(Venue.id).label('venue_count'))
+  return filter_genre(query, Venue.genres, genre).group_by(*VENUE_AREA)
+
+# Venues of the given city/state areas ordered by area, optionally keeping
+# only the first `top` venues (by name) of each area
+def venues_in_areas_query(areas, top=None, genre=None):
+  in_areas = db.tuple_(*VENUE_AREA).in_([(area.state, area.city) for area in areas])
+  if not top:
+    query = db.session.query(Venue.id, Venue.name, *VENUE_AREA).filter(in_areas)
+    return filter_genre(query, Venue.genres, genre).order_by(*VENUE_AREA, Venue.name, Venue.id)
+  area_rank = db.func.row_number().over(partition_by=VENUE_AREA, order_by=(Venue.name, Venue.id))
+  ranked = db.session.query(Venue.id, Venue.name, *VENUE_AREA, area_rank.label('area_rank')).filter(in_areas)
+  ranked = filter_genre(ranked, Venue.genres, genre).subquery()
+  return db.session.query(ranked.c.id, ranked.c.name, ranked.c.city, ranked.c.state) \
+    .filter(ranked.c.area_rank <= top) \
+    .order_by(ranked.c.state, ranked.c.city, ranked.c.name, ranked.c.id)
+
+# Group venue rows (ordered by state, city) into the areas of the venues page
+# lazily, so the template renders one area while the next is still being read
+def group_areas(areas, venues):
+  venue_counts = dict(((area.state, area.city), area.venue_count) for area in areas)
+  for (state, city), area_venues in itertools.groupby(venues, key=lambda venue: (venue.state, venue.city)):
+    yield {
+      "city": city,
+      "state": state,
+      "venue_count": venue_counts[(state, city)],
+      "venues": area_venues
+    }
+
+# A page of rows plus the cursors pointing at its neighbours (None at either end)
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor'])
+
+# Encode the sort key of a row as an opaque, url-safe pagination cursor
+def encode_cursor(row, sort_columns):
+  values = []
+  for column in sort_columns:
+    value = getattr(row, column.key)
+    if isinstance(value, datetime):
+      value = value.isoformat()
+    values.append(value)
+  return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor, sort_columns):
+  values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+  if len(values) != len(sort_columns):
+    raise ValueError('malformed cursor')
+  for i, column in enumerate(sort_columns):
+    if isinstance(column.type, db.DateTime):
+      values[i] = datetime.fromisoformat(values[i])
+    elif values[i] is None and is_nullable_text(column):
+      values[i] = ''
+  return values
+
+def is_nullable_text(column):
+  return getattr(column, 'nullable', False) and isinstance(column.type, db.String)
+
+# The sort key the pages seek on. A NULL in a row-value comparison makes it
+# NULL, which would drop every row after a cursor holding one, so nullable
+# text columns sort and seek as ''.
+def sort_keys(sort_columns):
+  return [db.func.coalesce(column, '') if is_nullable_text(column) else column for column in sort_columns]
+
+# Keyset pagination: seek past the sort key in the cursor instead of using
+# OFFSET, so every page costs one index range scan no matter how deep it is.
+# `sort_columns` must end with a unique column (the id) to make the order total.
+def keyset_page(query, sort_columns, after=None, before=None, page_size=20):
+  rows = keyset_query(query, sort_columns, after, before, page_size).all()
+  return keyset_result(rows, sort_columns, after, before, page_size)
+
+# The query of a keyset page: one row more than the page holds, to tell
+# whether there is another page after it
+def keyset_query(query, sort_columns, after=None, before=None, page_size=20):
+  keys = sort_keys(sort_columns)
+  if before:
+    query = query.filter(db.tuple_(*keys) < db.tuple_(*decode_cursor(before, sort_columns)))
+    query = query.order_by(*[key.desc() for key in keys])
+  else:
+    if after:
+      query = query.filter(db.tuple_(*keys) > db.tuple_(*decode_cursor(after, sort_columns)))
+    query = query.order_by(*[key.asc() for key in keys])
+  return query.limit(page_size + 1)
+
+def keyset_result(rows, sort_columns, after=None, before=None, page_size=20):
+  has_more = len(rows) > page_size
+  rows = rows[:page_size]
+  if before:
+    rows.reverse()
+
+  next_cursor = prev_cursor = None
+  if rows:
+    if has_more or before:
+      next_cursor = encode_cursor(rows[-1], sort_columns)
+    if after or (before and has_more):
+      prev_cursor = encode_cursor(rows[0], sort_columns)
+  return Page(rows, next_cursor, prev_cursor)
+
+# Page size for list pages, configurable with PAGE_SIZE and ?per_page=N
+def page_size():
+  return requested_page_size(request.args, app.config)
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma"
+}
+
+# Babel pattern and locale objects are built once per format and locale
+# instead of on every call
+@functools.lru_cache(maxsize=64)
+def datetime_pattern(format):
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+
+@functools.lru_cache(maxsize=16)
+def datetime_locale(locale):
+  return babel.Locale.parse(locale)
+
+# A page lists the same few start times over and over, so formatted values
+# are kept in a bounded LRU
+@functools.lru_cache(maxsize=app.config['DATETIME_FILTER_CACHE_SIZE'])
+def format_datetime_cached(value, format, locale):
+  return datetime_pattern(format).apply(value, datetime_locale(locale))
+
+def format_datetime(value, format='medium', locale=None):
+  # strings are still accepted, but handlers should pass datetimes
+  if isinstance(value, str):
+    value = dateutil.parser.parse(value)
+  return format_datetime_cached(value, format, locale or babel.dates.LC_TIME)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+# Link to another page of the current list, keeping any other query arguments
+@app.template_global()
+def page_url(**cursor):
+  return url_for(request.endpoint, **page_url_values(request.args, request.view_args, cursor))
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
+# Render a template as a stream of chunks instead of one string
+def stream_template(template_name, **context):
+  app.update_template_context(context)
+  stream = app.jinja_env.get_template(template_name).stream(context)
+  stream.enable_buffering(5)
+  return request_metrics.timed_stream(stream)
+
+# A bodiless 304 when the request's If-Modified-Since (or If-None-Match, given
+# an `etag`) shows the client already has the current page, else None. Lets
+# a view skip rendering once it knows when its data last changed.
+def not_modified_response(last_modified, etag=None, weak=False):
+  if not is_not_modified(request.environ, request.if_none_match, last_modified, etag):
+    return None
+  return set_validators(Response(status=304), last_modified, etag, weak)
+
+# Cache the rendered page of a detail view and serve it with a strong ETag,
+# answering If-None-Match with 304. While rendering, the view records the rows
+# the page is built from and how long it stays current (see pages.py). Pages
+# carrying flashed messages are neither served from nor stored in the cache.
+def cached_page(view):
+  @functools.wraps(view)
+  def wrapper(*args, **kwargs):
+    if session.get('_flashes'):
+      return view(*args, **kwargs)
+    key = page_cache_key(request.full_path)
+    page = page_cache.get(key)
+    if page is None:
+      with recording_page() as record:
+        response = make_response(view(*args, **kwargs))
+      if response.status_code != 200:
+        return response
+      page = record.entry(response.get_data(), response.mimetype)
+      if not database_router.may_be_stale():
+        page_cache.set(key, page, ttl=record.ttl(app.config['PAGE_CACHE_TTL']), tags=record.tags)
+    body, etag, mimetype, last_modified = page
+    response = not_modified_response(last_modified, etag)
+    if response is None:
+      response = set_validators(Response(body, mimetype=mimetype), last_modified, etag)
+    return response
+  return wrapper
+
+# Drop the cached searches and pages built from a venue or an artist
+def invalidate_venue(venue_id):
+  search_cache.clear('venues')
+  page_cache.invalidate_tags('venue:%s' % venue_id)
+
+def invalidate_artist(artist_id):
+  search_cache.clear('artists')
+  page_cache.invalidate_tags('artist:%s' % artist_id)
+
 @app.route('/')
 def index():
   return render_template('pages/home.html')
@@ -104,54 +817,41 @@ def index():
 # Display a list of venues
 @app.route('/venues')
 def venues():
-  data = []
-  venue_cities = {}
   error = False
+  top = request.args.get('top', app.config.get('VENUES_PER_AREA'), type=int)
+  genre = request.args.get('genre')
   try:
-    venues = Venue.query.with_entities(Venue.id, Venue.name, Venue.city, Venue.state).all()
-
-    # Get a list of cities per city and state and group the venues
-    for venue in venues:
-      city_state = venue.city + ',' + venue.state
-      if not city_state in venue_cities:
-        venue_cities[city_state]=[]
-      venue_cities[city_state].append(venue)
-
-    # Format city, state and venues value in a way that is served as data
-    for key in venue_cities.keys():
-      city_state = key.split(',')
-      city_venue= {
-        "city":city_state[0],
-        "state":city_state[1],
-        "venues":venue_cities[key]
-      }
-      data.append(city_venue)
+    last_modified, etag = list_validators(Venue)
+    response = not_modified_response(last_modified, etag, weak=True)
+    if response is not None:
+      return response
+
+    # page through the city/state areas in (state, city) index order, counting
+    # each area's venues on the way
+    page = keyset_page(venue_areas_query(genre), VENUE_AREA, request.args.get('after'), request.args.get('before'), page_size())
+    venues = venues_in_areas_query(page.items, top, genre).yield_per(100) if page.items else []
   except:
     error = True
     db.session.rollback()
+    db.session.close()
     print(sys.exc_info())
-  finally:
-      db.session.close()
   if error:
     return abort(400)
-  else:  
-    return render_template('pages/venues.html', areas=data)
+  else:
+    # the page's venues are read and rendered one area at a time
+    areas = group_areas(page.items, venues)
+    response = Response(stream_with_context(stream_template('pages/venues.html', areas=areas, page=page)))
+    return set_validators(response, last_modified, etag, weak=True)
 
 @app.route('/venues/search', methods=['POST'])
+@reads_from_replica
 def search_venues():
   data = []
   error = False
   try:
     # Implement search on venues with partial string search. Ensure it is case-insensitive.
     search_term = request.form.get('search_term')
-    search_results = Venue.query.filter(Venue.name.ilike("%" + search_term + "%"))
-    num_results = search_results.count()
-    for result in search_results:
-        data_item = {
-        "id": result.id,
-        "name": result.name,
-        }
-        data.append(data_item)
+    num_results, data = cached_search(Venue, search_term)
 
     response = {
       "count": num_results,
@@ -170,64 +870,30 @@ def search_venues():
 
 # Display the sepicified venue page
 @app.route('/venues/<int:venue_id>')
+@cached_page
 def show_venue(venue_id):
-  upcoming_shows_count = 0
-  past_shows_count = 0
-  upcoming_shows = []
-  past_shows = []
   data = {}
   error = False
+  now = datetime.utcnow()
+  limit = request.args.get('limit', app.config.get('SHOWS_PER_SECTION'), type=int)
   try:
     venue = Venue.query.get(venue_id)
-    shows = venue.shows
-    for show in shows:
-      # upcoming shows
-      if show.start_time > datetime.utcnow(): 
-        upcoming_shows_count += 1
-        artist = show.artist
-        upcoming_shows_item = {
-          "artist_id": artist.id,
-          "artist_name": artist.name,
-          "artist_image_link": artist.image_link or default_artist_image_link,
-          "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-        }
-        upcoming_shows.append(upcoming_shows_item)
-      else:
-        # caculate past shows
-        past_shows_count += 1
-        artist = show.artist
-        past_shows_item = {
-          "artist_id": artist.id,
-          "artist_name": artist.name,
-          "artist_image_link": artist.image_link or default_artist_image_link,
-          "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-        }
-        past_shows.append(past_shows_item)
-
-  # need to format the genres valune obtained from DB into a list of genres
-    genres_list = []
-    new_genres = venue.genres[1:-1].split(",")
-    for genre in new_genres:
-        genres_list.append(genre)
-
-    data = {
-      "id": venue_id,
-      "name": venue.name,
-      "city": venue.city,
-      "state": venue.state,
-      "phone": venue.phone,
-      "address": venue.address,
-      "genres": genres_list,
-      "website": venue.website,
-      "facebook_link": venue.facebook_link,
-      "seeking_talent": venue.seeking_talent,
-      "seeking_description": venue.seeking_description,
-      "image_link": venue.image_link or default_venue_image_link,
-      "past_shows": past_shows,
-      "upcoming_shows": upcoming_shows,
-      "past_shows_count": past_shows_count,
-      "upcoming_shows_count": upcoming_shows_count
-    }
+    if venue is None:
+      abort(404)
+    upcoming_shows_count, past_shows_count, last_modified = show_stats(Show.venue_id, venue_id, Artist, now)
+    last_modified = latest(venue.updated_at, last_modified)
+    response = not_modified_response(last_modified)
+    if response is not None:
+      return response
+    page_last_modified(last_modified)
+    artist_columns = (Artist.id, Artist.name, Artist.image_link)
+
+    upcoming_shows = show_section(Show.venue_id, venue_id, Artist, artist_columns, now, True, limit)
+    past_shows = show_section(Show.venue_id, venue_id, Artist, artist_columns, now, False, limit)
+    genres_list = [genre.name for genre in venue.genres]
+    data = venue_page(venue, genres_list, upcoming_shows_count, past_shows_count, upcoming_shows, past_shows)
+  except HTTPException:
+    raise
   except:
     error = True
     db.session.rollback()
@@ -256,7 +922,7 @@ def create_venue_submission():
     state = request.form.get('state','')
     address = request.form.get('address','')
     phone = request.form.get('phone','')
-    genres = request.form.getlist('genres')
+    genres = genres_from_names(request.form.getlist('genres'))
     facebook_link = request.form.get('facebook_link','')
     image_link = request.form.get('image_link','')
     seeking_talent = request.form.get('seeking_talent', '')
@@ -272,6 +938,7 @@ def create_venue_submission():
     db.session.add(venue)
     db.session.commit()
     venue_id = venue.id
+    invalidate_venue(venue_id)
   except:
     error = True
     db.session.rollback()
@@ -289,13 +956,12 @@ def create_venue_submission():
 @app.route('/venues/<venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
   try:
-    venue_shows = Show.query.filter_by(venue_id=venue_id).all()
-    for show in venue_shows:
-      db.session.delete(show)
-    Venue.query.filter_by(id=venue_id).delete()
+    delete_entities(Venue, [venue_id])
     db.session.commit()
+    invalidate_venue(venue_id)
   except:
     db.session.rollback()
+    print(sys.exc_info())
   finally:
     db.session.close()
   return redirect('/')
@@ -316,7 +982,7 @@ def create_artist_submission():
     city = request.form.get('city', '')
     state = request.form.get('state', '')
     phone = request.form.get('phone', '')
-    genres = request.form.getlist('genres')
+    genres = genres_from_names(request.form.getlist('genres'))
     facebook_link = request.form.get('facebook_link', '')
     image_link = request.form.get('image_link', '')
     website = request.form.get('website', '')
@@ -333,6 +999,7 @@ def create_artist_submission():
     db.session.add(artist)
     db.session.commit()
     artist_id = artist.id
+    invalidate_artist(artist_id)
   except:
     error = True
     db.session.rollback()
@@ -346,28 +1013,53 @@ def create_artist_submission():
     flash('Artist ' + request.form['name'] + ' was successfully listed!')
     return redirect('/artists/' + str(artist_id))
 
+# Delete a specific artist entry
+@app.route('/artists/<artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+  try:
+    delete_entities(Artist, [artist_id])
+    db.session.commit()
+    invalidate_artist(artist_id)
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+  return redirect('/')
+
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
 def artists():
-  data = Artist.query.all()
-  return render_template('pages/artists.html', artists=data)
+  error = False
+  try:
+    last_modified, etag = list_validators(Artist)
+    response = not_modified_response(last_modified, etag, weak=True)
+    if response is not None:
+      return response
+    query = filter_genre(artist_items_query(), Artist.genres, request.args.get('genre'))
+    page = keyset_page(query, (Artist.name, Artist.id), request.args.get('after'), request.args.get('before'), page_size())
+  except:
+    error = True
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+      db.session.close()
+  if error:
+    return abort(400)
+  else:
+    response = make_response(render_template('pages/artists.html', artists=page.items, page=page))
+    return set_validators(response, last_modified, etag, weak=True)
 
 #Implement search on artists with partial string search.
 @app.route('/artists/search', methods=['POST'])
+@reads_from_replica
 def search_artists():
   data = []
   error = False
   try:
     search_term = request.form.get('search_term')
-    search_results = Artist.query.filter(Artist.name.ilike("%" + search_term + "%"))
-    num_results = search_results.count()
-    for result in search_results:     
-        data_item = {
-        "id": result.id,
-        "name": result.name,
-        }
-        data.append(data_item)
+    num_results, data = cached_search(Artist, search_term)
 
     response = {
       "count": num_results,
@@ -385,70 +1077,30 @@ def search_artists():
     return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
 @app.route('/artists/<int:artist_id>')
+@cached_page
 def show_artist(artist_id):
-  upcoming_shows_count = 0
-  past_shows_count = 0
-  upcoming_shows = []
-  past_shows = []
   data = {}
   error = False
+  now = datetime.utcnow()
+  limit = request.args.get('limit', app.config.get('SHOWS_PER_SECTION'), type=int)
   try:
     artist = Artist.query.get(artist_id)
-    shows = artist.shows
-    for show in shows:
-      if show.start_time > datetime.utcnow():
-        # upcoming shows on artist page
-        upcoming_shows_count += 1
-        venues = Venue.query.filter_by(id=show.venue_id).all()
-        for venue in venues:
-          upcoming_shows_item = {
-            "venue_id": venue.id,
-            "venue_name": venue.name,
-            "venue_image_link": artist.venue_image_link or default_venue_image_link,
-            "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-          }
-          upcoming_shows.append(upcoming_shows_item)
-      else:
-        # past shows on artist page
-        past_shows_count += 1
-        venues = Venue.query.filter_by(id=show.venue_id).all()
-        for venue in venues:
-          past_shows_item = {
-            "venue_id": venue.id,
-            "venue_name": venue.name,
-            "venue_image_link": artist.venue_image_link or default_venue_image_link,
-            "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-          }
-          past_shows.append(past_shows_item)
-    
-    if artist.seeking_venue == 'True':
-      artist.seeking_venue = True
-    elif artist.seeking_venue == 'False':
-      artist.seeking_venue = False
-    
-    genres_list = []
-    new_genres = artist.genres[1:-1].split(",")
-    for genre in new_genres:
-        genres_list.append(genre)
-
-    data = {
-      "id": artist_id,
-      "name": artist.name,
-      "city": artist.city,
-      "state": artist.state,
-      "phone": artist.phone,
-      "genres": genres_list,
-      "seeking_venue": artist.seeking_venue,
-      "seeking_description": artist.seeking_description,
-      "image_link": artist.image_link or default_artist_image_link,
-      "facebook_link": artist.facebook_link,
-      "venue_image_link": artist.venue_image_link or default_venue_image_link,
-      "website": artist.website,
-      "past_shows": past_shows,
-      "upcoming_shows": upcoming_shows,
-      "past_shows_count": past_shows_count,
-      "upcoming_shows_count": upcoming_shows_count
-    }
+    if artist is None:
+      abort(404)
+    upcoming_shows_count, past_shows_count, last_modified = show_stats(Show.artist_id, artist_id, Venue, now)
+    last_modified = latest(artist.updated_at, last_modified)
+    response = not_modified_response(last_modified)
+    if response is not None:
+      return response
+    page_last_modified(last_modified)
+    venue_columns = (Venue.id, Venue.name)
+
+    upcoming_shows = show_section(Show.artist_id, artist_id, Venue, venue_columns, now, True, limit)
+    past_shows = show_section(Show.artist_id, artist_id, Venue, venue_columns, now, False, limit)
+    genres_list = [genre.name for genre in artist.genres]
+    data = artist_page(artist, genres_list, upcoming_shows_count, past_shows_count, upcoming_shows, past_shows)
+  except HTTPException:
+    raise
   except:
     error = True
     db.session.rollback()
@@ -464,27 +1116,24 @@ def show_artist(artist_id):
 #  ----------------------------------------------------------------
 # edit artist page
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@reads_from_primary
 def edit_artist(artist_id):
   error = False
   try:
     form = ArtistForm()
     artist = Artist.query.get(artist_id)
 
-    if artist.seeking_venue == True:
-      artist.seeking_venue = 'True'
-    else:
-      artist.seeking_venue = 'False'
-
     form.name.data = artist.name
-    form.genres.data = artist.genres
+    form.genres.data = [genre.name for genre in artist.genres]
     form.city.data = artist.city
     form.state.data = artist.state
     form.phone.data = artist.phone
     form.website.data = artist.website
     form.facebook_link.data = artist.facebook_link
-    form.seeking_venue.data = artist.seeking_venue
+    form.seeking_venue.data = 'True' if artist.seeking_venue else 'False'
     form.seeking_description.data = artist.seeking_description
     form.image_link.data = artist.image_link
+    form.venue_image_link.data = artist.venue_image_link
   except:
     error = True
     db.session.rollback()
@@ -499,41 +1148,38 @@ def edit_artist(artist_id):
 @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
   error = False
+  conflict = False
+  version = None
 
   try:
-    artist = Artist.query.get(artist_id)
-    artist.name = request.form.get('name', '')
-    artist.city = request.form.get('city', '')
-    artist.state = request.form.get('state', '')
-    artist.phone = request.form.get('phone', '')
-    artist.genres = request.form.getlist('genres')
-    artist.facebook_link = request.form.get('facebook_link', '')
-    artist.image_link = request.form.get('image_link', '')
-    artist.website = request.form.get('website', '')
-    artist.venue_image_link = request.form.get('venue_image_link', '')
-    artist.seeking_venue = request.form.get('seeking_venue', '')
-    artist.seeking_description = request.form.get('seeking_description', '')
-
-    if artist.seeking_venue == 'True':
-      artist.seeking_venue = True
-    else:
-      artist.seeking_venue = False
-
-    artist = Artist(name=artist.name, city=artist.city, state=artist.state, phone=artist.phone, genres=artist.genres, facebook_link=artist.facebook_link, image_link=artist.image_link, website=artist.website,venue_image_link=artist.venue_image_link, seeking_venue=artist.seeking_venue, seeking_description=artist.seeking_description)
-    db.session.add(artist)
+    # write only the fields that changed, if nobody saved the artist since
+    # the form was loaded
+    values = dict((name, request.form[name]) for name in EDITABLE[Artist][0] if name in request.form)
+    values['seeking_venue'] = request.form.get('seeking_venue', '') == 'True'
+    version = update_versioned(Artist, artist_id, request.form.get('version', type=int), values, request.form.getlist('genres'))
     db.session.commit()
+    invalidate_artist(artist_id)
+  except VersionConflict:
+    conflict = True
+    db.session.rollback()
   except:
     error = True
     db.session.rollback()
     print(sys.exc_info())
   finally:
     db.session.close()
+  if conflict:
+    flash('Artist ' + request.form.get('name', '') + ' was changed while you were editing it. Review the latest details and save again.')
+    return edit_artist(artist_id), 409
   if error:
     return abort(400)
+  if version is None:
+    return abort(404)
 
   return redirect(url_for('show_artist', artist_id=artist_id))
 
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@reads_from_primary
 def edit_venue(venue_id):
   error = False
   try:
@@ -541,19 +1187,15 @@ def edit_venue(venue_id):
     # populate form with values from venue with ID <venue_id>
     venue = Venue.query.get(venue_id)
 
-    if venue.seeking_talent == True:
-      venue.seeking_talent = 'True'
-    else:
-      venue.seeking_talent = 'False'
-
     form.name.data = venue.name
-    form.genres.data = venue.genres
+    form.genres.data = [genre.name for genre in venue.genres]
     form.city.data = venue.city
     form.state.data = venue.state
+    form.address.data = venue.address
     form.phone.data = venue.phone
     form.website.data = venue.website
     form.facebook_link.data = venue.facebook_link
-    form.seeking_talent.data = venue.seeking_talent
+    form.seeking_talent.data = 'True' if venue.seeking_talent else 'False'
     form.seeking_description.data = venue.seeking_description
     form.image_link.data = venue.image_link
   except:
@@ -569,62 +1211,53 @@ def edit_venue(venue_id):
 
 @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
-  # update existing venue record with ID <venue_id> using the new attributes
-  venue = Venue.query.get(venue_id)
+  # update existing venue record with ID <venue_id> using the new attributes,
+  # writing only the fields that changed and only if nobody saved the venue
+  # since the form was loaded
   error = False
+  conflict = False
+  version = None
   try:
-    venue.name = request.form.get('name', '')
-    venue.city = request.form.get('city','')
-    venue.state = request.form.get('state','')
-    venue.address = request.form.get('address','')
-    venue.phone = request.form.get('phone','')
-    venue.genres = request.form.getlist('genres')
-    venue.facebook_link =request.form.get('facebook_link','')
-    venue.image_link =request.form.get('image_link','')
-    venue.website =request.form.get('website','')
-    venue.seeking_talent = request.form.get('seeking_talent', '')
-    venue.seeking_description = request.form.get('seeking_description', '')
-
-    if venue.seeking_talent == 'True':
-      venue.seeking_talent = True
-    else:
-      venue.seeking_talent = False
-
-    venue = Venue(name=venue.name, city=venue.city, state=venue.state, address=venue.address, phone=venue.phone, genres=venue.genres, facebook_link=venue.facebook_link, image_link=venue.image_link, website=venue.website, seeking_talent=venue.seeking_talent, seeking_description=venue.seeking_description)
-    db.session.add(venue)
+    values = dict((name, request.form[name]) for name in EDITABLE[Venue][0] if name in request.form)
+    values['seeking_talent'] = request.form.get('seeking_talent', '') == 'True'
+    version = update_versioned(Venue, venue_id, request.form.get('version', type=int), values, request.form.getlist('genres'))
     db.session.commit()
+    invalidate_venue(venue_id)
+  except VersionConflict:
+    conflict = True
+    db.session.rollback()
   except:
     error = True
     db.session.rollback()
     print(sys.exc_info())
   finally:
       db.session.close()
+  if conflict:
+    flash('Venue ' + request.form.get('name', '') + ' was changed while you were editing it. Review the latest details and save again.')
+    return edit_venue(venue_id), 409
   if error:
     return abort(400)
+  if version is None:
+    return abort(404)
   else:    
     return redirect(url_for('show_venue', venue_id=venue_id))
 
 #  Shows
 #  ----------------------------------------------------------------
-# Display a list of shows
+# Display a list of shows, optionally filtered with ?from=&to=&venue_id=
+# &artist_id=&city= (see show_filters)
 @app.route('/shows')
 def shows():
   show_list = []
   error = False
   try:
-    shows = Show.query.all()
-    for show in shows:
-      venue = show.venue
-      artist = show.artist
-      show_item = {
-        "venue_id": show.venue_id,
-        "venue_name": venue.name,
-        "artist_id": show.artist_id,
-        "artist_name": artist.name,
-        "artist_image_link": artist.image_link or default_artist_image_link,
-        "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-        }
-      show_list.append(show_item)
+    last_modified, etag = list_validators(Show, Venue, Artist)
+    response = not_modified_response(last_modified, etag, weak=True)
+    if response is not None:
+      return response
+    query = filter_shows(show_tiles_query(), **show_filters(request.args))
+    page = keyset_page(query, (Show.start_time, Show.id), request.args.get('after'), request.args.get('before'), page_size())
+    show_list = [ShowTile(row) for row in page.items]
   except:
     error = True
     db.session.rollback()
@@ -634,7 +1267,48 @@ def shows():
   if error:
     return abort(400)
   else: 
-    return render_template('pages/shows.html', shows=show_list)
+    response = make_response(render_template('pages/shows.html', shows=show_list, page=page,
+      weekend=weekend_of(datetime.utcnow().date())))
+    return set_validators(response, last_modified, etag, weak=True)
+
+# A month of shows laid out by day, ?month=YYYY-MM (this month by default),
+# with the same filters as /shows. The month is read in two range scans of
+# the start time index: one for the first CALENDAR_SHOWS_PER_DAY shows of
+# each day, which the day lists, and one counting the rest, which it links to.
+@app.route('/shows/calendar')
+def shows_calendar():
+  error = False
+  try:
+    month = request.args.get('month')
+    first = datetime.strptime(month, '%Y-%m') if month else datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    following = (first + timedelta(days=32)).replace(day=1)
+    last_modified, etag = list_validators(Show, Venue, Artist)
+    # without ?month= the page changes when the month does
+    etag = hashlib.sha1((etag + first.isoformat()).encode()).hexdigest()
+    last_modified = latest(last_modified, first)
+    response = not_modified_response(last_modified, etag, weak=True)
+    if response is not None:
+      return response
+    filters = show_filters(request.args)
+    filters.update(start=max(first, filters['start'] or first), end=min(following, filters['end'] or following))
+    query = filter_shows(show_tiles_query(), **filters)
+    days = {}
+    for row in shows_per_day_query(query, app.config['CALENDAR_SHOWS_PER_DAY']):
+      days.setdefault(row.start_time.date(), []).append(ShowTile(row))
+    counts = day_counts(query)
+  except:
+    error = True
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+      db.session.close()
+  if error:
+    return abort(400)
+  else:
+    weeks = calendar.Calendar().monthdatescalendar(first.year, first.month)
+    response = make_response(render_template('pages/shows_calendar.html', month=first, weeks=weeks, days=days,
+      counts=counts, previous_month=(first - timedelta(days=1)).strftime('%Y-%m'), next_month=following.strftime('%Y-%m')))
+    return set_validators(response, last_modified, etag, weak=True)
 
 @app.route('/shows/create')
 def create_shows():
@@ -644,23 +1318,35 @@ def create_shows():
 
 @app.route('/shows/create', methods=['POST'])
 def create_show_submission():
+  form, errors = form_errors(ShowForm, request.form.to_dict())
+  if errors:
+    for name, messages in errors.items():
+      flash('%s: %s' % (form[name].label.text, ' '.join(messages)))
+    return create_shows(), 400
+
   error = False
+  rejected = None
   try:
-    artist_id = request.form.get('artist_id', '')
-    venue_id = request.form.get('venue_id', '')
-    start_time = request.form.get('start_time', '')
-    new_show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time)
-    
-    db.session.add(new_show)
+    artist_id = int(form.artist_id.data)
+    venue_id = int(form.venue_id.data)
+    new_show = book_show(artist_id, venue_id, form.start_time.data, form.duration.data)
     db.session.commit()
+    page_cache.invalidate_tags('venue:%s' % venue_id, 'artist:%s' % artist_id)
   # Get new show id after commiting to DB
     new_show_id = new_show.id
+  except BookingError as e:
+    rejected = e
+    db.session.rollback()
   except:
     error = True
     db.session.rollback()
     print(sys.exc_info())
   finally:
     db.session.close()
+  if rejected:
+    for message in rejected.messages:
+      flash(message)
+    return create_shows(), rejected.status
   if error:
     flash('An error occurred. Show could not tbe listed.')
     return abort(400)
@@ -669,12 +1355,22 @@ def create_show_submission():
     return redirect('/shows/' + str(new_show_id))
 
 @app.route('/shows/<int:show_id>')
+@cached_page
 def show_showitem(show_id):
   error = False
   try:
-    show = Show.query.get(show_id)
+    show = Show.query.options(
+      db.joinedload(Show.venue).load_only(Venue.id, Venue.name, Venue.updated_at),
+      db.joinedload(Show.artist).load_only(Artist.id, Artist.name, Artist.image_link, Artist.updated_at)
+    ).get(show_id)
     venue = show.venue
     artist = show.artist
+    last_modified = latest(show.updated_at, venue.updated_at, artist.updated_at)
+    response = not_modified_response(last_modified)
+    if response is not None:
+      return response
+    page_last_modified(last_modified)
+    tag_page('show:%d' % show.id, 'venue:%d' % show.venue_id, 'artist:%d' % show.artist_id)
     data = [{
       "id": show.id,
       "venue_id": show.venue_id,
@@ -682,7 +1378,7 @@ def show_showitem(show_id):
       "artist_id": show.artist_id,
       "artist_name": artist.name,
       "artist_image_link": artist.image_link or default_artist_image_link,
-      "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
+      "start_time": show.start_time
     }]
   except:
     error = True
@@ -695,6 +1391,475 @@ def show_showitem(show_id):
   else: 
     return render_template('pages/shows.html', shows=data)
 
+#  API
+#  ----------------------------------------------------------------
+
+# Fields each API resource can return, with the column behind each one.
+# Venue and artist `genres` come from the genre links, read per batch of rows.
+API_RESOURCES = {
+  'venues': {
+    'fields': [
+      ('id', Venue.id), ('name', Venue.name), ('city', Venue.city), ('state', Venue.state),
+      ('address', Venue.address), ('phone', Venue.phone), ('image_link', Venue.image_link),
+      ('facebook_link', Venue.facebook_link), ('website', Venue.website),
+      ('seeking_talent', Venue.seeking_talent), ('seeking_description', Venue.seeking_description),
+      ('updated_at', Venue.updated_at), ('version', Venue.version)
+    ],
+    'genres': (Venue.genres, venue_genres.c.venue_id),
+    'sort': (Venue.name, Venue.id),
+    'tables': (Venue,)
+  },
+  'artists': {
+    'fields': [
+      ('id', Artist.id), ('name', Artist.name), ('city', Artist.city), ('state', Artist.state),
+      ('phone', Artist.phone), ('image_link', Artist.image_link), ('venue_image_link', Artist.venue_image_link),
+      ('facebook_link', Artist.facebook_link), ('website', Artist.website),
+      ('seeking_venue', Artist.seeking_venue), ('seeking_description', Artist.seeking_description),
+      ('updated_at', Artist.updated_at), ('version', Artist.version)
+    ],
+    'genres': (Artist.genres, artist_genres.c.artist_id),
+    'sort': (Artist.name, Artist.id),
+    'tables': (Artist,)
+  },
+  'shows': {
+    'fields': [
+      ('id', Show.id), ('start_time', Show.start_time), ('end_time', Show.end_time),
+      ('venue_id', Show.venue_id), ('venue_name', Venue.name),
+      ('artist_id', Show.artist_id), ('artist_name', Artist.name), ('artist_image_link', Artist.image_link),
+      ('updated_at', Show.updated_at), ('version', Show.version)
+    ],
+    'genres': None,
+    'sort': (Show.start_time, Show.id),
+    'tables': (Show, Venue, Artist)
+  }
+}
+
+# Build the query for an API resource selecting only the requested fields
+# (plus the sort key the cursors are made of), or raise ValueError
+def api_query(resource, fields, genre=None):
+  spec = API_RESOURCES[resource]
+  available = dict(spec['fields'])
+  unknown = [field for field in fields if field not in available and not (field == 'genres' and spec['genres'])]
+  if unknown:
+    raise ValueError('unknown fields: ' + ', '.join(unknown))
+  columns = [available[field].label(field) for field in fields if field in available]
+  columns += [column.label(column.key) for column in spec['sort'] if column.key not in fields]
+  query = db.session.query(*columns)
+  if resource == 'shows':
+    query = query.select_from(Show).join(Venue, Venue.id == Show.venue_id).join(Artist, Artist.id == Show.artist_id)
+  elif genre:
+    query = filter_genre(query.select_from(spec['tables'][0]), spec['genres'][0], genre)
+  return query
+
+# Turn a batch of rows into API records holding just the requested fields
+def api_records(resource, rows, fields):
+  genres = {}
+  if 'genres' in fields and rows:
+    genres = genre_names(API_RESOURCES[resource]['genres'][1], [row.id for row in rows])
+  records = []
+  for row in rows:
+    record = {}
+    for field in fields:
+      value = genres.get(row.id, []) if field == 'genres' else getattr(row, field)
+      record[field] = value.isoformat() if isinstance(value, datetime) else value
+    records.append(record)
+  return records
+
+# Yield the query's rows as batches of API records, reading them through a
+# server-side cursor so the full result is never held in memory
+def record_batches(resource, query, fields, batch_size):
+  rows = iter(query.yield_per(batch_size))
+  while True:
+    batch = list(itertools.islice(rows, batch_size))
+    if not batch:
+      break
+    yield api_records(resource, batch, fields)
+
+def ndjson_chunks(batches):
+  for records in batches:
+    yield ''.join(json.dumps(record) + '\n' for record in records)
+
+def csv_chunks(batches, fields):
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  writer.writerow(fields)
+  for records in batches:
+    for record in records:
+      writer.writerow([','.join(value) if isinstance(value, list) else value
+        for value in (record[field] for field in fields)])
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+  if buffer.tell():
+    yield buffer.getvalue()
+
+def gzip_chunks(chunks):
+  compressor = zlib.compressobj(wbits=31)
+  for chunk in chunks:
+    data = compressor.compress(chunk.encode('utf-8'))
+    if data:
+      yield data
+  yield compressor.flush()
+
+# Every row of a resource, or those modified since `since`, as CSV or JSONL
+# chunks. A show counts as modified when its venue or artist is, as it
+# carries their names. Deleted rows are not reported; only a full export
+# drops them. Rows are read in batches through a server-side cursor, so
+# exports run in constant memory whatever the size of the catalog.
+def export_chunks(resource, fields, file_format='jsonl', since=None, compress=False):
+  spec = API_RESOURCES[resource]
+  query = api_query(resource, fields)
+  if since is not None:
+    query = query.filter(db.or_(*[model.updated_at >= since for model in spec['tables']]))
+  query = query.order_by(*spec['sort'])
+  batches = record_batches(resource, query, fields, app.config['API_STREAM_BATCH_SIZE'])
+  chunks = csv_chunks(batches, fields) if file_format == 'csv' else ndjson_chunks(batches)
+  return gzip_chunks(chunks) if compress else chunks
+
+def api_fields(resource, requested=None):
+  spec = API_RESOURCES[resource]
+  fields = [field for field in (requested or '').split(',') if field]
+  return fields or [field for field, column in spec['fields']] + (['genres'] if spec['genres'] else [])
+
+# List venues, artists or shows as JSON. ?fields=id,name picks the fields,
+# ?after=/?before= take the cursors returned with each page, and ?stream=1 (or
+# Accept: application/x-ndjson) streams all rows as NDJSON instead of a page.
+@app.route('/api/v1/<resource>')
+def api_list(resource):
+  if resource not in API_RESOURCES:
+    abort(404)
+  spec = API_RESOURCES[resource]
+  fields = api_fields(resource, request.args.get('fields'))
+  stream = request.args.get('stream', type=int) or \
+    request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+  try:
+    query = api_query(resource, fields, request.args.get('genre'))
+  except ValueError as e:
+    return jsonify({"error": str(e)}), 400
+
+  try:
+    last_modified, etag = list_validators(*spec['tables'])
+    response = not_modified_response(last_modified, etag, weak=True)
+    if response is not None:
+      return response
+
+    if stream:
+      # genres are read once per batch of rows
+      query_diagnostics.allow_repeated_statements()
+      after = request.args.get('after')
+      if after:
+        query = query.filter(db.tuple_(*sort_keys(spec['sort'])) > db.tuple_(*decode_cursor(after, spec['sort'])))
+      query = query.order_by(*sort_keys(spec['sort']))
+      batches = record_batches(resource, query, fields, app.config['API_STREAM_BATCH_SIZE'])
+      response = Response(stream_with_context(ndjson_chunks(batches)), mimetype='application/x-ndjson')
+    else:
+      page = keyset_page(query, spec['sort'], request.args.get('after'), request.args.get('before'), page_size())
+      response = jsonify({
+        "data": api_records(resource, page.items, fields),
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor
+      })
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    return jsonify({"error": "bad request"}), 400
+  return set_validators(response, last_modified, etag, weak=True)
+
+# Partially update a venue or artist from a JSON object of the fields to
+# change. The version being edited is sent as If-Match (the ETag of a
+# previous PATCH) or a "version" member; a stale version gets a 409.
+@app.route('/api/v1/<resource>/<int:entity_id>', methods=['PATCH'])
+def api_update(resource, entity_id):
+  editable = {
+    'venues': (Venue, VenueForm, invalidate_venue, 'seeking_talent'),
+    'artists': (Artist, ArtistForm, invalidate_artist, 'seeking_venue')
+  }
+  if resource not in editable:
+    abort(404 if resource not in API_RESOURCES else 405)
+  model, form_class, invalidate, seeking = editable[resource]
+  values = request.get_json(silent=True)
+  if not isinstance(values, dict):
+    return jsonify({"error": "expected a JSON object"}), 400
+
+  version = values.pop('version', None)
+  if request.if_match:
+    version = next(iter(request.if_match.as_set()), None)
+  try:
+    version = int(version)
+  except (TypeError, ValueError):
+    return jsonify({"error": "send the version being edited as If-Match or \"version\""}), 428
+  genres = values.pop('genres', None)
+  if genres is not None and not (isinstance(genres, list) and all(isinstance(name, str) for name in genres)):
+    return jsonify({"error": "genres must be a list of names"}), 400
+  unknown = [name for name in values if name not in EDITABLE[model][0]]
+  if unknown:
+    return jsonify({"error": "unknown fields: " + ', '.join(unknown)}), 400
+  form, errors = form_errors(form_class, dict(values, genres=genres) if genres is not None else values, partial=True)
+  if errors:
+    return jsonify({"errors": errors}), 400
+  if seeking in values:
+    values[seeking] = str(values[seeking]) == 'True'
+
+  error = False
+  conflict = False
+  record = None
+  try:
+    version = update_versioned(model, entity_id, version, values, genres)
+    if version is not None:
+      db.session.commit()
+      invalidate(entity_id)
+      fields = api_fields(resource)
+      rows = api_query(resource, fields).filter(model.id == entity_id).all()
+      record = api_records(resource, rows, fields)[0]
+  except VersionConflict:
+    conflict = True
+    db.session.rollback()
+  except:
+    error = True
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+  if conflict:
+    return jsonify({"error": "version conflict, reload and try again"}), 409
+  if error:
+    return jsonify({"error": "bad request"}), 400
+  if record is None:
+    abort(404)
+  response = jsonify(record)
+  response.set_etag(str(version))
+  return response
+
+# Delete many venues or artists at once from a JSON body {"ids": [1, 2, 3]},
+# in one statement however many shows they have
+@app.route('/api/v1/<resource>', methods=['DELETE'])
+def api_delete(resource):
+  deletable = {'venues': (Venue, invalidate_venue), 'artists': (Artist, invalidate_artist)}
+  if resource not in deletable:
+    abort(404 if resource not in API_RESOURCES else 405)
+  model, invalidate = deletable[resource]
+  body = request.get_json(silent=True)
+  ids = body.get('ids') if isinstance(body, dict) else None
+  # not isinstance: JSON true and false would pass as the ids 1 and 0
+  if not isinstance(ids, list) or not all(type(entity_id) is int for entity_id in ids):
+    return jsonify({"error": "expected {\"ids\": [...]} with integer ids"}), 400
+  if len(ids) > app.config['MAX_BULK_DELETE']:
+    return jsonify({"error": "at most %d ids per request" % app.config['MAX_BULK_DELETE']}), 400
+
+  error = False
+  deleted = 0
+  try:
+    if ids:
+      deleted = delete_entities(model, ids)
+    db.session.commit()
+    for entity_id in ids:
+      invalidate(entity_id)
+  except:
+    error = True
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+  if error:
+    return jsonify({"error": "bad request"}), 400
+  return jsonify({"deleted": deleted})
+
+# Free time of a venue between ?from= and ?to= (dates or datetimes; by
+# default the coming FREE_SLOTS_DEFAULT_DAYS days), as the gaps between its
+# shows lasting at least ?min_duration= minutes (60 by default)
+@app.route('/api/v1/venues/<int:venue_id>/free-slots')
+def api_free_slots(venue_id):
+  try:
+    start, end = date_range(request.args)
+  except ValueError as e:
+    return jsonify({"error": str(e)}), 400
+  try:
+    minutes = int(request.args.get('min_duration', 60))
+  except ValueError:
+    return jsonify({"error": "min_duration must be a whole number of minutes"}), 400
+  start = start or datetime.utcnow().replace(second=0, microsecond=0)
+  end = end or start + timedelta(days=app.config['FREE_SLOTS_DEFAULT_DAYS'])
+  if end <= start or end - start > timedelta(days=app.config['FREE_SLOTS_MAX_DAYS']):
+    return jsonify({"error": "to must come after from, at most %d days later" % app.config['FREE_SLOTS_MAX_DAYS']}), 400
+  if not 0 < minutes <= (end - start).total_seconds() // 60:
+    return jsonify({"error": "min_duration must be a positive number of minutes within the range"}), 400
+
+  error = False
+  venue = None
+  try:
+    venue = db.session.query(Venue.id).filter(Venue.id == venue_id).first()
+    if venue is not None:
+      slots = free_slots(venue_id, start, end, minutes)
+  except:
+    error = True
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+  if error:
+    return jsonify({"error": "bad request"}), 400
+  if venue is None:
+    abort(404)
+  return jsonify({
+    "venue_id": venue_id,
+    "from": start.isoformat(),
+    "to": end.isoformat(),
+    "min_duration": minutes,
+    "slots": [{
+      "start": slot_start.isoformat(),
+      "end": slot_end.isoformat(),
+      "minutes": int((slot_end - slot_start).total_seconds() // 60)
+    } for slot_start, slot_end in slots]
+  })
+
+# Download a whole resource as ?format=csv or jsonl, optionally ?gzip=1.
+# ?since= (an ISO timestamp) limits it to rows modified since then.
+@app.route('/export/<resource>')
+def export_resource(resource):
+  if resource not in API_RESOURCES:
+    abort(404)
+  file_format = request.args.get('format', 'jsonl')
+  compress = bool(request.args.get('gzip', type=int))
+  fields = api_fields(resource, request.args.get('fields'))
+  if file_format not in ('csv', 'jsonl'):
+    return jsonify({"error": "format must be csv or jsonl"}), 400
+  query_diagnostics.allow_repeated_statements()
+  try:
+    since = dateutil.parser.parse(request.args['since']) if request.args.get('since') else None
+    chunks = export_chunks(resource, fields, file_format, since, compress)
+  except ValueError as e:
+    return jsonify({"error": str(e)}), 400
+  filename = resource + '.' + file_format + ('.gz' if compress else '')
+  mimetype = 'application/gzip' if compress else ('text/csv' if file_format == 'csv' else 'application/x-ndjson')
+  response = Response(stream_with_context(chunks), mimetype=mimetype)
+  response.headers['Content-Disposition'] = 'attachment; filename=' + filename
+  return response
+
+#  Debug
+#  ----------------------------------------------------------------
+# The diagnostic endpoints are 404 unless EXPOSE_DIAGNOSTICS is on
+def diagnostics(view):
+  @functools.wraps(view)
+  def wrapper(*args, **kwargs):
+    if not app.config['EXPOSE_DIAGNOSTICS']:
+      abort(404)
+    return view(*args, **kwargs)
+  return wrapper
+
+# Hit/miss/eviction counters of the application caches
+@app.route('/debug/cache')
+@diagnostics
+def cache_stats():
+  return jsonify({
+    "search": search_cache.stats(),
+    "pages": page_cache.stats()
+  })
+
+# Per-endpoint query counts and SQL, render and total time histograms, in the
+# Prometheus text format
+@app.route('/metrics')
+@diagnostics
+def metrics():
+  return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def engine_pool_stats(engine, bind=None):
+  pool = engine.pool
+  stats = {"class": type(pool).__name__, "status": pool.status()}
+  # only QueuePool keeps counters; SQLite files are opened per use
+  if hasattr(pool, 'checkedout'):
+    stats.update({
+      "size": pool.size(),
+      "checked_out": pool.checkedout(),
+      "idle": pool.checkedin(),
+      # negative until the pool has opened `size` connections
+      "overflow": max(pool.overflow(), 0),
+      # as configured; None leaves SQLAlchemy's default
+      "max_overflow": bind_engine_options(app.config, bind).get('max_overflow')
+    })
+  return stats
+
+# Connections of this worker's pool: in use, idle in the pool, and opened
+# beyond its size; with read replicas, the pool of each as well
+@app.route('/debug/pool')
+@diagnostics
+def pool_stats():
+  stats = engine_pool_stats(db.engine)
+  if app.config['REPLICA_BINDS']:
+    stats["replicas"] = dict((bind, engine_pool_stats(db.get_engine(app, bind=bind), bind)) for bind in app.config['REPLICA_BINDS'])
+  return jsonify(stats)
+
+#  Commands
+#  ----------------------------------------------------------------
+# Bulk load venues, artists or shows from a CSV or JSONL file
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']),
+  help='File format; guessed from the file extension by default.')
+@click.option('--batch-size', default=lambda: app.config['IMPORT_BATCH_SIZE'], show_default='IMPORT_BATCH_SIZE',
+  type=click.IntRange(1), help='Rows written per transaction.')
+@click.option('--rejects', type=click.Path(dir_okay=False, writable=True),
+  help='Write rejected rows and their errors to this JSONL file.')
+def import_command(kind, path, file_format, batch_size, rejects):
+  from importer import import_file
+  def progress(result):
+    click.echo('%d rows imported (%.0f rows/sec)' % (result.imported, result.rows_per_second), err=True)
+  result = import_file(kind, path, file_format, batch_size, progress)
+  click.echo('Imported %d of %d %s in %.1fs (%.0f rows/sec), rejected %d.' % (
+    result.imported, result.read, kind, result.elapsed, result.rows_per_second, len(result.rejected)))
+  for rejected in result.rejected[:10]:
+    click.echo('  line %d: %s' % (rejected['line'], json.dumps(rejected['errors'])))
+  if rejects:
+    with open(rejects, 'w') as f:
+      for rejected in result.rejected:
+        f.write(json.dumps(rejected, default=str) + '\n')
+
+# Stream venues, artists or shows to a CSV or JSONL file (stdout by default)
+@app.cli.command('export')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--output', '-o', default='-', type=click.Path(dir_okay=False, writable=True, allow_dash=True),
+  help='File to write; a .gz extension turns on --gzip.')
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']),
+  help='File format; guessed from the output file extension, JSONL by default.')
+@click.option('--gzip', 'compress', is_flag=True, help='Compress the output with gzip.')
+@click.option('--fields', help='Comma separated fields to export; all of them by default.')
+@click.option('--since', type=click.DateTime(['%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d']),
+  help='Only export rows modified since this UTC time (shows also when their venue or artist was). '
+  'Deleted rows are not reported.')
+def export_command(kind, output, file_format, compress, fields, since):
+  name = output[:-3] if output.endswith('.gz') else output
+  compress = compress or output.endswith('.gz')
+  file_format = file_format or ('csv' if name.endswith('.csv') else 'jsonl')
+  started = datetime.utcnow()
+  try:
+    chunks = export_chunks(kind, api_fields(kind, fields), file_format, since, compress)
+  except ValueError as e:
+    raise click.BadParameter(str(e), param_hint='--fields')
+  with click.open_file(output, 'wb' if compress else 'w') as f:
+    for chunk in chunks:
+      f.write(chunk)
+  db.session.close()
+  click.echo('Next incremental export: --since %s' % started.isoformat(), err=True)
+
+# Fill the database with a reproducible synthetic catalog
+@app.cli.command('seed')
+@click.option('--venues', default=1000, show_default=True, type=click.IntRange(0))
+@click.option('--artists', default=10000, show_default=True, type=click.IntRange(0))
+@click.option('--shows', default=100000, show_default=True, type=click.IntRange(0))
+@click.option('--seed', 'random_seed', default=0, show_default=True, help='The same seed builds the same catalog.')
+@click.option('--skew', default=1.1, show_default=True, type=click.FloatRange(0),
+  help='How strongly shows concentrate on popular venues and artists (0 spreads them evenly).')
+@click.option('--batch-size', default=5000, show_default=True, type=click.IntRange(1))
+def seed_command(venues, artists, shows, random_seed, skew, batch_size):
+  from seed import generate_catalog
+  def progress(kind, count):
+    click.echo('%d %s added' % (count, kind), err=True)
+  elapsed = generate_catalog(venues, artists, shows, random_seed, skew, batch_size, progress)
+  total = venues + artists + shows
+  click.echo('Seeded %d rows in %.1fs (%.0f rows/sec).' % (total, elapsed, total / elapsed if elapsed else 0))
+  search_cache.clear()
+  page_cache.clear()
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
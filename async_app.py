@@ -0,0 +1,425 @@
+#----------------------------------------------------------------------------#
+# Async read path.
+#
+#   pip install -r requirements-async.txt
+#   hypercorn async_app:asgi --bind 0.0.0.0:5000
+#
+# The browse and detail pages (venues, artists, shows, show_venue,
+# show_artist and both searches) as Quart views that await their queries on
+# an async engine, so one process keeps many slow queries in flight instead
+# of holding a worker per round-trip. They run the same statements as the
+# Flask views (the *_query helpers of app.py), build their pages with the same
+# helpers (pages.py), render the same templates and share the search and page
+# caches, so writes made through Flask invalidate them as usual. Like the Flask GET views, they read from one of the
+# REPLICA_BINDS unless the client carries the pin cookie of a recent write.
+# `asgi` serves these routes from the event loop and hands every other
+# request (forms, API, exports...) to the Flask app on a thread pool.
+#----------------------------------------------------------------------------#
+
+import functools
+import random
+import sys
+from datetime import datetime
+
+from a2wsgi import WSGIMiddleware
+from quart import Quart, render_template, request, Response, abort, url_for, make_response, session, g
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from werkzeug.exceptions import HTTPException
+
+import app as fyyur
+from routing import bind_engine_options
+from app import Venue, Artist, Show, ShowTile, venue_genres, artist_genres, search_cache, page_cache
+from pages import requested_page_size, page_url_values, is_not_modified, set_validators, recording_page, \
+    page_cache_key, page_last_modified, venue_page, artist_page
+
+# Async driver for each database backend the Flask app may be configured with
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+
+# The Flask app's database URI (or that of one of its binds) with its driver
+# swapped for the async one, unless SQLALCHEMY_ASYNC_DATABASE_URI names the
+# primary's explicitly
+def async_database_uri(config, bind=None):
+    if bind is not None:
+        url = make_url(config['SQLALCHEMY_BINDS'][bind])
+    elif config.get('SQLALCHEMY_ASYNC_DATABASE_URI'):
+        return config['SQLALCHEMY_ASYNC_DATABASE_URI']
+    else:
+        url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError('No async driver for %s databases' % backend)
+    if backend == 'sqlite' and url.database in (None, '', ':memory:'):
+        raise ValueError('An in-memory SQLite database cannot be shared with the async engine')
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+# The Flask app's pool settings for the bind; the statement timeout is
+# passed the way asyncpg takes server settings
+def async_engine_options(config, uri, bind=None):
+    options = dict(bind_engine_options(config, bind))
+    options.pop('connect_args', None)
+    if config.get('DB_STATEMENT_TIMEOUT_MS') and make_url(uri).get_backend_name() == 'postgresql':
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(config['DB_STATEMENT_TIMEOUT_MS'])}}
+    return options
+
+
+class AsyncDatabase(object):
+
+    def __init__(self, app=None):
+        # bind name (None for the primary) -> engine and session factory
+        self.engines = {}
+        self.sessions = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # the engines are made once serving starts, from the Flask app's
+        # configuration as it is then
+        app.before_serving(self.connect)
+        app.after_serving(self.dispose)
+        app.before_request(self._route)
+
+    async def connect(self):
+        config = fyyur.app.config
+        for bind in [None] + list(config.get('REPLICA_BINDS') or []):
+            uri = async_database_uri(config, bind)
+            self.engines[bind] = create_async_engine(uri, **async_engine_options(config, uri, bind))
+            self.sessions[bind] = sessionmaker(self.engines[bind], class_=AsyncSession, expire_on_commit=False)
+
+    async def dispose(self):
+        for engine in self.engines.values():
+            await engine.dispose()
+        self.engines = {}
+        self.sessions = {}
+
+    @property
+    def replicas(self):
+        return sorted(bind for bind in self.engines if bind is not None)
+
+    # Every route here only reads, so each request goes to a random replica
+    # unless the client wrote within the lag window (see routing.py)
+    async def _route(self):
+        g.database_bind = None
+        if self.replicas and not request.cookies.get(fyyur.app.config['REPLICA_PIN_COOKIE']):
+            g.database_bind = random.choice(self.replicas)
+
+    # A session on the database the current request reads from
+    def session(self):
+        return self.sessions[g.get('database_bind')]()
+
+    # Whether the current request reads from a replica that may not have
+    # caught up with a write this process served (through the Flask app)
+    # within the lag window; what it reads is not cached then
+    def may_be_stale(self):
+        return g.get('database_bind') is not None and fyyur.database_router.wrote_recently()
+
+
+#----------------------------------------------------------------------------#
+# App Config.
+#----------------------------------------------------------------------------#
+
+app = Quart(__name__)
+app.config.from_object('config')
+database = AsyncDatabase(app)
+
+app.jinja_env.filters['datetime'] = fyyur.format_datetime
+
+
+# Link to another page of the current list, keeping any other query arguments
+@app.template_global()
+def page_url(**cursor):
+    return url_for(request.endpoint, **page_url_values(request.args, request.view_args, cursor))
+
+
+# Run a query built by one of app.py's *_query helpers
+async def execute(db_session, query):
+    return await db_session.execute(query.statement)
+
+
+#----------------------------------------------------------------------------#
+# Conditional requests and the page cache.
+#
+# The same rules as the Flask views (see pages.py), against a Quart request.
+#----------------------------------------------------------------------------#
+
+def conditional_headers():
+    return dict(('HTTP_' + name.upper().replace('-', '_'), request.headers[name])
+                for name in ('If-None-Match', 'If-Modified-Since') if name in request.headers)
+
+
+def not_modified_response(last_modified, etag=None, weak=False):
+    if not is_not_modified(conditional_headers(), request.if_none_match, last_modified, etag):
+        return None
+    return set_validators(Response('', status=304), last_modified, etag, weak)
+
+
+def cached_page(view):
+    @functools.wraps(view)
+    async def wrapper(*args, **kwargs):
+        if session.get('_flashes'):
+            return await view(*args, **kwargs)
+        key = page_cache_key(request.full_path)
+        page = page_cache.get(key)
+        if page is None:
+            with recording_page() as record:
+                response = await make_response(await view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            page = record.entry(await response.get_data(), response.mimetype)
+            if not database.may_be_stale():
+                page_cache.set(key, page, ttl=record.ttl(app.config['PAGE_CACHE_TTL']), tags=record.tags)
+        body, etag, mimetype, last_modified = page
+        response = not_modified_response(last_modified, etag)
+        if response is None:
+            response = set_validators(Response(body, mimetype=mimetype), last_modified, etag)
+        return response
+    return wrapper
+
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+@app.route('/')
+async def index():
+    return await render_template('pages/home.html')
+
+
+def page_size():
+    return requested_page_size(request.args, app.config)
+
+
+async def keyset_page(db_session, query, sort_columns):
+    after, before, size = request.args.get('after'), request.args.get('before'), page_size()
+    result = await execute(db_session, fyyur.keyset_query(query, sort_columns, after, before, size))
+    return fyyur.keyset_result(result.all(), sort_columns, after, before, size)
+
+
+async def list_validators(db_session, *models):
+    result = await execute(db_session, fyyur.list_validators_query(*models))
+    return fyyur.list_validators_from(result.one(), request.full_path)
+
+
+async def cached_search(db_session, model, search_term):
+    search_term = fyyur.normalize_search_term(search_term)
+    key = fyyur.search_cache_key(model, search_term)
+    result = search_cache.get(key)
+    if result is None:
+        engine = fyyur.db.get_engine(fyyur.app, bind=g.get('database_bind'))
+        rows = await execute(db_session, fyyur.search_query(model, search_term, engine))
+        result = fyyur.search_results(rows.all())
+        if not database.may_be_stale():
+            search_cache.set(key, result)
+    return result
+
+
+# Counts, last change and both show sections of a venue or artist page
+async def show_sections(db_session, entity_column, entity_id, counterpart, columns, now, limit):
+    stats = await execute(db_session, fyyur.show_stats_query(entity_column, entity_id, counterpart, now))
+    upcoming = await execute(db_session, fyyur.show_section_query(entity_column, entity_id, counterpart, columns, now, True, limit))
+    past = await execute(db_session, fyyur.show_section_query(entity_column, entity_id, counterpart, columns, now, False, limit))
+    return fyyur.show_stats_from(stats.one()), upcoming.all(), past.all()
+
+
+async def genre_list(db_session, link_column, entity_id):
+    rows = await execute(db_session, fyyur.genre_names_query(link_column, [entity_id]))
+    return [name for entity_id, name in rows]
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@app.route('/venues')
+async def venues():
+    top = request.args.get('top', app.config.get('VENUES_PER_AREA'), type=int)
+    genre = request.args.get('genre')
+    try:
+        async with database.session() as db_session:
+            last_modified, etag = await list_validators(db_session, Venue)
+            response = not_modified_response(last_modified, etag, weak=True)
+            if response is not None:
+                return response
+            page = await keyset_page(db_session, fyyur.venue_areas_query(genre), fyyur.VENUE_AREA)
+            venues = []
+            if page.items:
+                venues = (await execute(db_session, fyyur.venues_in_areas_query(page.items, top, genre))).all()
+    except Exception:
+        print(sys.exc_info())
+        abort(400)
+    areas = fyyur.group_areas(page.items, venues)
+    response = await make_response(await render_template('pages/venues.html', areas=areas, page=page))
+    return set_validators(response, last_modified, etag, weak=True)
+
+
+@app.route('/venues/search', methods=['POST'])
+async def search_venues():
+    search_term = (await request.form).get('search_term')
+    try:
+        async with database.session() as db_session:
+            num_results, data = await cached_search(db_session, Venue, search_term)
+    except Exception:
+        print(sys.exc_info())
+        abort(400)
+    response = {
+        "count": num_results,
+        "data": data
+    }
+    return await render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+
+@app.route('/venues/<int:venue_id>')
+@cached_page
+async def show_venue(venue_id):
+    now = datetime.utcnow()
+    limit = request.args.get('limit', app.config.get('SHOWS_PER_SECTION'), type=int)
+    artist_columns = (Artist.id, Artist.name, Artist.image_link)
+    try:
+        async with database.session() as db_session:
+            venue = await db_session.get(Venue, venue_id)
+            if venue is None:
+                abort(404)
+            (upcoming_shows_count, past_shows_count, last_modified), upcoming, past = await show_sections(
+                db_session, Show.venue_id, venue_id, Artist, artist_columns, now, limit)
+            last_modified = fyyur.latest(venue.updated_at, last_modified)
+            response = not_modified_response(last_modified)
+            if response is not None:
+                return response
+            genres_list = await genre_list(db_session, venue_genres.c.venue_id, venue_id)
+    except HTTPException:
+        raise
+    except Exception:
+        print(sys.exc_info())
+        abort(400)
+    page_last_modified(last_modified)
+    data = venue_page(venue, genres_list, upcoming_shows_count, past_shows_count, upcoming, past)
+    return await render_template('pages/show_venue.html', venue=data)
+
+
+#  Artists
+#  ----------------------------------------------------------------
+
+@app.route('/artists')
+async def artists():
+    try:
+        async with database.session() as db_session:
+            last_modified, etag = await list_validators(db_session, Artist)
+            response = not_modified_response(last_modified, etag, weak=True)
+            if response is not None:
+                return response
+            query = fyyur.filter_genre(fyyur.artist_items_query(), Artist.genres, request.args.get('genre'))
+            page = await keyset_page(db_session, query, (Artist.name, Artist.id))
+    except Exception:
+        print(sys.exc_info())
+        abort(400)
+    response = await make_response(await render_template('pages/artists.html', artists=page.items, page=page))
+    return set_validators(response, last_modified, etag, weak=True)
+
+
+@app.route('/artists/search', methods=['POST'])
+async def search_artists():
+    search_term = (await request.form).get('search_term')
+    try:
+        async with database.session() as db_session:
+            num_results, data = await cached_search(db_session, Artist, search_term)
+    except Exception:
+        print(sys.exc_info())
+        abort(400)
+    response = {
+        "count": num_results,
+        "data": data
+    }
+    return await render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+
+@app.route('/artists/<int:artist_id>')
+@cached_page
+async def show_artist(artist_id):
+    now = datetime.utcnow()
+    limit = request.args.get('limit', app.config.get('SHOWS_PER_SECTION'), type=int)
+    venue_columns = (Venue.id, Venue.name)
+    try:
+        async with database.session() as db_session:
+            artist = await db_session.get(Artist, artist_id)
+            if artist is None:
+                abort(404)
+            (upcoming_shows_count, past_shows_count, last_modified), upcoming, past = await show_sections(
+                db_session, Show.artist_id, artist_id, Venue, venue_columns, now, limit)
+            last_modified = fyyur.latest(artist.updated_at, last_modified)
+            response = not_modified_response(last_modified)
+            if response is not None:
+                return response
+            genres_list = await genre_list(db_session, artist_genres.c.artist_id, artist_id)
+    except HTTPException:
+        raise
+    except Exception:
+        print(sys.exc_info())
+        abort(400)
+    page_last_modified(last_modified)
+    data = artist_page(artist, genres_list, upcoming_shows_count, past_shows_count, upcoming, past)
+    return await render_template('pages/show_artist.html', artist=data)
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@app.route('/shows')
+async def shows():
+    try:
+        async with database.session() as db_session:
+            last_modified, etag = await list_validators(db_session, Show, Venue, Artist)
+            response = not_modified_response(last_modified, etag, weak=True)
+            if response is not None:
+                return response
+            query = fyyur.filter_shows(fyyur.show_tiles_query(), **fyyur.show_filters(request.args))
+            page = await keyset_page(db_session, query, (Show.start_time, Show.id))
+    except Exception:
+        print(sys.exc_info())
+        abort(400)
+    show_list = [ShowTile(row) for row in page.items]
+    response = await make_response(await render_template('pages/shows.html', shows=show_list, page=page,
+                                                         weekend=fyyur.weekend_of(datetime.utcnow().date())))
+    return set_validators(response, last_modified, etag, weak=True)
+
+
+@app.errorhandler(404)
+async def not_found_error(error):
+    return await render_template('errors/404.html'), 404
+
+
+@app.errorhandler(500)
+async def server_error(error):
+    return await render_template('errors/500.html'), 500
+
+
+#----------------------------------------------------------------------------#
+# ASGI entry point.
+#----------------------------------------------------------------------------#
+
+# Requests the Quart app has a route for are served here; the rest go to the
+# Flask app, on a pool of threads as a WSGI server would run it
+def serves(scope):
+    try:
+        app.url_map.bind('').match(scope['path'], method=scope['method'])
+    except HTTPException:
+        return False
+    return True
+
+
+def make_asgi(wsgi_workers=10):
+    wsgi = WSGIMiddleware(fyyur.app, workers=wsgi_workers)
+
+    async def asgi(scope, receive, send):
+        if scope['type'] != 'http' or serves(scope):
+            await app(scope, receive, send)
+        else:
+            await wsgi(scope, receive, send)
+    return asgi
+
+
+asgi = make_asgi()
@@ -0,0 +1,421 @@
+#----------------------------------------------------------------------------#
+# Benchmarks.
+#
+#   python benchmark.py list-pages --rows 10000
+#   python benchmark.py datetime-filter --rows 100000
+#   python benchmark.py routes --rows 100000 --json runs/before.json
+#   python benchmark.py serving --rows 100000 --concurrency 64 --workers 4 --query-latency 5
+#
+# Each benchmark seeds a throwaway database (in-memory SQLite unless
+# --database-url is given; a scratch file for `serving`, as the async engine
+# cannot reach an in-memory one) and prints its results. `serving` needs
+# requirements-async.txt installed. The database's tables are dropped
+# afterwards, so any other --database-url is refused unless
+# --i-know-this-drops-tables is given too.
+#----------------------------------------------------------------------------#
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+from sqlalchemy.engine import Engine, make_url
+
+from app import app, db, Venue, Artist, Show, ShowTile, show_tiles_query, artist_items_query, default_artist_image_link
+from app import search_cache, page_cache
+from app import DATETIME_FORMATS, datetime_pattern, datetime_locale, format_datetime, format_datetime_cached
+from seed import generate_catalog
+from testing import count_queries
+
+# Run fn once, returning (seconds, peak bytes allocated, rows returned)
+def measure(fn):
+    db.session.expunge_all()
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = fn()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    db.session.expunge_all()
+    return elapsed, peak, len(rows)
+
+def report(name, result, per):
+    elapsed, peak, rows = result
+    scale = float(per) / rows if rows else 0
+    print('  %-28s %8.1f ms  %9.1f KiB peak  (per %d rows)' % (
+        name, elapsed * 1000 * scale, peak / 1024.0 * scale, per))
+
+#  List pages
+#  ----------------------------------------------------------------
+
+# The artist and show lists as they were built before column projection
+def artists_entities():
+    return Artist.query.all()
+
+def shows_entities():
+    shows = []
+    for show in Show.query.all():
+        shows.append({
+            "venue_id": show.venue_id,
+            "venue_name": show.venue.name,
+            "artist_id": show.artist_id,
+            "artist_name": show.artist.name,
+            "artist_image_link": show.artist.image_link or default_artist_image_link,
+            "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
+        })
+    return shows
+
+def artists_projected():
+    return artist_items_query().all()
+
+def shows_projected():
+    return [ShowTile(row) for row in show_tiles_query().all()]
+
+def list_pages(args):
+    generate_catalog(max(1, args.rows // 10), args.rows, args.rows, seed=args.seed)
+    per = 10000
+    print('artists (%d rows)' % args.rows)
+    report('full entities', measure(artists_entities), per)
+    report('projected rows', measure(artists_projected), per)
+    print('shows (%d rows)' % args.rows)
+    report('full entities + dicts', measure(shows_entities), per)
+    report('projected ShowTile', measure(shows_projected), per)
+
+#  Datetime filter
+#  ----------------------------------------------------------------
+
+# The filter as it was: re-parse the formatted string and let babel rebuild
+# the pattern on every call
+def format_datetime_parsed(value, format='full'):
+    return babel.dates.format_datetime(dateutil.parser.parse(value), DATETIME_FORMATS.get(format, format))
+
+def report_calls(name, fn, calls):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print('  %-28s %8.2f us/call  %8.1f ms total' % (name, elapsed * 1e6 / calls, elapsed * 1000))
+
+def datetime_filter(args):
+    # a season of shows starting on the hour, so start times repeat the way
+    # they do across real pages
+    start = datetime(2020, 1, 1, 18)
+    times = [start + timedelta(days=random.randint(0, 364), hours=random.randint(0, 5)) for i in range(args.rows)]
+    strings = [t.strftime('%Y-%m-%d %H:%M:%S') for t in times]
+    locale = datetime_locale(babel.dates.LC_TIME)
+    print('datetime filter (%d values, %d distinct)' % (len(times), len(set(times))))
+    report_calls('dateutil + babel per call', lambda: [format_datetime_parsed(value) for value in strings], len(times))
+    report_calls('compiled pattern', lambda: [datetime_pattern('full').apply(value, locale) for value in times], len(times))
+    format_datetime_cached.cache_clear()
+    report_calls('compiled + LRU (cold)', lambda: [format_datetime(value, 'full') for value in times], len(times))
+    report_calls('compiled + LRU (warm)', lambda: [format_datetime(value, 'full') for value in times], len(times))
+
+#  Routes
+#  ----------------------------------------------------------------
+
+# The busiest and a typical venue and artist, so detail pages are measured
+# at both ends of the popularity curve
+def sample_ids(column):
+    counts = db.session.query(column, db.func.count(Show.id)).group_by(column).order_by(db.func.count(Show.id).desc()).all()
+    return counts[0][0], counts[len(counts) // 2][0]
+
+def route_cases():
+    busy_venue, typical_venue = sample_ids(Show.venue_id)
+    busy_artist, typical_artist = sample_ids(Show.artist_id)
+    show_id = db.session.query(db.func.min(Show.id)).scalar()
+    return [
+        ('home', 'GET', '/', None),
+        ('venues', 'GET', '/venues', None),
+        ('venues top 5', 'GET', '/venues?top=5', None),
+        ('venue (busiest)', 'GET', '/venues/%d' % busy_venue, None),
+        ('venue (typical)', 'GET', '/venues/%d' % typical_venue, None),
+        ('venue search', 'POST', '/venues/search', {'search_term': 'Blue'}),
+        ('venue edit form', 'GET', '/venues/%d/edit' % typical_venue, None),
+        ('artists', 'GET', '/artists', None),
+        ('artists by genre', 'GET', '/artists?genre=Jazz', None),
+        ('artist (busiest)', 'GET', '/artists/%d' % busy_artist, None),
+        ('artist (typical)', 'GET', '/artists/%d' % typical_artist, None),
+        ('artist search', 'POST', '/artists/search', {'search_term': 'Band'}),
+        ('artist edit form', 'GET', '/artists/%d/edit' % typical_artist, None),
+        ('shows', 'GET', '/shows', None),
+        ('shows calendar', 'GET', '/shows/calendar', None),
+        ('show', 'GET', '/shows/%d' % show_id, None),
+        ('show form', 'GET', '/shows/create', None),
+        ('api shows page', 'GET', '/api/v1/shows?per_page=100', None),
+        ('api venues page', 'GET', '/api/v1/venues?per_page=100&fields=id,name,genres', None),
+        ('api artists page', 'GET', '/api/v1/artists?per_page=100', None),
+        ('api free slots', 'GET', '/api/v1/venues/%d/free-slots' % busy_venue, None),
+        ('export venues csv', 'GET', '/export/venues?format=csv', None),
+        ('export artists', 'GET', '/export/artists', None),
+        ('export shows gzip', 'GET', '/export/shows?gzip=1', None),
+    ]
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[int(round((len(values) - 1) * fraction))]
+
+def request_once(client, method, path, data):
+    # each request gets a fresh session, as it would in a server
+    db.session.remove()
+    response = client.open(path, method=method, data=data)
+    response.get_data()
+    return response
+
+def measure_route(client, method, path, data, iterations, warm):
+    timings = []
+    for i in range(iterations):
+        if not warm:
+            search_cache.clear()
+            page_cache.clear()
+        started = time.perf_counter()
+        response = request_once(client, method, path, data)
+        timings.append(time.perf_counter() - started)
+    if not warm:
+        search_cache.clear()
+        page_cache.clear()
+    with count_queries(db.engine) as counter:
+        request_once(client, method, path, data)
+    if not warm:
+        search_cache.clear()
+        page_cache.clear()
+    tracemalloc.start()
+    request_once(client, method, path, data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'status': response.status_code,
+        'p50_ms': percentile(timings, 0.5) * 1000,
+        'p95_ms': percentile(timings, 0.95) * 1000,
+        'mean_ms': sum(timings) / len(timings) * 1000,
+        'queries': counter.count,
+        'peak_kib': peak / 1024.0,
+    }
+
+def routes(args):
+    app.config.update(SLOW_QUERY_THRESHOLD_MS=None, N_PLUS_ONE_THRESHOLD=None)
+    generate_catalog(max(1, args.rows // 100), max(1, args.rows // 10), args.rows, seed=args.seed)
+    client = app.test_client()
+    results = []
+    print('routes (%d shows, %d iterations, %s caches)' % (args.rows, args.iterations, 'warm' if args.warm else 'cold'))
+    print('  %-20s %6s %9s %9s %8s %10s' % ('route', 'status', 'p50 ms', 'p95 ms', 'queries', 'peak KiB'))
+    for name, method, path, data in route_cases():
+        result = measure_route(client, method, path, data, args.iterations, args.warm)
+        result.update(name=name, method=method, path=path)
+        results.append(result)
+        print('  %-20s %6d %9.2f %9.2f %8d %10.1f' % (
+            name, result['status'], result['p50_ms'], result['p95_ms'], result['queries'], result['peak_kib']))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'run': {
+                    'benchmark': 'routes',
+                    'started': datetime.utcnow().isoformat(),
+                    'database': db.engine.dialect.name,
+                    'rows': args.rows,
+                    'seed': args.seed,
+                    'iterations': args.iterations,
+                    'warm': args.warm,
+                },
+                'routes': results,
+            }, f, indent=2)
+        print('results written to %s' % args.json)
+
+#  Serving: sync and async
+#  ----------------------------------------------------------------
+
+# The same read-only load, `concurrency` users each making the same requests,
+# served by the Flask views with a fixed number of workers and by the async
+# views of async_app.py from one event loop. Every request is timed from the
+# moment its user sends it, so waiting for a free worker counts.
+
+# A stand-in for a database across a network: every statement waits
+# `latency` seconds in the thread that runs it, the request's worker for the
+# Flask app and the driver's own thread for aiosqlite, so the event loop is
+# free meanwhile just as it would be waiting on a socket
+def add_query_latency(latency):
+    def delay(statement):
+        time.sleep(latency)
+
+    @db.event.listens_for(Engine, 'connect')
+    def trace_statements(dbapi_connection, connection_record):
+        if isinstance(dbapi_connection, sqlite3.Connection):
+            dbapi_connection.set_trace_callback(delay)
+        elif hasattr(dbapi_connection, 'run_async'):
+            dbapi_connection.run_async(lambda connection: connection.set_trace_callback(delay))
+
+# One user's requests: mostly venue and artist pages picked across the
+# catalog, some list pages and searches
+def user_requests(rng, count, venue_ids, artist_ids):
+    requests = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.3:
+            requests.append(('GET', '/venues/%d' % rng.choice(venue_ids), None))
+        elif roll < 0.6:
+            requests.append(('GET', '/artists/%d' % rng.choice(artist_ids), None))
+        elif roll < 0.8:
+            requests.append(('GET', rng.choice(['/venues', '/artists', '/shows']), None))
+        else:
+            path = rng.choice(['/venues/search', '/artists/search'])
+            requests.append(('POST', path, {'search_term': rng.choice(['Blue', 'Hall', 'Band', 'Neon', 'Echo', 'Kids'])}))
+    return requests
+
+def serving_summary(mode, timings, elapsed):
+    latencies = [seconds for seconds, status in timings]
+    return {
+        'mode': mode,
+        'requests': len(timings),
+        'errors': sum(status >= 400 for seconds, status in timings),
+        'throughput': len(timings) / elapsed,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+def serve_sync(sequences, workers):
+    client = app.test_client()
+    free_workers = threading.BoundedSemaphore(workers)
+    timings = []
+
+    def user(requests):
+        for method, path, data in requests:
+            started = time.perf_counter()
+            with free_workers:
+                response = client.open(path, method=method, data=data)
+                response.get_data()
+            timings.append((time.perf_counter() - started, response.status_code))
+
+    threads = [threading.Thread(target=user, args=(requests,)) for requests in sequences]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings, time.perf_counter() - started
+
+async def serve_async(async_app, sequences):
+    timings = []
+    async with async_app.test_app() as test_app:
+        client = test_app.test_client()
+
+        async def user(requests):
+            for method, path, data in requests:
+                started = time.perf_counter()
+                response = await client.open(path, method=method, form=data)
+                await response.get_data()
+                timings.append((time.perf_counter() - started, response.status_code))
+
+        started = time.perf_counter()
+        await asyncio.gather(*[user(requests) for requests in sequences])
+        return timings, time.perf_counter() - started
+
+def serving(args):
+    import async_app
+    app.config.update(SLOW_QUERY_THRESHOLD_MS=None, N_PLUS_ONE_THRESHOLD=None)
+    generate_catalog(max(1, args.rows // 100), max(1, args.rows // 10), args.rows, seed=args.seed)
+    venue_ids = [venue_id for venue_id, in db.session.query(Venue.id)]
+    artist_ids = [artist_id for artist_id, in db.session.query(Artist.id)]
+    db.session.remove()
+    rng = random.Random(args.seed)
+    sequences = [user_requests(rng, args.iterations, venue_ids, artist_ids) for user in range(args.concurrency)]
+    if args.query_latency:
+        add_query_latency(args.query_latency / 1000.0)
+
+    print('serving (%d shows, %d users x %d requests, %d sync workers, %.1f ms per statement)' % (
+        args.rows, args.concurrency, args.iterations, args.workers, args.query_latency))
+    print('  %-28s %8s %7s %9s %9s %9s' % ('mode', 'req/s', 'errors', 'p50 ms', 'p95 ms', 'p99 ms'))
+    results = []
+    for mode in ('sync', 'async'):
+        # both modes start from cold caches and see the same requests
+        search_cache.clear()
+        page_cache.clear()
+        if mode == 'sync':
+            result = serving_summary('sync (%d workers)' % args.workers, *serve_sync(sequences, args.workers))
+        else:
+            result = serving_summary('async (1 event loop)', *asyncio.run(serve_async(async_app.app, sequences)))
+        results.append(result)
+        print('  %-28s %8.1f %7d %9.1f %9.1f %9.1f' % (
+            result['mode'], result['throughput'], result['errors'], result['p50_ms'], result['p95_ms'], result['p99_ms']))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'run': {
+                    'benchmark': 'serving',
+                    'started': datetime.utcnow().isoformat(),
+                    'database': db.engine.dialect.name,
+                    'rows': args.rows,
+                    'seed': args.seed,
+                    'concurrency': args.concurrency,
+                    'requests_per_user': args.iterations,
+                    'workers': args.workers,
+                    'query_latency_ms': args.query_latency,
+                },
+                'modes': results,
+            }, f, indent=2)
+        print('results written to %s' % args.json)
+
+#----------------------------------------------------------------------------#
+# Launch.
+#----------------------------------------------------------------------------#
+
+BENCHMARKS = {
+    'list-pages': list_pages,
+    'datetime-filter': datetime_filter,
+    'routes': routes,
+    'serving': serving,
+}
+
+# In-memory SQLite databases go away with the process
+def is_scratch_database(url):
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+def main():
+    parser = argparse.ArgumentParser(description='Fyyur benchmarks')
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--database-url', default='sqlite://',
+                        help='scratch database to run against; its tables are dropped afterwards')
+    parser.add_argument('--i-know-this-drops-tables', dest='drop_tables', action='store_true',
+                        help='run against a --database-url other than in-memory SQLite')
+    parser.add_argument('--iterations', type=int, default=20,
+                        help='requests timed per route, or made per user for serving')
+    parser.add_argument('--warm', action='store_true', help='keep the search and page caches between requests')
+    parser.add_argument('--json', help='also write the route or serving results to this JSON file')
+    parser.add_argument('--concurrency', type=int, default=32, help='simulated users for serving')
+    parser.add_argument('--workers', type=int, default=4, help='Flask workers (threads) for serving')
+    parser.add_argument('--query-latency', type=float, default=0,
+                        help='milliseconds added to every SQLite statement for serving, as a network would')
+    args = parser.parse_args()
+    if not is_scratch_database(args.database_url) and not args.drop_tables:
+        parser.error('every table of %s would be dropped afterwards; add --i-know-this-drops-tables '
+                     'if it is a scratch database' % args.database_url)
+
+    random.seed(args.seed)
+    scratch = None
+    if args.benchmark == 'serving' and args.database_url == 'sqlite://':
+        handle, scratch = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        args.database_url = 'sqlite:///' + scratch
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+    with app.app_context():
+        db.create_all()
+        try:
+            BENCHMARKS[args.benchmark](args)
+        finally:
+            db.session.remove()
+            db.drop_all()
+            if scratch:
+                os.remove(scratch)
+
+if __name__ == '__main__':
+    main()
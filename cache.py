@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+
+#----------------------------------------------------------------------------#
+# Cache backends.
+#----------------------------------------------------------------------------#
+
+# Keys are tuples whose first item is a namespace (e.g. 'venues'), so a write
+# can drop everything cached for one kind of entity with clear(namespace).
+# Entries can also carry tags (e.g. 'venue:3') naming the rows they were built
+# from, so a write to one row drops exactly the entries that depend on it.
+#
+# Backends implement this interface; LRUCache keeps entries in-process, and a
+# backend talking to Redis or memcached can be dropped in to share entries
+# between workers.
+class CacheBackend(object):
+
+    # Return the cached value, or `default` on a miss or expired entry
+    def get(self, key, default=None):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None, tags=()):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    # Drop every entry of a namespace, or all entries when it is None
+    def clear(self, namespace=None):
+        raise NotImplementedError
+
+    # Drop every entry carrying any of the given tags
+    def invalidate_tags(self, *tags):
+        raise NotImplementedError
+
+    # Counters describing how well the cache is doing
+    def stats(self):
+        raise NotImplementedError
+
+# Thread-safe, size-bounded LRU cache whose entries also expire after `ttl`
+# seconds
+class LRUCache(CacheBackend):
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None, tags=()):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (expires_at, value, frozenset(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self, namespace=None):
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+                self._tags.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == namespace]:
+                    self._remove(key)
+
+    def invalidate_tags(self, *tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    # Drop an entry and its tag links; the caller holds the lock
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
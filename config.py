@@ -3,14 +3,140 @@ SECRET_KEY = os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+# Profile to run with, from the FYYUR_ENV environment variable:
+#   development  debug mode on a local SQLite file
+#   production   PostgreSQL behind a sized connection pool
+FYYUR_ENV = os.environ.get('FYYUR_ENV', 'development')
+if FYYUR_ENV not in ('development', 'production'):
+    raise ValueError('FYYUR_ENV must be development or production, not %r' % FYYUR_ENV)
+
 # Enable debug mode.
-DEBUG = True
+DEBUG = FYYUR_ENV == 'development'
 
-# Connect to the database
+# Connect to the database. DATABASE_URL overrides the profile's default.
+if FYYUR_ENV == 'development':
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'fyyur.db'))
+else:
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://Rachel@localhost:5432/fyyur')
 
+SQLALCHEMY_TRACK_MODIFICATIONS = False
 
-# TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgresql://Rachel@localhost:5432/fyyur'
+# Read replicas, as a comma separated DATABASE_REPLICA_URLS; each becomes a
+# bind named replica_N. GET requests (and the pages of the async read path,
+# async_app.py) read from one of them, writes go to the primary, and a client
+# that wrote reads from the primary for REPLICA_LAG_WINDOW seconds afterwards
+# (which should exceed the replicas' usual lag), through the
+# REPLICA_PIN_COOKIE cookie. To try it locally, point DATABASE_REPLICA_URLS at
+# a copy of the SQLite file or a second PostgreSQL instance.
+DATABASE_REPLICA_URLS = [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url]
+SQLALCHEMY_BINDS = dict(('replica_%d' % i, url) for i, url in enumerate(DATABASE_REPLICA_URLS))
+REPLICA_BINDS = sorted(SQLALCHEMY_BINDS)
+REPLICA_LAG_WINDOW = int(os.environ.get('REPLICA_LAG_WINDOW', 5))
+REPLICA_PIN_COOKIE = 'fyyur_primary'
 
-SQLALCHEMY_TRACK_MODIFICATIONS = False
+# Database of the async read path (async_app.py). Unset, it is the URI above
+# with its driver swapped for aiosqlite or asyncpg.
+SQLALCHEMY_ASYNC_DATABASE_URI = os.environ.get('ASYNC_DATABASE_URL')
+
+# Connection pool, per worker process. Size workers so that
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays under the database's
+# max_connections; /debug/pool shows how many connections are in use.
+#   DB_POOL_SIZE             connections kept open
+#   DB_MAX_OVERFLOW          extra connections opened under load, then closed
+#   DB_POOL_TIMEOUT          seconds to wait for a free connection before failing
+#   DB_POOL_RECYCLE          seconds after which a connection is replaced, so
+#                            idle ones are not cut by the server or a proxy
+#   DB_STATEMENT_TIMEOUT_MS  PostgreSQL aborts statements running longer (0 = off)
+# Connections are pinged before use, so ones dropped by a database restart
+# are replaced instead of failing a request. SQLite files are opened per
+# use and take none of these.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5 if FYYUR_ENV == 'development' else 10))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10 if FYYUR_ENV == 'development' else 5))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30 if FYYUR_ENV == 'development' else 5))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0 if FYYUR_ENV == 'development' else 5000))
+
+# Engine options for a database, from its URI; each bind gets those of its
+# own database, as a replica need not be the same kind as the primary
+def engine_options(uri):
+    if uri.startswith('sqlite'):
+        return {}
+    options = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True,
+    }
+    if DB_STATEMENT_TIMEOUT_MS and uri.startswith('postgres'):
+        options['connect_args'] = {'options': '-c statement_timeout=%d' % DB_STATEMENT_TIMEOUT_MS}
+    return options
+
+SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+SQLALCHEMY_BIND_ENGINE_OPTIONS = dict((bind, engine_options(url)) for bind, url in SQLALCHEMY_BINDS.items())
+
+# Maximum number of past/upcoming shows listed on venue and artist pages
+# (None lists them all). Can be overridden per request with ?limit=N.
+SHOWS_PER_SECTION = None
+
+# Number of rows per page on the /artists and /shows lists, and of city/state
+# areas per page on /venues.
+# ?per_page=N overrides it per request, up to MAX_PAGE_SIZE.
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Maximum number of venues listed per city/state area on /venues (None lists
+# them all). ?top=N overrides it per request.
+VENUES_PER_AREA = None
+
+# Shows listed per day on the /shows/calendar month view; the rest of a
+# busy day is linked to
+CALENDAR_SHOWS_PER_DAY = 5
+
+# Range /api/v1/venues/<id>/free-slots searches when ?to= is not given, and
+# the longest range it accepts, in days
+FREE_SLOTS_DEFAULT_DAYS = 7
+FREE_SLOTS_MAX_DAYS = 92
+
+# Maximum number of matches listed on the venue and artist search pages
+SEARCH_RESULT_LIMIT = 50
+
+# Cache for venue and artist search results. The backend is any class
+# implementing cache.CacheBackend; entries expire after SEARCH_CACHE_TTL
+# seconds and are dropped whenever a venue or artist is written.
+SEARCH_CACHE_BACKEND = 'cache.LRUCache'
+SEARCH_CACHE_SIZE = 1024
+SEARCH_CACHE_TTL = 60
+
+# Cache for the rendered venue, artist and show detail pages, served with
+# ETags. Entries are dropped when a row they were built from is written, and
+# expire after PAGE_CACHE_TTL seconds or when a listed upcoming show starts.
+PAGE_CACHE_BACKEND = 'cache.LRUCache'
+PAGE_CACHE_SIZE = 2048
+PAGE_CACHE_TTL = 300
+
+# Rows read per round-trip when the JSON API streams NDJSON
+API_STREAM_BATCH_SIZE = 1000
+
+# Rows written per transaction by `flask import`
+IMPORT_BATCH_SIZE = 1000
+
+# Most ids one DELETE /api/v1/venues or /api/v1/artists request may remove
+MAX_BULK_DELETE = 1000
+
+# Formatted datetimes kept by the `datetime` template filter
+DATETIME_FILTER_CACHE_SIZE = 4096
+
+# Statements taking at least this many milliseconds are logged with their
+# parameters, endpoint and calling line (None turns the log off)
+SLOW_QUERY_THRESHOLD_MS = 100 if FYYUR_ENV == 'development' else 500
+
+# A request running the same statement more than this many times is flagged
+# as a likely N+1 loop: logged as a warning, or raised in tests (None turns
+# the check off)
+N_PLUS_ONE_THRESHOLD = 10 if FYYUR_ENV == 'development' else None
 
+# Serve /metrics, /debug/cache and /debug/pool. They show per-endpoint SQL
+# timings, cache counters and connection pool state, so they are off in
+# production unless EXPOSE_DIAGNOSTICS=1.
+EXPOSE_DIAGNOSTICS = os.environ.get('EXPOSE_DIAGNOSTICS', '1' if DEBUG else '0') == '1'
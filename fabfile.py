@@ -6,9 +6,7 @@ from fabric.contrib.console import confirm
 
 def test():
     with settings(warn_only=True):
-        result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
-        )
+        result = local("python -m pytest -q", capture=True)
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
 
@@ -27,6 +25,16 @@ def prepare():
     commit()
     push()
 
+# benchmark every route against a synthetic catalog (in-memory SQLite
+# unless database_url is given) and save the results for comparing runs.
+# The database's tables are dropped afterwards, so another database_url also
+# needs drop_tables=yes
+
+
+def benchmark(rows=100000, output='benchmark.json', database_url='sqlite://', drop_tables=''):
+    local("python benchmark.py routes --rows {} --json {} --database-url '{}'{}".format(
+        rows, output, database_url, ' --i-know-this-drops-tables' if drop_tables == 'yes' else ''))
+
 # deploy to heroku
 
 
@@ -39,9 +47,7 @@ def heroku():
 
 
 def heroku_test():
-    local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
-    )
+    local("heroku run python -m pytest -q")
 
 
 def deploy():
@@ -1,7 +1,12 @@
 from datetime import datetime
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, RadioField, TextAreaField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, RadioField, TextAreaField, IntegerField
+from wtforms.validators import DataRequired, AnyOf, URL, NumberRange
+
+# Length of a show in minutes. Double-booking checks only look back
+# MAX_SHOW_MINUTES from a new show's start, so no show may be longer.
+DEFAULT_SHOW_MINUTES = 120
+MAX_SHOW_MINUTES = 12 * 60
 
 class ShowForm(Form):
     artist_id = StringField(
@@ -13,7 +18,12 @@ class ShowForm(Form):
     start_time = DateTimeField(
         'start_time',
         validators=[DataRequired()],
-        default= datetime.today()
+        default=datetime.today
+    )
+    duration = IntegerField(
+        'duration',
+        validators=[DataRequired(), NumberRange(min=1, max=MAX_SHOW_MINUTES)],
+        default=DEFAULT_SHOW_MINUTES
     )
 
 class VenueForm(Form):
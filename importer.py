@@ -0,0 +1,261 @@
+#----------------------------------------------------------------------------#
+# Bulk import.
+#
+#   flask import shows season.csv --batch-size 5000 --rejects rejected.jsonl
+#
+# Rows are read from CSV (one header row) or JSONL, checked with the same
+# rules as the HTML forms, and written a batch per transaction: venues and
+# artists through one ORM flush per batch, shows through a single executemany
+# (or COPY on PostgreSQL). A show's `duration` in minutes defaults to
+# DEFAULT_SHOW_MINUTES. A show overlapping another show of its venue or
+# artist, in the database or earlier in the same batch, is rejected; on
+# PostgreSQL the exclusion constraints also reject a batch racing a booking.
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+import time
+from datetime import datetime, timedelta
+
+from app import db, Venue, Artist, Show, Genre, venue_genres, artist_genres, search_cache, page_cache, form_errors, \
+    overlapping_bookings_query
+from forms import VenueForm, ArtistForm, ShowForm
+
+# What each kind of row becomes, and the form whose rules it must pass
+IMPORTS = {
+    'venues': {'form': VenueForm, 'model': Venue, 'links': venue_genres, 'link_column': 'venue_id'},
+    'artists': {'form': ArtistForm, 'model': Artist, 'links': artist_genres, 'link_column': 'artist_id'},
+    'shows': {'form': ShowForm, 'model': Show},
+}
+
+SHOW_COLUMNS = ('artist_id', 'venue_id', 'start_time', 'end_time', 'updated_at', 'version')
+
+
+class ImportResult(object):
+
+    def __init__(self):
+        self.read = 0
+        self.imported = 0
+        self.rejected = []
+        self.started = time.perf_counter()
+
+    def reject(self, line, row, errors):
+        self.rejected.append({'line': line, 'errors': errors, 'row': row})
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.imported / self.elapsed if self.elapsed else 0
+
+
+# Yield (line number, row dict) from a CSV or JSONL file
+def read_rows(path, file_format):
+    with open(path, newline='') as f:
+        if file_format == 'csv':
+            for row in csv.DictReader(f):
+                yield row
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+# Genres may come as a list (JSONL) or a comma separated cell (CSV)
+def genre_list(value):
+    if isinstance(value, str):
+        value = value.split(',')
+    return [name.strip() for name in value or [] if name and name.strip()]
+
+
+# Check a row against the same rules as the HTML form
+def validate(kind, row):
+    values = dict(row)
+    if 'genres' in values:
+        values['genres'] = genre_list(values['genres'])
+    for name in ('seeking_talent', 'seeking_venue'):
+        if str(values.get(name)).lower() in ('true', '1'):
+            values[name] = 'True'
+        elif name in values:
+            values[name] = 'False'
+    # a show with a blank duration gets the form's default, but a start time
+    # is never filled in for it
+    if not str(values.get('duration', 'x')).strip():
+        del values['duration']
+    if kind == 'shows' and values.get('start_time') is None:
+        values['start_time'] = ''
+    return form_errors(IMPORTS[kind]['form'], values)
+
+
+def venue_values(form):
+    return dict(name=form.name.data, city=form.city.data, state=form.state.data,
+                address=form.address.data, phone=form.phone.data, image_link=form.image_link.data,
+                facebook_link=form.facebook_link.data, website=form.website.data,
+                seeking_talent=form.seeking_talent.data == 'True',
+                seeking_description=form.seeking_description.data)
+
+
+def artist_values(form):
+    return dict(name=form.name.data, city=form.city.data, state=form.state.data,
+                phone=form.phone.data, image_link=form.image_link.data,
+                venue_image_link=form.venue_image_link.data,
+                facebook_link=form.facebook_link.data, website=form.website.data,
+                seeking_venue=form.seeking_venue.data == 'True',
+                seeking_description=form.seeking_description.data)
+
+
+# Genre ids by name, creating the genres that do not exist yet. `cache` keeps
+# the ids across batches so each genre is looked up once per import.
+def genre_ids(names, cache):
+    missing = [name for name in set(names) if name not in cache]
+    if missing:
+        cache.update(db.session.query(Genre.name, Genre.id).filter(Genre.name.in_(missing)))
+        new = [name for name in missing if name not in cache]
+        if new:
+            db.session.execute(Genre.__table__.insert(), [{'name': name} for name in new])
+            cache.update(db.session.query(Genre.name, Genre.id).filter(Genre.name.in_(new)))
+    return [cache[name] for name in names]
+
+
+def insert_entities(kind, batch, genre_cache):
+    spec = IMPORTS[kind]
+    values = venue_values if kind == 'venues' else artist_values
+    entities = [spec['model'](**values(form)) for line, row, form in batch]
+    db.session.add_all(entities)
+    db.session.flush()
+    links = []
+    for entity, (line, row, form) in zip(entities, batch):
+        for genre_id in genre_ids(form.genres.data, genre_cache):
+            links.append({spec['link_column']: entity.id, 'genre_id': genre_id})
+    if links:
+        db.session.execute(spec['links'].insert(), links)
+
+
+def insert_shows(batch):
+    now = datetime.utcnow()
+    rows = [(int(form.artist_id.data), int(form.venue_id.data), form.start_time.data,
+             form.start_time.data + timedelta(minutes=form.duration.data), now, 1)
+            for line, row, form in batch]
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        cursor = connection.connection.cursor()
+        cursor.copy_expert('COPY shows (%s) FROM STDIN WITH (FORMAT csv)' % ', '.join(SHOW_COLUMNS), buffer)
+    else:
+        db.session.execute(Show.__table__.insert(), [dict(zip(SHOW_COLUMNS, row)) for row in rows])
+
+
+# Reject shows whose venue or artist is not in the database, with one IN
+# query per batch for each
+def check_show_references(batch, result):
+    ids = {'artist_id': set(), 'venue_id': set()}
+    for line, row, form in batch:
+        for name in ids:
+            try:
+                ids[name].add(int(form[name].data))
+            except (TypeError, ValueError):
+                pass
+    existing = {
+        'artist_id': set(id for id, in db.session.query(Artist.id).filter(Artist.id.in_(ids['artist_id']))),
+        'venue_id': set(id for id, in db.session.query(Venue.id).filter(Venue.id.in_(ids['venue_id']))),
+    }
+    valid = []
+    for line, row, form in batch:
+        errors = {}
+        for name in existing:
+            try:
+                if int(form[name].data) not in existing[name]:
+                    errors[name] = ['No such %s.' % name.split('_')[0]]
+            except (TypeError, ValueError):
+                errors[name] = ['Not a valid id.']
+        if errors:
+            result.reject(line, row, errors)
+        else:
+            valid.append((line, row, form))
+    return valid
+
+
+# Reject shows that overlap a show of their venue or artist, either one in
+# the database or one earlier in the batch. Rows are taken in start time
+# order, and the existing shows are read with one query for the batch's
+# venues and one for its artists, over the time the batch spans.
+def check_show_overlaps(batch, result):
+    shows = sorted(((form.start_time.data, form.start_time.data + timedelta(minutes=form.duration.data),
+                     line, row, form) for line, row, form in batch), key=lambda show: (show[0], show[2]))
+    if not shows:
+        return []
+    first = shows[0][0]
+    last = max(end for start, end, line, row, form in shows)
+    booked = {}
+    for column in (Show.venue_id, Show.artist_id):
+        entity_ids = set(int(form[column.key].data) for start, end, line, row, form in shows)
+        for entity_id in entity_ids:
+            booked[column.key, entity_id] = []
+        for entity_id, booked_start, booked_end in overlapping_bookings_query(column, entity_ids, first, last):
+            booked[column.key, entity_id].append((booked_start, booked_end))
+    valid = []
+    for start, end, line, row, form in shows:
+        errors = {}
+        for name in ('venue_id', 'artist_id'):
+            for booked_start, booked_end in booked[name, int(form[name].data)]:
+                if booked_start < end and booked_end > start:
+                    errors[name] = ['The %s is already booked from %s to %s.' % (
+                        name.split('_')[0], booked_start, booked_end)]
+                    break
+        if errors:
+            result.reject(line, row, errors)
+        else:
+            for name in ('venue_id', 'artist_id'):
+                booked[name, int(form[name].data)].append((start, end))
+            valid.append((line, row, form))
+    return valid
+
+
+def write_batch(kind, batch, result, genre_cache):
+    if kind == 'shows':
+        batch = check_show_overlaps(check_show_references(batch, result), result)
+    if not batch:
+        return
+    try:
+        if kind == 'shows':
+            insert_shows(batch)
+        else:
+            insert_entities(kind, batch, genre_cache)
+        db.session.commit()
+        result.imported += len(batch)
+    except Exception as e:
+        db.session.rollback()
+        genre_cache.clear()
+        for line, row, form in batch:
+            result.reject(line, row, {'database': [str(e).splitlines()[0]]})
+
+
+def import_file(kind, path, file_format=None, batch_size=1000, progress=None):
+    file_format = file_format or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    result = ImportResult()
+    genre_cache = {}
+    batch = []
+    # Line 1 of a CSV file is its header
+    first_line = 2 if file_format == 'csv' else 1
+    for line, row in enumerate(read_rows(path, file_format), first_line):
+        result.read += 1
+        form, errors = validate(kind, row)
+        if errors:
+            result.reject(line, row, errors)
+        else:
+            batch.append((line, row, form))
+        if len(batch) >= batch_size:
+            write_batch(kind, batch, result, genre_cache)
+            batch = []
+            if progress:
+                progress(result)
+    write_batch(kind, batch, result, genre_cache)
+    db.session.close()
+    search_cache.clear()
+    page_cache.clear()
+    return result
@@ -0,0 +1,266 @@
+import os
+import re
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from collections import Counter
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Request metrics.
+#
+# Every request records how many queries it ran, how long they took, how
+# long its templates took to render and how long it took overall, into
+# histograms labelled by endpoint. render() prints them in the Prometheus
+# text format. The numbers are per worker process; Prometheus sums them
+# across workers when it scrapes each one.
+#----------------------------------------------------------------------------#
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    return ','.join('%s="%s"' % (name, escape_label(value)) for name, value in labels)
+
+
+class Histogram(object):
+
+    def __init__(self, name, help, buckets, labels):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        # label values -> [count per bucket..., count above the last, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s histogram' % self.name]
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        for key, values in series:
+            labels = list(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values):
+                cumulative += count
+                lines.append('%s_bucket{%s} %d' % (self.name, format_labels(labels + [('le', bound)]), cumulative))
+            lines.append('%s_sum{%s} %r' % (self.name, format_labels(labels), values[-1]))
+            lines.append('%s_count{%s} %d' % (self.name, format_labels(labels), cumulative))
+        return lines
+
+
+class RequestMetrics(object):
+
+    def __init__(self, app=None):
+        self.duration = Histogram('fyyur_request_duration_seconds', 'Time spent serving a request.',
+                                  DURATION_BUCKETS, ('endpoint', 'method'))
+        self.queries = Histogram('fyyur_request_queries', 'SQL statements run per request.',
+                                 QUERY_BUCKETS, ('endpoint',))
+        self.sql = Histogram('fyyur_request_sql_seconds', 'Time spent in SQL per request.',
+                             DURATION_BUCKETS, ('endpoint',))
+        self.rendering = Histogram('fyyur_request_render_seconds', 'Time spent rendering templates per request.',
+                                   DURATION_BUCKETS, ('endpoint',))
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        # listen on the Engine class, so the engine does not have to exist yet
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.before_request(self._start)
+        app.after_request(self._add_headers)
+        # teardown runs once a streamed response has been fully sent
+        app.teardown_request(self._observe)
+
+    def _start(self):
+        g.metrics = {'started': time.perf_counter(), 'queries': 0, 'sql': 0.0, 'render': 0.0}
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        if has_request_context() and 'metrics' in g:
+            g.metrics['queries'] += 1
+            g.metrics['sql'] += time.perf_counter() - started
+
+    def _before_render(self, sender, template, context, **extra):
+        if 'metrics' in g:
+            g.metrics['render_started'] = time.perf_counter()
+
+    def _after_render(self, sender, template, context, **extra):
+        if 'metrics' in g and 'render_started' in g.metrics:
+            g.metrics['render'] += time.perf_counter() - g.metrics.pop('render_started')
+
+    # Wrap a streamed template so the time spent producing its chunks counts
+    # as rendering (including queries the template triggers while it runs)
+    def timed_stream(self, stream):
+        chunks = iter(stream)
+        while True:
+            started = time.perf_counter()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                if has_request_context() and 'metrics' in g:
+                    g.metrics['render'] += time.perf_counter() - started
+            yield chunk
+
+    def _add_headers(self, response):
+        if self.app.debug and 'metrics' in g:
+            metrics = g.metrics
+            total = time.perf_counter() - metrics['started']
+            response.headers['X-Query-Count'] = str(metrics['queries'])
+            response.headers['Server-Timing'] = 'db;dur=%.1f;desc="%d queries", render;dur=%.1f, total;dur=%.1f' % (
+                metrics['sql'] * 1000, metrics['queries'], metrics['render'] * 1000, total * 1000)
+        return response
+
+    def _observe(self, exc):
+        metrics = g.pop('metrics', None)
+        if metrics is None:
+            return
+        endpoint = request.endpoint or 'unmatched'
+        self.duration.observe(time.perf_counter() - metrics['started'], endpoint=endpoint, method=request.method)
+        self.queries.observe(metrics['queries'], endpoint=endpoint)
+        self.sql.observe(metrics['sql'], endpoint=endpoint)
+        self.rendering.observe(metrics['render'], endpoint=endpoint)
+
+    def render(self):
+        lines = []
+        for histogram in (self.duration, self.queries, self.sql, self.rendering):
+            lines.extend(histogram.render())
+        return '\n'.join(lines) + '\n'
+
+
+#----------------------------------------------------------------------------#
+# Query diagnostics.
+#
+# Logs statements slower than SLOW_QUERY_THRESHOLD_MS (batched executemany
+# writes aside) with their parameters, endpoint and the line of application
+# code that ran them, and flags requests that run the same statement more
+# than N_PLUS_ONE_THRESHOLD times, the usual sign of a query issued once per
+# row in a loop. Repeats are logged as warnings, or raised as
+# RepeatedQueryError when TESTING is on.
+#----------------------------------------------------------------------------#
+
+# Placeholder lists of IN clauses vary with the number of values; they are
+# collapsed so `id IN (?, ?)` and `id IN (?, ?, ?)` count as one statement
+PLACEHOLDER_LIST = re.compile(r'\(\s*(?:\?|%\(\w+\)s|%s)(?:\s*,\s*(?:\?|%\(\w+\)s|%s))*\s*\)')
+
+
+def statement_shape(statement):
+    return PLACEHOLDER_LIST.sub('(...)', ' '.join(statement.split()))
+
+
+class RepeatedQueryError(AssertionError):
+    pass
+
+
+class QueryDiagnostics(object):
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.root = os.path.abspath(app.root_path)
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._start)
+        app.after_request(self._check_after_request)
+        # streamed responses keep querying after after_request; check them
+        # again once they have been sent
+        app.teardown_request(self._check_teardown)
+
+    # Let the current request repeat statements on purpose, e.g. one query
+    # per batch while streaming an export
+    def allow_repeated_statements(self):
+        if 'query_diagnostics' in g:
+            g.query_diagnostics['allow_repeats'] = True
+
+    # The innermost frame of application code (outside this module and the
+    # libraries) on the stack, as "file:line in function"
+    def origin(self):
+        for frame in reversed(traceback.extract_stack()[:-2]):
+            if frame.filename.startswith('<'):
+                continue
+            filename = os.path.abspath(frame.filename)
+            if filename.startswith(self.root) and filename != os.path.abspath(__file__) \
+                    and os.sep + 'site-packages' + os.sep not in filename:
+                return '%s:%d in %s' % (os.path.relpath(filename, self.root), frame.lineno, frame.name)
+        return 'unknown'
+
+    def _start(self):
+        g.query_diagnostics = {'statements': Counter(), 'origins': {}, 'allow_repeats': False, 'reported': set()}
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('diagnostics_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['diagnostics_started'].pop()
+        in_request = has_request_context() and 'query_diagnostics' in g
+        threshold = self.app.config.get('SLOW_QUERY_THRESHOLD_MS')
+        # batched writes (executemany) are as slow as their batch is large
+        if threshold is not None and elapsed * 1000 >= threshold and not executemany:
+            self.app.logger.warning('Slow query (%.1f ms) on %s from %s: %s; parameters: %.500r',
+                                    elapsed * 1000, request.endpoint if in_request else '-',
+                                    self.origin(), ' '.join(statement.split()), parameters)
+        if in_request and self.app.config.get('N_PLUS_ONE_THRESHOLD') is not None:
+            shape = statement_shape(statement)
+            statements = g.query_diagnostics['statements']
+            statements[shape] += 1
+            if statements[shape] == self.app.config['N_PLUS_ONE_THRESHOLD'] + 1:
+                g.query_diagnostics['origins'][shape] = self.origin()
+
+    def repeated_statements(self):
+        diagnostics = g.query_diagnostics
+        threshold = self.app.config.get('N_PLUS_ONE_THRESHOLD')
+        if threshold is None or diagnostics['allow_repeats']:
+            return []
+        return [(shape, count, diagnostics['origins'].get(shape, 'unknown'))
+                for shape, count in diagnostics['statements'].items()
+                if count > threshold and shape not in diagnostics['reported']]
+
+    def _report(self, raise_in_tests):
+        repeated = self.repeated_statements()
+        if not repeated:
+            return
+        g.query_diagnostics['reported'].update(shape for shape, count, origin in repeated)
+        message = 'Possible N+1 queries on %s:\n%s' % (request.endpoint, '\n'.join(
+            '  %d x %s\n    from %s' % (count, shape, origin) for shape, count, origin in repeated))
+        if self.app.testing and raise_in_tests:
+            raise RepeatedQueryError(message)
+        self.app.logger.warning(message)
+
+    def _check_after_request(self, response):
+        if 'query_diagnostics' in g:
+            self._report(raise_in_tests=True)
+        return response
+
+    def _check_teardown(self, exc):
+        if 'query_diagnostics' in g:
+            self._report(raise_in_tests=False)
+            g.pop('query_diagnostics')
@@ -0,0 +1,298 @@
+#----------------------------------------------------------------------------#
+# Load test.
+#
+#   python loadtest.py --database-url sqlite:////tmp/fyyur.db --seed-catalog --workers 8
+#   python loadtest.py --url http://localhost:5000 --ramp 1,2,4,8,16,32
+#
+# Runs scripted user journeys in worker processes, one simulated user per
+# process, either through the Flask test client (each worker then also acts
+# as one app worker with its own connection pool) or against a running
+# server. Reports throughput, latency percentiles and errors per step; with
+# --ramp it runs one stage per worker count and reports where throughput
+# stops growing, i.e. the saturation point of that worker/pool setup.
+#----------------------------------------------------------------------------#
+
+import argparse
+import multiprocessing
+import random
+import re
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+
+SEARCH_TERMS = ['Blue', 'Hall', 'Club', 'Band', 'Jazz', 'Neon', 'Room', 'Kids', 'Stone', 'Echo']
+
+VENUE_LINK = re.compile(r'href="/venues/(\d+)"')
+ARTIST_LINK = re.compile(r'href="/artists/(\d+)"')
+
+#  Clients
+#  ----------------------------------------------------------------
+
+# Both clients return (status, body text) and do not follow redirects, so a
+# successful form POST counts as its 302
+
+
+class TestClient(object):
+
+    def __init__(self, database_url):
+        from app import app
+        if database_url:
+            app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+        app.config.update(SLOW_QUERY_THRESHOLD_MS=None, N_PLUS_ONE_THRESHOLD=None)
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        return response.status_code, response.get_data(as_text=True)
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HTTPClient(object):
+
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(NoRedirect)
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode('utf-8') if data is not None else None
+        request = urllib.request.Request(self.url + path, data=body, method=method)
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                return response.status, response.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as e:
+            return e.code, ''
+
+#  Journeys
+#  ----------------------------------------------------------------
+
+# Each journey is a function of (user, rng) that makes its requests through
+# user.step(name, method, path, data, expected) and returns nothing; statuses
+# in `expected` (e.g. 409 for a slot someone else booked first) are not errors
+
+
+def browse(user, rng):
+    body = user.step('venues', 'GET', '/venues')
+    venues = VENUE_LINK.findall(body)
+    if not venues:
+        return
+    body = user.step('show_venue', 'GET', '/venues/' + rng.choice(venues))
+    artists = ARTIST_LINK.findall(body)
+    if artists:
+        user.step('show_artist', 'GET', '/artists/' + rng.choice(artists))
+
+
+def search(user, rng):
+    term = rng.choice(SEARCH_TERMS)
+    if rng.random() < 0.5:
+        body = user.step('search_venues', 'POST', '/venues/search', {'search_term': term})
+        venues = VENUE_LINK.findall(body)
+        if venues:
+            user.step('show_venue', 'GET', '/venues/' + venues[0])
+    else:
+        body = user.step('search_artists', 'POST', '/artists/search', {'search_term': term})
+        artists = ARTIST_LINK.findall(body)
+        if artists:
+            user.step('show_artist', 'GET', '/artists/' + artists[0])
+
+
+def book_show(user, rng):
+    # pick a venue and an artist the way a promoter would, from the listings
+    venues = VENUE_LINK.findall(user.step('venues', 'GET', '/venues'))
+    artists = ARTIST_LINK.findall(user.step('artists', 'GET', '/artists'))
+    if not venues or not artists:
+        return
+    user.step('create_show_form', 'GET', '/shows/create')
+    start_time = datetime.utcnow() + timedelta(days=rng.randint(1, 365), hours=rng.randint(0, 23))
+    user.step('create_show', 'POST', '/shows/create', {
+        'venue_id': rng.choice(venues),
+        'artist_id': rng.choice(artists),
+        'start_time': start_time.strftime('%Y-%m-%d %H:00:00'),
+        'duration': rng.choice([60, 90, 120]),
+    }, expected=(409,))
+
+
+# name -> (journey, weight)
+JOURNEYS = {
+    'browse': (browse, 6),
+    'search': (search, 3),
+    'book': (book_show, 1),
+}
+
+#  Workers
+#  ----------------------------------------------------------------
+
+
+class User(object):
+
+    def __init__(self, client):
+        self.client = client
+        # (step, seconds, ok)
+        self.records = []
+
+    def step(self, name, method, path, data=None, expected=()):
+        started = time.perf_counter()
+        try:
+            status, body = self.client.request(method, path, data)
+            ok = status < 400 or status in expected
+        except Exception:
+            body, ok = '', False
+        self.records.append((name, time.perf_counter() - started, ok))
+        return body
+
+
+def run_worker(args):
+    worker, options = args
+    rng = random.Random(options['seed'] * 1000 + worker)
+    if options['url']:
+        client = HTTPClient(options['url'])
+    else:
+        client = TestClient(options['database_url'])
+    names = sorted(options['journeys'])
+    weights = [JOURNEYS[name][1] for name in names]
+    user = User(client)
+    journeys = 0
+    deadline = time.perf_counter() + options['duration']
+    while time.perf_counter() < deadline:
+        JOURNEYS[rng.choices(names, weights)[0]][0](user, rng)
+        journeys += 1
+    return journeys, user.records
+
+
+def run_stage(workers, options):
+    with multiprocessing.get_context('spawn').Pool(workers) as pool:
+        started = time.perf_counter()
+        results = pool.map(run_worker, [(worker, options) for worker in range(workers)])
+        elapsed = time.perf_counter() - started
+    journeys = sum(count for count, records in results)
+    records = [record for count, records in results for record in records]
+    return summarize(workers, journeys, records, options['duration'], elapsed)
+
+#  Reports
+#  ----------------------------------------------------------------
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[int(round((len(values) - 1) * fraction))] if values else 0.0
+
+
+def summarize(workers, journeys, records, duration, elapsed):
+    steps = {}
+    for name, seconds, ok in records:
+        step = steps.setdefault(name, {'timings': [], 'errors': 0})
+        step['timings'].append(seconds)
+        step['errors'] += not ok
+    latencies = [seconds for name, seconds, ok in records]
+    return {
+        'workers': workers,
+        'journeys': journeys,
+        'requests': len(records),
+        'errors': sum(not ok for name, seconds, ok in records),
+        # workers stop issuing requests at the deadline, so throughput is
+        # measured over the run's duration rather than the pool's lifetime
+        'throughput': len(records) / float(duration),
+        'elapsed': elapsed,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'steps': dict((name, {
+            'requests': len(step['timings']),
+            'errors': step['errors'],
+            'p50_ms': percentile(step['timings'], 0.5) * 1000,
+            'p95_ms': percentile(step['timings'], 0.95) * 1000,
+            'p99_ms': percentile(step['timings'], 0.99) * 1000,
+        }) for name, step in steps.items()),
+    }
+
+
+def print_stage(stage):
+    print('%d workers: %d journeys, %d requests, %.1f req/s, %.2f%% errors, p50 %.1f ms, p95 %.1f ms, p99 %.1f ms' % (
+        stage['workers'], stage['journeys'], stage['requests'], stage['throughput'],
+        100.0 * stage['errors'] / max(stage['requests'], 1), stage['p50_ms'], stage['p95_ms'], stage['p99_ms']))
+    print('  %-18s %8s %7s %9s %9s %9s' % ('step', 'requests', 'errors', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for name, step in sorted(stage['steps'].items()):
+        print('  %-18s %8d %7d %9.1f %9.1f %9.1f' % (
+            name, step['requests'], step['errors'], step['p50_ms'], step['p95_ms'], step['p99_ms']))
+
+
+# The first stage after which adding workers raised throughput by less than
+# `gain` (e.g. 10%): more concurrency past it only adds latency
+def saturation_point(stages, gain):
+    for previous, stage in zip(stages, stages[1:]):
+        if stage['throughput'] < previous['throughput'] * (1 + gain):
+            return previous
+    return None
+
+#----------------------------------------------------------------------------#
+# Launch.
+#----------------------------------------------------------------------------#
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fyyur load test')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--url', help='base URL of a running server; the test client is used when omitted')
+    target.add_argument('--database-url', help='database the test client runs against (default: the config profile)')
+    parser.add_argument('--seed-catalog', action='store_true',
+                        help='fill the test client database with a synthetic catalog first')
+    parser.add_argument('--rows', type=int, default=100000, help='shows in the seeded catalog')
+    parser.add_argument('--workers', type=int, default=4, help='concurrent simulated users (processes)')
+    parser.add_argument('--ramp', help='comma separated worker counts to run one after another, e.g. 1,2,4,8')
+    parser.add_argument('--duration', type=float, default=30, help='seconds per stage')
+    parser.add_argument('--journeys', default=','.join(sorted(JOURNEYS)),
+                        help='comma separated journeys to mix (%s)' % ', '.join(sorted(JOURNEYS)))
+    parser.add_argument('--saturation-gain', type=float, default=0.1,
+                        help='smallest throughput gain per ramp stage that still counts as scaling')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    journeys = [name for name in args.journeys.split(',') if name]
+    unknown = [name for name in journeys if name not in JOURNEYS]
+    if unknown:
+        parser.error('unknown journeys: ' + ', '.join(unknown))
+    if args.seed_catalog:
+        if args.url:
+            parser.error('--seed-catalog needs the test client')
+        from app import app, db
+        from seed import generate_catalog
+        if args.database_url:
+            app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+        with app.app_context():
+            db.create_all()
+            generate_catalog(max(1, args.rows // 100), max(1, args.rows // 10), args.rows, seed=args.seed)
+
+    options = {
+        'url': args.url,
+        'database_url': args.database_url,
+        'duration': args.duration,
+        'journeys': journeys,
+        'seed': args.seed,
+    }
+    counts = [int(count) for count in args.ramp.split(',')] if args.ramp else [args.workers]
+    stages = []
+    for workers in counts:
+        stage = run_stage(workers, options)
+        stages.append(stage)
+        print_stage(stage)
+    if len(stages) > 1:
+        print('')
+        print('  %7s %10s %9s %9s' % ('workers', 'req/s', 'p95 ms', 'errors'))
+        for stage in stages:
+            print('  %7d %10.1f %9.1f %9d' % (stage['workers'], stage['throughput'], stage['p95_ms'], stage['errors']))
+        saturated = saturation_point(stages, args.saturation_gain)
+        if saturated:
+            print('Throughput stops scaling at %d workers (%.1f req/s).' % (saturated['workers'], saturated['throughput']))
+        else:
+            print('Throughput was still scaling at %d workers.' % stages[-1]['workers'])
+
+
+if __name__ == '__main__':
+    main()
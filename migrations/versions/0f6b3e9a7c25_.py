@@ -0,0 +1,38 @@
+"""add updated_at and version columns
+
+Revision ID: 0f6b3e9a7c25
+Revises: 5d18a6e0f3b2
+Create Date: 2026-10-16 15:37:22.409184
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0f6b3e9a7c25'
+down_revision = '5d18a6e0f3b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing rows start at version 1, last modified now. SQLite cannot make
+    # an added column NOT NULL without rebuilding the table (and the search
+    # triggers on it), so there the columns stay nullable and rely on the
+    # model defaults.
+    for table in ('artists', 'shows', 'venues'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.add_column(table, sa.Column('version', sa.Integer(), nullable=True))
+        op.execute('UPDATE %s SET updated_at = CURRENT_TIMESTAMP, version = 1' % table)
+        if op.get_bind().dialect.name != 'sqlite':
+            op.alter_column(table, 'updated_at', nullable=False)
+            op.alter_column(table, 'version', nullable=False)
+        op.create_index('ix_%s_updated_at' % table, table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in ('venues', 'shows', 'artists'):
+        op.drop_index('ix_%s_updated_at' % table, table_name=table)
+        op.drop_column(table, 'version')
+        op.drop_column(table, 'updated_at')
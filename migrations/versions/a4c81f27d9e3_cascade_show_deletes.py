@@ -0,0 +1,34 @@
+"""delete shows with their venue or artist
+
+Revision ID: a4c81f27d9e3
+Revises: 0f6b3e9a7c25
+Create Date: 2026-10-16 21:02:47.118305
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c81f27d9e3'
+down_revision = '0f6b3e9a7c25'
+branch_labels = None
+depends_on = None
+
+# The shows foreign keys were created unnamed; this names them the way
+# PostgreSQL did, so SQLite's table rebuild can find them too
+naming_convention = {'fk': '%(table_name)s_%(column_0_name)s_fkey'}
+
+
+def recreate_foreign_keys(ondelete):
+    with op.batch_alter_table('shows', naming_convention=naming_convention) as batch_op:
+        for column, table in (('artist_id', 'artists'), ('venue_id', 'venues')):
+            batch_op.drop_constraint('shows_%s_fkey' % column, type_='foreignkey')
+            batch_op.create_foreign_key('shows_%s_fkey' % column, table, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    recreate_foreign_keys('CASCADE')
+
+
+def downgrade():
+    recreate_foreign_keys(None)
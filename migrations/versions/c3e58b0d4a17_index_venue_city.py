@@ -0,0 +1,23 @@
+"""index venues by city
+
+Revision ID: c3e58b0d4a17
+Revises: a4c81f27d9e3
+Create Date: 2026-10-16 21:24:05.512883
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e58b0d4a17'
+down_revision = 'a4c81f27d9e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_venues_city', 'venues', ['city'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_venues_city', table_name='venues')
@@ -0,0 +1,41 @@
+"""give shows an end time and stop overlapping bookings
+
+Revision ID: d91f6a2c8b35
+Revises: c3e58b0d4a17
+Create Date: 2026-10-16 21:41:37.904215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd91f6a2c8b35'
+down_revision = 'c3e58b0d4a17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing shows get the default length of two hours. As with updated_at,
+    # the column stays nullable on SQLite, which cannot add a NOT NULL column
+    # without rebuilding the table; the app always sets it.
+    op.add_column('shows', sa.Column('end_time', sa.DateTime(), nullable=True))
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("UPDATE shows SET end_time = datetime(start_time, '+120 minutes')")
+    else:
+        op.execute("UPDATE shows SET end_time = start_time + interval '120 minutes'")
+        op.alter_column('shows', 'end_time', nullable=False)
+    if op.get_bind().dialect.name == 'postgresql':
+        # fails if existing shows already overlap; move or cancel those first
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for column in ('venue_id', 'artist_id'):
+            op.execute('ALTER TABLE shows ADD CONSTRAINT shows_%s_no_overlap EXCLUDE USING gist '
+                       '(%s WITH =, tsrange(start_time, end_time) WITH &&)' % (column, column))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for column in ('venue_id', 'artist_id'):
+            op.drop_constraint('shows_%s_no_overlap' % column, 'shows')
+    op.drop_column('shows', 'end_time')
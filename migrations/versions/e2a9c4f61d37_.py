@@ -0,0 +1,62 @@
+"""add trigram name search indexes
+
+Revision ID: e2a9c4f61d37
+Revises: b7d203f9ce14
+Create Date: 2026-10-16 12:41:07.260938
+
+"""
+import sqlite3
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a9c4f61d37'
+down_revision = 'b7d203f9ce14'
+branch_labels = None
+depends_on = None
+
+SQLITE_TRIGRAM = sqlite3.sqlite_version_info >= (3, 34, 0)
+
+
+def sqlite_name_search_ddl(table):
+    fts = table + '_name_fts'
+    return [
+        "CREATE VIRTUAL TABLE %s USING fts5(name, content='%s', content_rowid='id', tokenize='trigram')" % (fts, table),
+        "CREATE TRIGGER %s_ai AFTER INSERT ON %s BEGIN "
+        "INSERT INTO %s(rowid, name) VALUES (new.id, new.name); END" % (fts, table, fts),
+        "CREATE TRIGGER %s_ad AFTER DELETE ON %s BEGIN "
+        "INSERT INTO %s(%s, rowid, name) VALUES ('delete', old.id, old.name); END" % (fts, table, fts, fts),
+        "CREATE TRIGGER %s_au AFTER UPDATE OF name ON %s BEGIN "
+        "INSERT INTO %s(%s, rowid, name) VALUES ('delete', old.id, old.name); "
+        "INSERT INTO %s(rowid, name) VALUES (new.id, new.name); END" % (fts, table, fts, fts, fts),
+        # index the rows that already exist
+        "INSERT INTO %s(%s) VALUES ('rebuild')" % (fts, fts),
+    ]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    # GIN trigram indexes on PostgreSQL; elsewhere they would be plain indexes
+    # duplicating ix_*_name_id
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index('ix_artists_name_trgm', 'artists', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        op.create_index('ix_venues_name_trgm', 'venues', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    if dialect == 'sqlite' and SQLITE_TRIGRAM:
+        for table in ('artists', 'venues'):
+            for statement in sqlite_name_search_ddl(table):
+                op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    # whichever SQLite created them
+    if dialect == 'sqlite':
+        for table in ('artists', 'venues'):
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute('DROP TRIGGER IF EXISTS %s_name_fts_%s' % (table, suffix))
+            op.execute('DROP TABLE IF EXISTS %s_name_fts' % table)
+    if dialect == 'postgresql':
+        op.drop_index('ix_venues_name_trgm', table_name='venues')
+        op.drop_index('ix_artists_name_trgm', table_name='artists')
@@ -0,0 +1,29 @@
+"""index venues by their coalesced city/state area
+
+Revision ID: f4b2c7d81e09
+Revises: d91f6a2c8b35
+Create Date: 2026-10-16 23:12:48.204617
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b2c7d81e09'
+down_revision = 'd91f6a2c8b35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the venues page groups venues by coalesce(state, ''), coalesce(city, '')
+    # so that those without a city or state are listed too
+    op.drop_index('ix_venues_state_city_name_id', table_name='venues')
+    op.create_index('ix_venues_area_name_id', 'venues',
+                    [sa.text("coalesce(state, '')"), sa.text("coalesce(city, '')"), 'name', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_venues_area_name_id', table_name='venues')
+    op.create_index('ix_venues_state_city_name_id', 'venues', ['state', 'city', 'name', 'id'], unique=False)
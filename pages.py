@@ -0,0 +1,192 @@
+#----------------------------------------------------------------------------#
+# Pages.
+#
+# What the Flask views (app.py) and the async ones (async_app.py) share about
+# the pages they serve: links between the pages of a list, the rules for
+# conditional requests and the page cache, and the data the venue and artist
+# templates are rendered from. Nothing here reads the request itself; each
+# app passes in what it needs from its own.
+#----------------------------------------------------------------------------#
+
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from werkzeug.http import is_resource_modified
+
+default_artist_image_link = 'https://images.unsplash.com/photo-1569437061238-3cf61084f487?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=634&q=80'
+default_venue_image_link = 'https://assets.entrepreneur.com/content/3x2/2000/20190705133921-shutterstock-208432186.jpeg?width=700&crop=2:1'
+
+# Page size for list pages, configurable with PAGE_SIZE and ?per_page=N
+def requested_page_size(args, config):
+  size = args.get('per_page', config['PAGE_SIZE'], type=int)
+  return max(1, min(size, config['MAX_PAGE_SIZE']))
+
+# The url_for values of another page of the current list, keeping any other
+# query arguments
+def page_url_values(args, view_args, cursor):
+  args = args.to_dict()
+  args.pop('after', None)
+  args.pop('before', None)
+  args.update(cursor)
+  return dict(view_args, **args)
+
+#----------------------------------------------------------------------------#
+# Conditional requests.
+#----------------------------------------------------------------------------#
+
+# Whether the request's If-Modified-Since (or If-None-Match, given an `etag`)
+# shows the client already has the current page. `environ` holds the
+# request's conditional headers the WSGI way (HTTP_IF_NONE_MATCH...).
+def is_not_modified(environ, if_none_match, last_modified, etag=None):
+  if last_modified is None and etag is None:
+    return False
+  if etag is None and if_none_match:
+    return False
+  return not is_resource_modified(environ, etag=etag, last_modified=last_modified)
+
+def set_validators(response, last_modified, etag=None, weak=False):
+  if last_modified is not None:
+    response.last_modified = last_modified
+  if etag is not None:
+    response.set_etag(etag, weak=weak)
+  response.cache_control.no_cache = True
+  return response
+
+#----------------------------------------------------------------------------#
+# The page cache.
+#
+# A cached_page view names the rows its page is built from with tag_page() so
+# writes can drop it precisely, can shorten its lifetime with
+# expire_page_at(), and says when its data last changed with
+# page_last_modified(). These record into the PageRecord of the page being
+# rendered, if any, so views can call them whether or not they are cached.
+#----------------------------------------------------------------------------#
+
+class PageRecord(object):
+
+  def __init__(self):
+    self.tags = set()
+    self.expires = None
+    self.last_modified = None
+
+  # The cache entry of the rendered page: body, strong ETag, mimetype and
+  # Last-Modified
+  def entry(self, body, mimetype):
+    return (body, hashlib.sha1(body).hexdigest(), mimetype, self.last_modified)
+
+  # Seconds to keep the page for, at most `ttl`
+  def ttl(self, ttl):
+    if self.expires is not None:
+      ttl = min(ttl, max(0, (self.expires - datetime.utcnow()).total_seconds()))
+    return ttl
+
+current_page = ContextVar('current_page', default=None)
+
+@contextmanager
+def recording_page():
+  record = PageRecord()
+  token = current_page.set(record)
+  try:
+    yield record
+  finally:
+    current_page.reset(token)
+
+def page_cache_key(full_path):
+  return ('pages', full_path)
+
+# Record when the data of the page being rendered last changed
+def page_last_modified(when):
+  record = current_page.get()
+  if record is not None:
+    record.last_modified = when
+
+# Record a row the page being rendered is built from, e.g. tag_page('venue:3')
+def tag_page(*tags):
+  record = current_page.get()
+  if record is not None:
+    record.tags.update(tags)
+
+# Stop serving the cached page at `when`, e.g. once an upcoming show starts
+def expire_page_at(when):
+  record = current_page.get()
+  if record is not None and (record.expires is None or when < record.expires):
+    record.expires = when
+
+#----------------------------------------------------------------------------#
+# Venue and artist pages.
+#
+# Built from the entity's row, its genre names, its show counts and its two
+# show sections: rows of start_time and the counterpart's columns, upcoming
+# soonest first and past latest first.
+#----------------------------------------------------------------------------#
+
+# Tag the page with the counterparts of its shows; it is stale once its first
+# upcoming show starts
+def tag_show_sections(counterpart, upcoming, past):
+  tag_page(*['%s:%d' % (counterpart, show.id) for show in list(upcoming) + list(past)])
+  if upcoming:
+    expire_page_at(upcoming[0].start_time)
+
+def venue_page(venue, genres, upcoming_shows_count, past_shows_count, upcoming, past):
+  tag_page('venue:%d' % venue.id)
+  tag_show_sections('artist', upcoming, past)
+
+  def show_item(show):
+    return {
+      "artist_id": show.id,
+      "artist_name": show.name,
+      "artist_image_link": show.image_link or default_artist_image_link,
+      "start_time": show.start_time
+    }
+
+  return {
+    "id": venue.id,
+    "name": venue.name,
+    "city": venue.city,
+    "state": venue.state,
+    "phone": venue.phone,
+    "address": venue.address,
+    "genres": genres,
+    "website": venue.website,
+    "facebook_link": venue.facebook_link,
+    "seeking_talent": venue.seeking_talent,
+    "seeking_description": venue.seeking_description,
+    "image_link": venue.image_link or default_venue_image_link,
+    "past_shows": [show_item(show) for show in past],
+    "upcoming_shows": [show_item(show) for show in upcoming],
+    "past_shows_count": past_shows_count,
+    "upcoming_shows_count": upcoming_shows_count
+  }
+
+def artist_page(artist, genres, upcoming_shows_count, past_shows_count, upcoming, past):
+  tag_page('artist:%d' % artist.id)
+  tag_show_sections('venue', upcoming, past)
+
+  def show_item(show):
+    return {
+      "venue_id": show.id,
+      "venue_name": show.name,
+      "venue_image_link": artist.venue_image_link or default_venue_image_link,
+      "start_time": show.start_time
+    }
+
+  return {
+    "id": artist.id,
+    "name": artist.name,
+    "city": artist.city,
+    "state": artist.state,
+    "phone": artist.phone,
+    "genres": genres,
+    "seeking_venue": artist.seeking_venue,
+    "seeking_description": artist.seeking_description,
+    "image_link": artist.image_link or default_artist_image_link,
+    "facebook_link": artist.facebook_link,
+    "venue_image_link": artist.venue_image_link or default_venue_image_link,
+    "website": artist.website,
+    "past_shows": [show_item(show) for show in past],
+    "upcoming_shows": [show_item(show) for show in upcoming],
+    "past_shows_count": past_shows_count,
+    "upcoming_shows_count": upcoming_shows_count
+  }
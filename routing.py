@@ -0,0 +1,126 @@
+import random
+import time
+
+from flask import g, has_app_context, request
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, _EngineConnector, get_state
+from sqlalchemy import orm
+
+#----------------------------------------------------------------------------#
+# Read replicas.
+#
+# The replicas are binds listed in REPLICA_BINDS. Requests that only read
+# (GET and HEAD, and views marked with reads_from_replica) run their queries
+# on one of them, picked at random per request. Other requests, views marked
+# with reads_from_primary and every flush run on the primary. A client that
+# has just written carries a cookie for REPLICA_LAG_WINDOW seconds that sends
+# its reads to the primary as well, so the page it is redirected to shows its
+# own write however far the replicas lag behind.
+#----------------------------------------------------------------------------#
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingSession(SignallingSession):
+
+    # SQLAlchemy's scoped_session passes Session.get_bind's other keywords,
+    # which SignallingSession does not take
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        bind = g.get('database_bind') if has_app_context() else None
+        if bind is not None and not self._flushing and not getattr(clause, 'is_dml', False):
+            return get_state(self.app).db.get_engine(self.app, bind=bind)
+        return SignallingSession.get_bind(self, mapper, clause)
+
+
+# Flask-SQLAlchemy 2 gives every bind the primary's SQLALCHEMY_ENGINE_OPTIONS;
+# a replica bind takes its own from SQLALCHEMY_BIND_ENGINE_OPTIONS instead,
+# e.g. no pool settings for a SQLite replica of a PostgreSQL primary
+class BindEngineConnector(_EngineConnector):
+
+    def get_options(self, sa_url, echo):
+        if self._bind is None:
+            return _EngineConnector.get_options(self, sa_url, echo)
+        options = self._sa.apply_pool_defaults(self._app, {})
+        sa_url, options = self._sa.apply_driver_hacks(self._app, sa_url, options)
+        if echo:
+            options['echo'] = echo
+        options.update(bind_engine_options(self._app.config, self._bind))
+        options.update(self._sa._engine_options)
+        return sa_url, options
+
+
+# The configured engine options of a bind, or of the primary for None
+def bind_engine_options(config, bind=None):
+    if bind is None:
+        return config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    return (config.get('SQLALCHEMY_BIND_ENGINE_OPTIONS') or {}).get(bind, {})
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def make_connector(self, app=None, bind=None):
+        return BindEngineConnector(self, self.get_app(app), bind)
+
+
+# Route a view's queries regardless of its method, e.g. a search submitted
+# with POST to a replica, or an edit form (whose version a write will be
+# checked against) to the primary
+def reads_from_replica(view):
+    view.database = 'replica'
+    return view
+
+
+def reads_from_primary(view):
+    view.database = 'primary'
+    return view
+
+
+class DatabaseRouter(object):
+
+    def __init__(self, app=None):
+        # when this process last served a write, see may_be_stale()
+        self.last_write = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.before_request(self._route)
+        app.after_request(self._pin_after_write)
+
+    @property
+    def replicas(self):
+        return self.app.config.get('REPLICA_BINDS') or []
+
+    def _view_database(self):
+        return getattr(self.app.view_functions.get(request.endpoint), 'database', None)
+
+    def _route(self):
+        g.database_bind = None
+        if not self.replicas or request.cookies.get(self.app.config['REPLICA_PIN_COOKIE']):
+            return
+        database = self._view_database()
+        if database == 'replica' or (database is None and request.method in SAFE_METHODS):
+            g.database_bind = random.choice(self.replicas)
+
+    def _pin_after_write(self, response):
+        if request.method not in SAFE_METHODS and self._view_database() != 'replica':
+            self.last_write = time.monotonic()
+            if self.replicas:
+                response.set_cookie(self.app.config['REPLICA_PIN_COOKIE'], '1',
+                                    max_age=self.app.config['REPLICA_LAG_WINDOW'], httponly=True, samesite='Lax')
+        return response
+
+    # Whether the current request reads from a replica that may not have
+    # caught up with a write this process served within the lag window.
+    # Results it reads should not be cached, or a page invalidated by that
+    # write could be cached again from before it.
+    def may_be_stale(self):
+        return g.get('database_bind') is not None and self.wrote_recently()
+
+    # Whether this process served a write within the lag window
+    def wrote_recently(self):
+        return self.last_write is not None \
+            and time.monotonic() - self.last_write < self.app.config['REPLICA_LAG_WINDOW']
@@ -0,0 +1,225 @@
+#----------------------------------------------------------------------------#
+# Synthetic catalog.
+#
+#   flask seed --venues 10000 --artists 100000 --shows 1000000
+#
+# Builds a reproducible catalog for benchmarks and load tests: venues spread
+# over real cities, artists and venues with one to three genres, and shows
+# over the past and coming year. Popularity is skewed the way real listings
+# are: a few venues and artists get most of the shows, following a Zipf-like
+# curve whose steepness is `skew` (0 spreads shows evenly). Nobody is double
+# booked: shows start in two-hour slots from noon and last at most two hours,
+# and no venue or artist gets the same slot twice, nor a slot that one of its
+# shows already in the database overlaps.
+#----------------------------------------------------------------------------#
+
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+
+from app import db, Venue, Artist, Show, Genre, venue_genres, artist_genres
+
+CITIES = [
+    ('San Francisco', 'CA'), ('Los Angeles', 'CA'), ('San Diego', 'CA'), ('New York', 'NY'),
+    ('Brooklyn', 'NY'), ('Austin', 'TX'), ('Houston', 'TX'), ('Chicago', 'IL'), ('Seattle', 'WA'),
+    ('Portland', 'OR'), ('Denver', 'CO'), ('Nashville', 'TN'), ('New Orleans', 'LA'),
+    ('Atlanta', 'GA'), ('Miami', 'FL'), ('Boston', 'MA'), ('Philadelphia', 'PA'), ('Detroit', 'MI'),
+    ('Minneapolis', 'MN'), ('Phoenix', 'AZ'),
+]
+
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk', 'Hip-Hop',
+    'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae',
+    'Rock n Roll', 'Soul', 'Other',
+]
+
+WORDS = [
+    'Blue', 'Red', 'Golden', 'Silver', 'Velvet', 'Electric', 'Midnight', 'Royal', 'Wild', 'Little',
+    'Grand', 'Hidden', 'Lucky', 'Broken', 'Neon', 'Crystal', 'Iron', 'Paper', 'Stone', 'Echo',
+]
+VENUE_KINDS = ['Hall', 'Lounge', 'Club', 'Room', 'Theatre', 'Tavern', 'Ballroom', 'Garden', 'Cellar', 'Stage']
+ARTIST_KINDS = ['Band', 'Collective', 'Trio', 'Quartet', 'Orchestra', 'Sisters', 'Brothers', 'Project', 'Machine', 'Kids']
+
+# Shows start at noon, 2pm, ... 10pm on each of 730 days around today
+SLOT_HOURS = 2
+SLOTS_PER_DAY = 6
+DAYS = 730
+SHOW_MINUTES = [60, 90, 120]
+
+
+# Cumulative Zipf-like weights for `count` items, for random.choices
+def popularity(count, skew):
+    return list(itertools.accumulate(1.0 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+def next_id(model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+def genre_ids():
+    existing = dict(db.session.query(Genre.name, Genre.id))
+    missing = [name for name in GENRES if name not in existing]
+    if missing:
+        db.session.execute(Genre.__table__.insert(), [{'name': name} for name in missing])
+        existing = dict(db.session.query(Genre.name, Genre.id))
+    return [existing[name] for name in GENRES]
+
+
+# Rows are inserted with explicit ids, so PostgreSQL's sequences are moved
+# past them afterwards
+def reset_sequences(*models):
+    if db.engine.dialect.name == 'postgresql':
+        for model in models:
+            db.session.execute(db.text(
+                "SELECT setval(pg_get_serial_sequence('%s', 'id'), (SELECT max(id) FROM %s))"
+                % (model.__tablename__, model.__tablename__)))
+
+
+def insert_batches(table, rows, batch_size):
+    for batch in iter(lambda: list(itertools.islice(rows, batch_size)), []):
+        db.session.execute(table.insert(), batch)
+
+
+def entity_rows(rng, first_id, count, kinds, extra):
+    now = datetime.utcnow()
+    for entity_id in range(first_id, first_id + count):
+        city, state = rng.choice(CITIES)
+        row = {
+            'id': entity_id,
+            'name': '%s %s %d' % (rng.choice(WORDS), rng.choice(kinds), entity_id),
+            'city': city,
+            'state': state,
+            'phone': '%03d-%03d-%04d' % (rng.randint(200, 999), rng.randint(200, 999), rng.randint(0, 9999)),
+            'image_link': 'https://images.example.com/%d.jpg' % entity_id,
+            'facebook_link': 'https://www.facebook.com/%d' % entity_id,
+            'website': 'https://www.example.com/%d' % entity_id,
+            'seeking_description': 'Looking for new faces.',
+            'updated_at': now,
+            'version': 1,
+        }
+        row.update(extra(rng, entity_id))
+        yield row
+
+
+def genre_links(rng, link_column, first_id, count, genres):
+    for entity_id in range(first_id, first_id + count):
+        for genre_id in rng.sample(genres, rng.randint(1, 3)):
+            yield {link_column: entity_id, 'genre_id': genre_id}
+
+
+def first_slot_start():
+    now = datetime.utcnow()
+    return datetime(now.year, now.month, now.day, 12) - timedelta(days=DAYS // 2)
+
+
+def slot_start(first_slot, slot):
+    return first_slot + timedelta(days=slot // SLOTS_PER_DAY, hours=slot % SLOTS_PER_DAY * SLOT_HOURS)
+
+
+# The slots whose two hours overlap a show from `start_time` to `end_time`
+def overlapping_slots(first_slot, start_time, end_time):
+    slots = DAYS * SLOTS_PER_DAY
+    for day in range((start_time - first_slot).days, (end_time - first_slot).days + 1):
+        for slot in range(day * SLOTS_PER_DAY, (day + 1) * SLOTS_PER_DAY):
+            start = slot_start(first_slot, slot)
+            if 0 <= slot < slots and start < end_time and start + timedelta(hours=SLOT_HOURS) > start_time:
+                yield slot
+
+
+# (venue_id, artist_id, start_time, end_time) of the shows already booked
+# within the seeded days
+def booked_shows(first_slot):
+    last_slot_end = slot_start(first_slot, DAYS * SLOTS_PER_DAY - 1) + timedelta(hours=SLOT_HOURS)
+    return db.session.query(Show.venue_id, Show.artist_id, Show.start_time, Show.end_time) \
+        .filter(Show.start_time < last_slot_end, Show.end_time > first_slot).yield_per(10000)
+
+
+# Draw venue, artist and slot until neither is booked in that slot, so a
+# popular venue or artist whose slots have filled up has its draws go to others.
+# The slots of the `booked` shows are taken already.
+def show_rows(rng, count, venue_ids, venue_weights, artist_ids, artist_weights, batch_size, booked=()):
+    now = datetime.utcnow()
+    first_slot = first_slot_start()
+    slots = DAYS * SLOTS_PER_DAY
+    if count > slots * min(len(venue_ids), len(artist_ids)):
+        raise ValueError('%d shows do not fit in %d slots without double bookings' % (count, slots))
+    venue_slots = set()
+    artist_slots = set()
+    for venue_id, artist_id, start_time, end_time in booked:
+        for slot in overlapping_slots(first_slot, start_time, end_time):
+            venue_slots.add(venue_id * slots + slot)
+            artist_slots.add(artist_id * slots + slot)
+    made = draws = 0
+    while made < count:
+        venues = rng.choices(venue_ids, cum_weights=venue_weights, k=batch_size)
+        artists = rng.choices(artist_ids, cum_weights=artist_weights, k=batch_size)
+        for venue_id, artist_id in zip(venues, artists):
+            draws += 1
+            slot = rng.randrange(slots)
+            if venue_id * slots + slot in venue_slots or artist_id * slots + slot in artist_slots:
+                continue
+            venue_slots.add(venue_id * slots + slot)
+            artist_slots.add(artist_id * slots + slot)
+            start_time = slot_start(first_slot, slot)
+            yield {
+                'venue_id': venue_id,
+                'artist_id': artist_id,
+                'start_time': start_time,
+                'end_time': start_time + timedelta(minutes=rng.choice(SHOW_MINUTES)),
+                'updated_at': now,
+                'version': 1,
+            }
+            made += 1
+            if made == count:
+                return
+        if draws > 100 * count:
+            raise ValueError('could not place %d shows without double bookings; lower the skew' % count)
+
+
+# Add `venues` venues, `artists` artists and `shows` shows to the database.
+# The same seed always builds the same catalog. Returns the time taken.
+def generate_catalog(venues, artists, shows, seed=0, skew=1.1, batch_size=5000, progress=None):
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    genres = genre_ids()
+
+    first_venue = next_id(Venue)
+    insert_batches(Venue.__table__, entity_rows(rng, first_venue, venues, VENUE_KINDS, lambda rng, entity_id: {
+        'address': '%d %s St' % (rng.randint(1, 9999), rng.choice(WORDS)),
+        'seeking_talent': rng.random() < 0.3,
+    }), batch_size)
+    insert_batches(venue_genres, genre_links(rng, 'venue_id', first_venue, venues, genres), batch_size)
+    if progress:
+        progress('venues', venues)
+
+    first_artist = next_id(Artist)
+    insert_batches(Artist.__table__, entity_rows(rng, first_artist, artists, ARTIST_KINDS, lambda rng, entity_id: {
+        'venue_image_link': 'https://images.example.com/venues/%d.jpg' % entity_id,
+        'seeking_venue': rng.random() < 0.3,
+    }), batch_size)
+    insert_batches(artist_genres, genre_links(rng, 'artist_id', first_artist, artists, genres), batch_size)
+    if progress:
+        progress('artists', artists)
+
+    if shows and (venues or first_venue > 1) and (artists or first_artist > 1):
+        # shows go to the new venues and artists, or the existing ones when
+        # none were added
+        venue_ids = list(range(first_venue, first_venue + venues)) if venues else \
+            [venue_id for venue_id, in db.session.query(Venue.id)]
+        artist_ids = list(range(first_artist, first_artist + artists)) if artists else \
+            [artist_id for artist_id, in db.session.query(Artist.id)]
+        # existing venues or artists may already be booked; new ones are not
+        booked = booked_shows(first_slot_start()) if not venues or not artists else ()
+        # shuffle who is popular so it does not follow insertion order
+        rng.shuffle(venue_ids)
+        rng.shuffle(artist_ids)
+        insert_batches(Show.__table__, show_rows(rng, shows, venue_ids, popularity(len(venue_ids), skew),
+                                                 artist_ids, popularity(len(artist_ids), skew), batch_size, booked),
+                       batch_size)
+        if progress:
+            progress('shows', shows)
+
+    reset_sequences(Venue, Artist)
+    db.session.commit()
+    return time.perf_counter() - started
@@ -0,0 +1,39 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+
+#----------------------------------------------------------------------------#
+# Query counting helpers for tests.
+#----------------------------------------------------------------------------#
+
+# Records every statement sent to the database while it is listening
+class QueryCounter(object):
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+@contextmanager
+def count_queries(engine):
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+
+# Fails when the wrapped block runs a different number of queries, e.g.
+#
+#   with assert_num_queries(db.engine, 2):
+#       client.get('/venues/1')
+@contextmanager
+def assert_num_queries(engine, expected):
+    with count_queries(engine) as counter:
+        yield counter
+    assert counter.count == expected, 'expected %d queries, got %d:\n%s' % (
+        expected, counter.count, '\n'.join(counter.statements))
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import app as fyyur, db, Venue, Artist, Show, search_cache, page_cache
+
+#----------------------------------------------------------------------------#
+# Fixtures.
+#
+# Each test gets the app on a fresh SQLite file with TESTING on, so repeated
+# statements raise RepeatedQueryError instead of being logged.
+#----------------------------------------------------------------------------#
+
+@pytest.fixture
+def app(tmp_path):
+    saved = dict(fyyur.config)
+    fyyur.config.update(
+        TESTING=True,
+        WTF_CSRF_ENABLED=False,
+        SQLALCHEMY_DATABASE_URI='sqlite:///' + str(tmp_path / 'fyyur.db'),
+        SLOW_QUERY_THRESHOLD_MS=None,
+        N_PLUS_ONE_THRESHOLD=10,
+    )
+    with fyyur.app_context():
+        db.create_all()
+        yield fyyur
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+    fyyur.config.clear()
+    fyyur.config.update(saved)
+    search_cache.clear()
+    page_cache.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+# Starting time of the shows the tests book, far enough ahead to be upcoming
+SOON = datetime(2100, 1, 1, 20)
+
+
+def add_venue(name='The Venue', **values):
+    venue = Venue(name=name, city='San Francisco', state='CA', **values)
+    db.session.add(venue)
+    db.session.commit()
+    return venue.id
+
+
+def add_artist(name='The Band', **values):
+    artist = Artist(name=name, city='San Francisco', state='CA', **values)
+    db.session.add(artist)
+    db.session.commit()
+    return artist.id
+
+
+def add_show(venue_id, artist_id, start_time=SOON, minutes=120):
+    show = Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time,
+                end_time=start_time + timedelta(minutes=minutes))
+    db.session.add(show)
+    db.session.commit()
+    return show.id
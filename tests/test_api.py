@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from app import app as fyyur, db, Genre, Artist
+from conftest import SOON, add_venue, add_artist, add_show
+
+#----------------------------------------------------------------------------#
+# /api/v1 lists pages of records with the fields asked for, or streams every
+# row as NDJSON.
+#----------------------------------------------------------------------------#
+
+def add_artists(*names):
+    return [add_artist(name) for name in names]
+
+
+def test_list_pages_through_cursors(client):
+    add_artists('a1', 'a2', 'a3')
+    first = client.get('/api/v1/artists?per_page=2&fields=name').get_json()
+    assert first['data'] == [{'name': 'a1'}, {'name': 'a2'}]
+    assert first['prev_cursor'] is None
+
+    second = client.get('/api/v1/artists?per_page=2&fields=name&after=' + first['next_cursor']).get_json()
+    assert second['data'] == [{'name': 'a3'}]
+    assert second['next_cursor'] is None
+
+    back = client.get('/api/v1/artists?per_page=2&fields=name&before=' + second['prev_cursor']).get_json()
+    assert back['data'] == first['data']
+
+
+def test_fields_pick_the_record_members(client):
+    artist_id = add_artist()
+    db.session.get(Artist, artist_id).genres = [Genre(name='Jazz')]
+    db.session.commit()
+    response = client.get('/api/v1/artists?fields=id,genres')
+    assert response.get_json()['data'] == [{'id': artist_id, 'genres': ['Jazz']}]
+
+    record = client.get('/api/v1/artists').get_json()['data'][0]
+    assert set(record) >= {'id', 'name', 'city', 'state', 'genres', 'updated_at', 'version'}
+
+
+@pytest.mark.parametrize('path', ['/api/v1/artists?fields=id,password', '/api/v1/shows?fields=genres',
+                                  '/api/v1/artists?after=not-a-cursor'])
+def test_bad_requests_are_rejected(client, path):
+    response = client.get(path)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_unknown_resource_is_not_found(client):
+    assert client.get('/api/v1/genres').status_code == 404
+
+
+@pytest.mark.parametrize('headers, query', [({}, '&stream=1'), ({'Accept': 'application/x-ndjson'}, '')])
+def test_stream_returns_every_row_as_ndjson(client, headers, query):
+    fyyur.config['API_STREAM_BATCH_SIZE'] = 2
+    add_artists('a1', 'a2', 'a3', 'a4', 'a5')
+    response = client.get('/api/v1/artists?fields=name,genres' + query, headers=headers)
+    assert response.mimetype == 'application/x-ndjson'
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert records == [{'name': 'a%d' % i, 'genres': []} for i in range(1, 6)]
+
+
+def test_stream_resumes_after_a_cursor(client):
+    add_artists('a1', 'a2', 'a3')
+    cursor = client.get('/api/v1/artists?per_page=1').get_json()['next_cursor']
+    response = client.get('/api/v1/artists?stream=1&fields=name&after=' + cursor)
+    assert response.get_data(as_text=True).splitlines() == ['{"name": "a2"}', '{"name": "a3"}']
+
+
+def test_shows_carry_their_venue_and_artist(client):
+    show_id = add_show(add_venue(), add_artist())
+    record = client.get('/api/v1/shows?fields=id,venue_name,artist_name,start_time').get_json()['data'][0]
+    assert record == {'id': show_id, 'venue_name': 'The Venue', 'artist_name': 'The Band',
+                      'start_time': SOON.isoformat()}
+
+
+def test_list_answers_if_none_match(client):
+    add_artist()
+    etag = client.get('/api/v1/artists').headers['ETag']
+    assert client.get('/api/v1/artists', headers={'If-None-Match': etag}).status_code == 304
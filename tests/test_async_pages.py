@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from app import page_cache
+from conftest import add_venue, add_artist
+
+pytest.importorskip('quart')
+pytest.importorskip('aiosqlite')
+
+#----------------------------------------------------------------------------#
+# The async read path serves the same pages, with the same statuses, as the
+# Flask views it stands in for.
+#----------------------------------------------------------------------------#
+
+def async_get(*paths):
+    import async_app
+
+    async def get_all():
+        async with async_app.app.test_app() as test_app:
+            client = test_app.test_client()
+            responses = []
+            for path in paths:
+                response = await client.get(path)
+                responses.append((response.status_code, await response.get_data(as_text=True)))
+            return responses
+    return asyncio.run(get_all())
+
+
+def test_detail_pages_match_the_flask_views(client):
+    venue_id = add_venue()
+    artist_id = add_artist()
+    paths = ['/venues/%d' % venue_id, '/artists/%d' % artist_id, '/venues/999', '/artists/999']
+
+    expected = [(response.status_code, response.get_data(as_text=True))
+                for response in map(client.get, paths)]
+    assert [status for status, body in expected] == [200, 200, 404, 404]
+    # rendered afresh, not served from the pages Flask cached
+    page_cache.clear()
+    assert async_get(*paths) == expected
@@ -0,0 +1,186 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db, Show, BookingError, book_show, free_slots
+from forms import MAX_SHOW_MINUTES
+from conftest import SOON, add_venue, add_artist, add_show
+
+#----------------------------------------------------------------------------#
+# Booking rejects shows overlapping another of their venue or artist, and
+# free_slots finds the gaps between a venue's shows.
+#----------------------------------------------------------------------------#
+
+DAY = datetime(2100, 6, 1)
+
+
+def at(hour, minute=0):
+    return DAY + timedelta(hours=hour, minutes=minute)
+
+
+@pytest.fixture
+def venue_id(app):
+    return add_venue()
+
+
+@pytest.fixture
+def artist_id(app):
+    return add_artist()
+
+
+def book(artist_id, venue_id, start_time, minutes=120):
+    show = book_show(artist_id, venue_id, start_time, minutes)
+    db.session.commit()
+    return show
+
+
+def test_overlapping_shows_are_rejected(venue_id, artist_id):
+    book(artist_id, venue_id, at(20))
+    other_artist, other_venue = add_artist('Other band'), add_venue('Other venue')
+
+    with pytest.raises(BookingError) as venue_clash:
+        book(other_artist, venue_id, at(21))
+    assert venue_clash.value.status == 409
+    assert venue_clash.value.messages[0].startswith('The venue is already booked')
+
+    with pytest.raises(BookingError) as artist_clash:
+        book(artist_id, other_venue, at(19), minutes=90)
+    assert artist_clash.value.status == 409
+    assert artist_clash.value.messages[0].startswith('The artist is already booked')
+    db.session.rollback()
+    assert Show.query.count() == 1
+
+
+def test_back_to_back_shows_are_accepted(venue_id, artist_id):
+    book(artist_id, venue_id, at(18))
+    book(artist_id, venue_id, at(20))
+    book(artist_id, venue_id, at(16), minutes=120)
+    assert Show.query.count() == 3
+
+
+def test_the_longest_show_reaches_into_the_next_slot(venue_id, artist_id):
+    book(artist_id, venue_id, at(8), minutes=MAX_SHOW_MINUTES)
+    with pytest.raises(BookingError) as clash:
+        book(add_artist('Late band'), venue_id, at(19, 59), minutes=60)
+    assert clash.value.status == 409
+    db.session.rollback()
+    book(add_artist('Later band'), venue_id, at(20), minutes=60)
+    assert Show.query.count() == 2
+
+
+def test_missing_venue_or_artist(venue_id, artist_id):
+    with pytest.raises(BookingError) as missing:
+        book(artist_id + 100, venue_id + 100, at(20))
+    assert missing.value.status == 404
+    assert missing.value.messages == ['There is no venue %d.' % (venue_id + 100),
+                                      'There is no artist %d.' % (artist_id + 100)]
+
+
+@pytest.mark.parametrize('minutes', [0, -30, MAX_SHOW_MINUTES + 1])
+def test_duration_out_of_range(venue_id, artist_id, minutes):
+    with pytest.raises(BookingError) as invalid:
+        book(artist_id, venue_id, at(20), minutes)
+    assert invalid.value.status == 400
+
+
+def test_free_slots(venue_id, artist_id):
+    add_show(venue_id, artist_id, at(6), minutes=7 * 60)
+    add_show(venue_id, artist_id, at(14), minutes=60)
+    add_show(venue_id, artist_id, at(15), minutes=60)
+    add_show(venue_id, artist_id, at(19), minutes=90)
+    # another venue's show does not take any of this one's time
+    add_show(add_venue('Elsewhere'), artist_id, at(22))
+
+    assert free_slots(venue_id, at(10), at(24), 60) == [(at(13), at(14)), (at(16), at(19)), (at(20, 30), at(24))]
+    assert free_slots(venue_id, at(10), at(24), 181) == [(at(20, 30), at(24))]
+    assert free_slots(venue_id, at(10), at(13), 30) == []
+    assert free_slots(venue_id, at(24), at(28), 60) == [(at(24), at(28))]
+
+#  Routes
+#  ----------------------------------------------------------------
+
+def show_form(venue_id, artist_id, start_time=SOON, **values):
+    form = {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S')}
+    form.update(values)
+    return form
+
+
+def test_create_show(client, venue_id, artist_id):
+    response = client.post('/shows/create', data=show_form(venue_id, artist_id, duration=90))
+    assert response.status_code == 302
+    show = Show.query.one()
+    assert show.end_time - show.start_time == timedelta(minutes=90)
+
+    response = client.post('/shows/create', data=show_form(venue_id, add_artist('Other'), SOON + timedelta(hours=1)))
+    assert response.status_code == 409
+    assert 'The venue is already booked' in response.get_data(as_text=True)
+
+    response = client.post('/shows/create', data=show_form(venue_id, artist_id, SOON + timedelta(minutes=90)))
+    assert response.status_code == 302
+    assert Show.query.count() == 2
+
+
+def test_create_show_defaults_the_duration(client, venue_id, artist_id):
+    assert client.post('/shows/create', data=show_form(venue_id, artist_id)).status_code == 302
+    show = Show.query.one()
+    assert show.end_time - show.start_time == timedelta(minutes=120)
+
+
+@pytest.mark.parametrize('values', [
+    {'duration': 'abc'},
+    {'duration': ''},
+    {'duration': '0'},
+    {'duration': str(MAX_SHOW_MINUTES + 1)},
+    {'start_time': 'soon'},
+    {'artist_id': ''},
+])
+def test_create_show_rejects_bad_input(client, venue_id, artist_id, values):
+    response = client.post('/shows/create', data=dict(show_form(venue_id, artist_id), **values))
+    assert response.status_code == 400
+    assert Show.query.count() == 0
+
+
+def test_create_show_for_a_missing_venue(client, venue_id, artist_id):
+    response = client.post('/shows/create', data=show_form(venue_id + 1, artist_id))
+    assert response.status_code == 404
+    assert 'There is no venue %d.' % (venue_id + 1) in response.get_data(as_text=True)
+
+
+def test_free_slots_endpoint(client, venue_id, artist_id):
+    add_show(venue_id, artist_id, at(12), minutes=240)
+    response = client.get('/api/v1/venues/%d/free-slots?from=2100-06-01&to=2100-06-01&min_duration=60' % venue_id)
+    assert response.status_code == 200
+    assert response.get_json() == {
+        'venue_id': venue_id,
+        'from': '2100-06-01T00:00:00',
+        'to': '2100-06-02T00:00:00',
+        'min_duration': 60,
+        'slots': [
+            {'start': '2100-06-01T00:00:00', 'end': '2100-06-01T12:00:00', 'minutes': 720},
+            {'start': '2100-06-01T16:00:00', 'end': '2100-06-02T00:00:00', 'minutes': 480},
+        ],
+    }
+
+
+@pytest.mark.parametrize('query', ['from=someday', 'from=2100-06-02&to=2100-06-01',
+                                   'from=2100-01-01&to=2100-12-31', 'min_duration=0'])
+def test_free_slots_endpoint_rejects_bad_ranges(client, venue_id, query):
+    assert client.get('/api/v1/venues/%d/free-slots?%s' % (venue_id, query)).status_code == 400
+
+
+@pytest.mark.parametrize('query, error', [
+    ('min_duration=abc', 'min_duration must be a whole number of minutes'),
+    ('from=someday', 'from and to must be dates or datetimes'),
+])
+def test_free_slots_endpoint_says_which_argument_is_malformed(client, venue_id, query, error):
+    response = client.get('/api/v1/venues/%d/free-slots?%s' % (venue_id, query))
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error}
+
+
+def test_free_slots_endpoint_ignores_the_show_filters(client, venue_id):
+    assert client.get('/api/v1/venues/%d/free-slots?venue_id=abc' % venue_id).status_code == 200
+
+
+def test_free_slots_of_a_missing_venue(client, venue_id):
+    assert client.get('/api/v1/venues/%d/free-slots' % (venue_id + 1)).status_code == 404
@@ -0,0 +1,26 @@
+import json
+
+from app import Artist, Show
+from conftest import add_venue, add_artist, add_show
+
+
+def delete(client, path, body):
+    return client.delete(path, data=json.dumps(body), content_type='application/json')
+
+
+def test_bulk_delete_cascades_to_shows(client):
+    venue_id = add_venue()
+    artist_ids = [add_artist('Band %d' % i) for i in range(3)]
+    for artist_id in artist_ids:
+        add_show(venue_id, artist_id)
+    response = delete(client, '/api/v1/artists', {'ids': artist_ids[:2]})
+    assert response.get_json() == {'deleted': 2}
+    assert [artist.id for artist in Artist.query] == artist_ids[2:]
+    assert Show.query.count() == 1
+
+
+def test_bulk_delete_needs_integer_ids(client):
+    add_artist()
+    for ids in ([True], [False], ['1'], [1.0], 1):
+        assert delete(client, '/api/v1/artists', {'ids': ids}).status_code == 400
+    assert Artist.query.count() == 1
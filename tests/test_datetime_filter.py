@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+import babel.dates
+import pytest
+
+from app import app as fyyur, DATETIME_FORMATS, format_datetime, format_datetime_cached
+
+#----------------------------------------------------------------------------#
+# The `datetime` template filter formats like babel.dates.format_datetime,
+# from a bounded cache of DATETIME_FILTER_CACHE_SIZE formatted values.
+#----------------------------------------------------------------------------#
+
+VALUES = [datetime(2019, 5, 21, 21, 30), datetime(2035, 4, 1, 20), datetime(2100, 12, 31, 0, 5)]
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    format_datetime_cached.cache_clear()
+    yield
+    format_datetime_cached.cache_clear()
+
+
+@pytest.mark.parametrize('value', VALUES)
+@pytest.mark.parametrize('format', ['full', 'medium', 'yyyy-MM-dd HH:mm'])
+@pytest.mark.parametrize('locale', ['en_US', 'fr_FR', None])
+def test_formats_like_babel(value, format, locale):
+    expected = babel.dates.format_datetime(value, DATETIME_FORMATS.get(format, format),
+                                           locale=locale or babel.dates.LC_TIME)
+    assert format_datetime(value, format, locale) == expected
+    # again, from the cache
+    assert format_datetime(value, format, locale) == expected
+    assert format_datetime(value.isoformat(), format, locale) == expected
+
+
+def test_cache_evicts_the_least_recently_used_value():
+    size = fyyur.config['DATETIME_FILTER_CACHE_SIZE']
+    assert format_datetime_cached.cache_info().maxsize == size
+    first = datetime(2100, 1, 1)
+    values = [first + timedelta(minutes=i) for i in range(size + 1)]
+    for value in values[:size]:
+        format_datetime(value, locale='en_US')
+    assert format_datetime_cached.cache_info().currsize == size
+
+    format_datetime(values[size], locale='en_US')
+    info = format_datetime_cached.cache_info()
+    assert info.currsize == size and info.misses == size + 1
+
+    format_datetime(values[size], locale='en_US')
+    assert format_datetime_cached.cache_info().hits == info.hits + 1
+    format_datetime(first, locale='en_US')
+    assert format_datetime_cached.cache_info().misses == size + 2
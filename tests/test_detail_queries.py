@@ -0,0 +1,67 @@
+import re
+from datetime import timedelta
+
+import pytest
+
+from app import db
+from testing import count_queries, assert_num_queries
+from conftest import SOON, add_venue, add_artist, add_show
+
+#----------------------------------------------------------------------------#
+# The venue and artist pages run a fixed number of queries however many
+# shows they list.
+#----------------------------------------------------------------------------#
+
+# Every other show a century in the past, so both sections are filled
+def show_time(i):
+    return SOON + timedelta(days=i - 36500 * (i % 2))
+
+
+# A venue with `shows` shows by as many artists
+def venue_with_shows(name, shows):
+    venue_id = add_venue(name)
+    for i in range(shows):
+        add_show(venue_id, add_artist('%s artist %d' % (name, i)), show_time(i))
+    return venue_id
+
+
+def artist_with_shows(name, shows):
+    artist_id = add_artist(name)
+    for i in range(shows):
+        add_show(add_venue('%s venue %d' % (name, i)), artist_id, show_time(i))
+    return artist_id
+
+
+@pytest.mark.parametrize('path, make', [
+    ('/venues/%d', venue_with_shows),
+    ('/artists/%d', artist_with_shows),
+])
+def test_detail_page_queries_do_not_grow_with_shows(client, path, make):
+    one = make('one', 1)
+    many = make('many', 200)
+    db.session.remove()
+
+    with count_queries(db.engine) as counter:
+        assert client.get(path % one).status_code == 200
+    with assert_num_queries(db.engine, counter.count):
+        response = client.get(path % many)
+    assert response.status_code == 200
+    assert response.get_data(as_text=True).count('many ') >= 200
+
+
+@pytest.mark.parametrize('path, make', [
+    ('/venues/%d', venue_with_shows),
+    ('/artists/%d', artist_with_shows),
+])
+def test_sections_are_truncated_but_counted_in_full(app, client, path, make):
+    entity_id = make('cut', 10)
+    listed = re.compile(r'cut (?:artist|venue) \d+')
+
+    body = client.get(path % entity_id + '?limit=2').get_data(as_text=True)
+    assert '5 Upcoming Shows' in body and '5 Past Shows' in body
+    assert len(listed.findall(body)) == 4
+
+    app.config['SHOWS_PER_SECTION'] = 3
+    body = client.get(path % entity_id).get_data(as_text=True)
+    assert '5 Upcoming Shows' in body and '5 Past Shows' in body
+    assert len(listed.findall(body)) == 6
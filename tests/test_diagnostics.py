@@ -0,0 +1,20 @@
+import pytest
+
+#----------------------------------------------------------------------------#
+# /metrics and /debug/* show SQL timings, cache counters and pool state; in
+# production they are not served unless EXPOSE_DIAGNOSTICS is on.
+#----------------------------------------------------------------------------#
+
+PATHS = ('/metrics', '/debug/cache', '/debug/pool')
+
+
+@pytest.mark.parametrize('path', PATHS)
+def test_diagnostics_are_served_when_exposed(app, client, path):
+    app.config['EXPOSE_DIAGNOSTICS'] = True
+    assert client.get(path).status_code == 200
+
+
+@pytest.mark.parametrize('path', PATHS)
+def test_diagnostics_are_not_found_in_production(app, client, path):
+    app.config.update(DEBUG=False, EXPOSE_DIAGNOSTICS=False)
+    assert client.get(path).status_code == 404
@@ -0,0 +1,34 @@
+from sqlalchemy.engine import make_url
+
+import config
+from app import db
+
+#----------------------------------------------------------------------------#
+# Engine options are chosen per database: pool settings for a server, none
+# for SQLite, whichever the primary is.
+#----------------------------------------------------------------------------#
+
+def test_engine_options_follow_the_database():
+    assert config.engine_options('sqlite:///fyyur.db') == {}
+    options = config.engine_options('postgresql://localhost/fyyur')
+    assert options['pool_size'] == config.DB_POOL_SIZE
+    assert options['pool_pre_ping']
+
+
+def test_replica_bind_takes_its_own_options(app, tmp_path):
+    replica = 'sqlite:///' + str(tmp_path / 'replica.db')
+    app.config.update(SQLALCHEMY_ENGINE_OPTIONS={'pool_size': 3, 'max_overflow': 2},
+                      SQLALCHEMY_BINDS={'replica_0': replica},
+                      SQLALCHEMY_BIND_ENGINE_OPTIONS={'replica_0': {'echo_pool': True}})
+    url, options = db.make_connector(app, 'replica_0').get_options(make_url(replica), False)
+    assert 'pool_size' not in options and 'max_overflow' not in options
+    assert options['echo_pool']
+
+    url, options = db.make_connector(app).get_options(make_url(replica), False)
+    assert (options['pool_size'], options['max_overflow']) == (3, 2)
+
+
+def test_pool_status(client):
+    stats = client.get('/debug/pool').get_json()
+    assert stats['class'] and stats['status']
+    assert 'replicas' not in stats
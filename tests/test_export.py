@@ -0,0 +1,89 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta
+
+from app import db, Venue, Artist, Show, Genre
+from conftest import add_venue, add_artist, add_show
+
+#----------------------------------------------------------------------------#
+# Catalog exports, from the `flask export` command and /export/<resource>.
+#----------------------------------------------------------------------------#
+
+def age(model, entity_id, days):
+    db.session.execute(model.__table__.update().where(model.id == entity_id)
+                       .values(updated_at=datetime.utcnow() - timedelta(days=days)))
+    db.session.commit()
+
+
+def test_csv_download(client):
+    artist_id = add_artist()
+    db.session.get(Artist, artist_id).genres = [Genre(name='Jazz'), Genre(name='Rock')]
+    db.session.commit()
+    response = client.get('/export/artists?format=csv&fields=id,name,genres')
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=artists.csv'
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows == [['id', 'name', 'genres'], [str(artist_id), 'The Band', 'Jazz,Rock']]
+
+
+def test_gzipped_jsonl_download(client):
+    add_venue('a1')
+    add_venue('a2')
+    response = client.get('/export/venues?gzip=1&fields=name')
+    assert response.mimetype == 'application/gzip'
+    lines = gzip.decompress(response.get_data()).decode().splitlines()
+    assert [json.loads(line) for line in lines] == [{'name': 'a1'}, {'name': 'a2'}]
+
+
+def test_download_since(client):
+    old_id = add_venue('Old')
+    add_venue('New')
+    age(Venue, old_id, 10)
+    since = (datetime.utcnow() - timedelta(days=1)).isoformat()
+    lines = client.get('/export/venues?fields=name&since=' + since).get_data(as_text=True).splitlines()
+    assert lines == ['{"name": "New"}']
+
+
+def test_bad_downloads_are_rejected(client):
+    assert client.get('/export/venues?format=xml').status_code == 400
+    assert client.get('/export/venues?fields=password').status_code == 400
+    assert client.get('/export/venues?since=soon').status_code == 400
+    assert client.get('/export/genres').status_code == 404
+
+
+def test_export_command(app, tmp_path):
+    old_id = add_artist('Old')
+    add_artist('New')
+    age(Artist, old_id, 10)
+    output = tmp_path / 'artists.jsonl.gz'
+    since = (datetime.utcnow() - timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%S')
+    result = app.test_cli_runner().invoke(args=['export', 'artists', '-o', str(output), '--fields', 'name',
+                                                '--since', since])
+    assert result.exit_code == 0, result.output
+    assert 'Next incremental export: --since ' in result.output
+    assert gzip.decompress(output.read_bytes()).decode().splitlines() == ['{"name": "New"}']
+
+
+def test_export_command_rejects_unknown_fields(app):
+    result = app.test_cli_runner().invoke(args=['export', 'artists', '--fields', 'password'])
+    assert result.exit_code != 0
+    assert 'unknown fields: password' in result.output
+
+
+def test_since_includes_shows_of_changed_venues_and_artists(client):
+    venue_id = add_venue()
+    artist_id = add_artist()
+    show_id = add_show(venue_id, artist_id)
+    since = datetime.utcnow()
+    for model, entity_id in ((Show, show_id), (Venue, venue_id), (Artist, artist_id)):
+        age(model, entity_id, 10)
+    path = '/export/shows?fields=id,venue_name&since=' + since.isoformat()
+    assert client.get(path).get_data(as_text=True) == ''
+
+    venue = db.session.get(Venue, venue_id)
+    venue.name = 'Renamed'
+    db.session.commit()
+    lines = client.get(path).get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == [{'id': show_id, 'venue_name': 'Renamed'}]
@@ -0,0 +1,62 @@
+import re
+
+import pytest
+
+from app import db, Venue, Artist, genres_from_names
+from conftest import add_venue, add_artist
+
+#----------------------------------------------------------------------------#
+# ?genre= narrows the venues and artists lists through the genre link
+# tables; counts and pages cover the matching rows only.
+#----------------------------------------------------------------------------#
+
+def add_with_genres(add, model, name, genres, **values):
+    entity_id = add(name)
+    entity = db.session.get(model, entity_id)
+    entity.genres = genres_from_names(genres)
+    for key, value in values.items():
+        setattr(entity, key, value)
+    db.session.commit()
+    return entity_id
+
+
+# The names listed on every page of a list, following its next links
+def all_pages(client, url):
+    pages = []
+    while url:
+        body = client.get(url).get_data(as_text=True)
+        pages.append(re.findall(r'<h5>([^<]+)</h5>', body))
+        link = re.search(r'<li class="next"><a href="([^"]+)"', body)
+        url = link and link.group(1).replace('&amp;', '&')
+    return pages
+
+
+@pytest.fixture
+def artists(app):
+    for i in range(5):
+        add_with_genres(add_artist, Artist, 'Jazz Band %d' % i, ['Jazz', 'Swing'] if i % 2 else ['Jazz'])
+    add_with_genres(add_artist, Artist, 'Rock Band', ['Rock n Roll'])
+
+
+def test_artists_by_genre(client, artists):
+    assert all_pages(client, '/artists?genre=Jazz&per_page=2') == \
+        [['Jazz Band 0', 'Jazz Band 1'], ['Jazz Band 2', 'Jazz Band 3'], ['Jazz Band 4']]
+    assert all_pages(client, '/artists?genre=Swing&per_page=2') == [['Jazz Band 1', 'Jazz Band 3']]
+    assert all_pages(client, '/artists?genre=Rock n Roll') == [['Rock Band']]
+    assert all_pages(client, '/artists?genre=Polka') == [[]]
+
+
+def test_venues_by_genre(client):
+    for i in range(3):
+        add_with_genres(add_venue, Venue, 'Jazz Hall %d' % i, ['Jazz'])
+    add_with_genres(add_venue, Venue, 'Oakland Jazz Club', ['Jazz', 'Blues'], city='Oakland')
+    add_with_genres(add_venue, Venue, 'Rock Hall', ['Rock n Roll'])
+
+    body = client.get('/venues?genre=Jazz').get_data(as_text=True)
+    assert re.findall(r'<h3>([^<]+) <small>(\d+)', body) == [('Oakland, CA', '1'), ('San Francisco, CA', '3')]
+    assert 'Rock Hall' not in body
+
+    assert all_pages(client, '/venues?genre=Jazz&per_page=1') == \
+        [['Oakland Jazz Club'], ['Jazz Hall 0', 'Jazz Hall 1', 'Jazz Hall 2']]
+    assert all_pages(client, '/venues?genre=Jazz&top=2') == [['Oakland Jazz Club', 'Jazz Hall 0', 'Jazz Hall 1']]
+    assert all_pages(client, '/venues?genre=Blues') == [['Oakland Jazz Club']]
@@ -0,0 +1,59 @@
+import logging
+import os
+
+import pytest
+from flask_migrate import upgrade, downgrade
+
+from app import app as fyyur, db
+
+#----------------------------------------------------------------------------#
+# Migration 5d18a6e0f3b2 moves the stringified genre lists of venues and
+# artists into the genres table and its link tables, and back on downgrade.
+#----------------------------------------------------------------------------#
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+BEFORE = 'e2a9c4f61d37'
+GENRES = '5d18a6e0f3b2'
+
+
+@pytest.fixture
+def database(tmp_path):
+    saved = dict(fyyur.config)
+    fyyur.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + str(tmp_path / 'migrated.db')
+    # alembic's logging setup disables the loggers it does not name
+    loggers = dict((name, logger.disabled) for name, logger in logging.root.manager.loggerDict.items()
+                   if isinstance(logger, logging.Logger))
+    with fyyur.app_context():
+        upgrade(directory=MIGRATIONS, revision=BEFORE)
+        yield db.engine
+        db.session.remove()
+        db.engine.dispose()
+    for name, disabled in loggers.items():
+        logging.getLogger(name).disabled = disabled
+    fyyur.config.clear()
+    fyyur.config.update(saved)
+
+
+def rows(engine, statement):
+    with engine.connect() as connection:
+        return [tuple(row) for row in connection.exec_driver_sql(statement)]
+
+
+def test_genre_lists_round_trip(database):
+    with database.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO venues (id, name, genres) VALUES "
+                                   "(1, 'Hall', '{Jazz,\"Rock n Roll\"}'), (2, 'Club', NULL), (3, 'Bar', '{}')")
+        connection.exec_driver_sql("INSERT INTO artists (id, name, genres) VALUES "
+                                   "(1, 'Band', '[''Jazz'', ''Folk'', ''Jazz'']')")
+
+    upgrade(directory=MIGRATIONS, revision=GENRES)
+    assert rows(database, 'SELECT name FROM genres ORDER BY name') == [('Folk',), ('Jazz',), ('Rock n Roll',)]
+    assert rows(database, 'SELECT l.venue_id, g.name FROM venue_genres l JOIN genres g ON g.id = l.genre_id '
+                          'ORDER BY l.venue_id, g.name') == [(1, 'Jazz'), (1, 'Rock n Roll')]
+    assert rows(database, 'SELECT l.artist_id, g.name FROM artist_genres l JOIN genres g ON g.id = l.genre_id '
+                          'ORDER BY l.artist_id, g.name') == [(1, 'Folk'), (1, 'Jazz')]
+
+    downgrade(directory=MIGRATIONS, revision=BEFORE)
+    assert rows(database, 'SELECT id, genres FROM venues ORDER BY id') == \
+        [(1, '{Jazz,"Rock n Roll"}'), (2, None), (3, None)]
+    assert rows(database, 'SELECT id, genres FROM artists ORDER BY id') == [(1, '{Folk,Jazz}')]
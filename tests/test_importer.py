@@ -0,0 +1,84 @@
+import json
+from datetime import timedelta
+
+import pytest
+
+from app import db, Show
+from importer import import_file
+from testing import count_queries
+from conftest import SOON, add_venue, add_artist, add_show
+
+#----------------------------------------------------------------------------#
+# Imported rows pass the same checks as the HTML forms; a row failing them is
+# rejected with its line number and nothing of it is written.
+#----------------------------------------------------------------------------#
+
+def write_jsonl(path, rows):
+    path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
+    return str(path)
+
+
+@pytest.mark.parametrize('start_time', [None, '', '   '])
+def test_show_without_a_start_time_is_rejected(app, tmp_path, start_time):
+    venue_id = add_venue()
+    artist_id = add_artist()
+    row = {'venue_id': venue_id, 'artist_id': artist_id}
+    if start_time is not None:
+        row['start_time'] = start_time
+    result = import_file('shows', write_jsonl(tmp_path / 'shows.jsonl', [row]))
+
+    assert result.imported == 0
+    assert [rejected['line'] for rejected in result.rejected] == [1]
+    assert 'start_time' in result.rejected[0]['errors']
+    assert Show.query.count() == 0
+
+
+def test_show_with_a_start_time_is_imported(app, tmp_path):
+    venue_id = add_venue()
+    artist_id = add_artist()
+    row = {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': '2100-01-01 20:00:00'}
+    result = import_file('shows', write_jsonl(tmp_path / 'shows.jsonl', [row]))
+
+    assert (result.imported, result.rejected) == (1, [])
+    assert Show.query.count() == 1
+
+
+def test_overlapping_shows_are_rejected(app, tmp_path):
+    venue_id = add_venue()
+    other_venue_id = add_venue('The Other Venue')
+    artist_id = add_artist()
+    other_artist_id = add_artist('The Other Band')
+    add_show(venue_id, artist_id, SOON)
+    rows = [
+        # clashes with the show already booked at the venue
+        {'venue_id': venue_id, 'artist_id': other_artist_id, 'start_time': str(SOON + timedelta(hours=1))},
+        # free, but the next row starts before it ends
+        {'venue_id': other_venue_id, 'artist_id': other_artist_id, 'start_time': str(SOON + timedelta(hours=4))},
+        {'venue_id': venue_id, 'artist_id': other_artist_id, 'start_time': str(SOON + timedelta(hours=5))},
+        # starts as the venue's show ends
+        {'venue_id': venue_id, 'artist_id': other_artist_id, 'start_time': str(SOON + timedelta(hours=2))},
+    ]
+    result = import_file('shows', write_jsonl(tmp_path / 'shows.jsonl', rows))
+
+    assert result.imported == 2
+    assert sorted((rejected['line'], sorted(rejected['errors'])) for rejected in result.rejected) == \
+        [(1, ['venue_id']), (3, ['artist_id'])]
+    assert Show.query.count() == 3
+
+
+def test_existing_bookings_are_read_once_per_batch(app, tmp_path):
+    rows = []
+    for i in range(30):
+        venue_id, artist_id = add_venue('Venue %d' % i), add_artist('Band %d' % i)
+        add_show(venue_id, artist_id, SOON + timedelta(days=i))
+        # every other row clashes with its venue's show
+        rows.append({'venue_id': venue_id, 'artist_id': add_artist('Guest %d' % i),
+                     'start_time': str(SOON + timedelta(days=i, hours=i % 2 * 3))})
+    with count_queries(db.engine) as counter:
+        result = import_file('shows', write_jsonl(tmp_path / 'shows.jsonl', rows), batch_size=10)
+
+    assert result.imported == 15
+    assert [rejected['line'] for rejected in result.rejected] == list(range(1, 31, 2))
+    booking_reads = [statement for statement in counter.statements
+                     if statement.lstrip().startswith('SELECT') and 'shows.end_time >' in statement]
+    assert len(booking_reads) == 2 * 3
@@ -0,0 +1,68 @@
+import re
+
+from app import Artist, artist_items_query, keyset_page
+from conftest import add_artist
+
+#----------------------------------------------------------------------------#
+# List pages seek past the sort key in their cursors, so rows inserted while
+# a client pages through neither repeat nor push back rows it has yet to see.
+#----------------------------------------------------------------------------#
+
+SORT = (Artist.name, Artist.id)
+
+
+def names(page):
+    return [row.name for row in page.items]
+
+
+def test_cursors_are_stable_across_inserts(app):
+    for name in ('a1', 'a3', 'a5', 'a7', 'a9'):
+        add_artist(name)
+    first = keyset_page(artist_items_query(), SORT, page_size=2)
+    assert names(first) == ['a1', 'a3']
+    assert first.prev_cursor is None
+
+    add_artist('a2')
+    second = keyset_page(artist_items_query(), SORT, after=first.next_cursor, page_size=2)
+    assert names(second) == ['a5', 'a7']
+
+    back = keyset_page(artist_items_query(), SORT, before=second.prev_cursor, page_size=2)
+    assert names(back) == ['a2', 'a3']
+    assert back.prev_cursor is not None
+
+    last = keyset_page(artist_items_query(), SORT, after=second.next_cursor, page_size=2)
+    assert names(last) == ['a9']
+    assert last.next_cursor is None
+
+
+def test_list_page_links_to_the_next_page(client):
+    for name in ('a1', 'a2', 'a3'):
+        add_artist(name)
+    body = client.get('/artists?per_page=2').get_data(as_text=True)
+    assert 'a2' in body and 'a3' not in body
+
+    next_url = re.search(r'<li class="next"><a href="([^"]+)"', body).group(1).replace('&amp;', '&')
+    body = client.get(next_url).get_data(as_text=True)
+    assert 'a3' in body and 'a2' not in body
+    assert 'class="next"' not in body
+
+
+def test_malformed_cursor_is_rejected(client):
+    assert client.get('/artists?after=not-a-cursor').status_code == 400
+
+
+def test_paging_across_null_names(app):
+    for name in (None, None, 'a1', 'a2'):
+        add_artist(name)
+    first = keyset_page(artist_items_query(), SORT, page_size=1)
+    assert names(first) == [None]
+
+    seen = names(first)
+    page = first
+    while page.next_cursor:
+        page = keyset_page(artist_items_query(), SORT, after=page.next_cursor, page_size=1)
+        seen += names(page)
+    assert seen == [None, None, 'a1', 'a2']
+
+    back = keyset_page(artist_items_query(), SORT, before=page.prev_cursor, page_size=2)
+    assert names(back) == [None, 'a1']
@@ -0,0 +1,69 @@
+import json
+
+from app import db, page_cache
+from testing import assert_num_queries
+from conftest import SOON, add_venue, add_artist
+
+#----------------------------------------------------------------------------#
+# Venue and artist pages are cached with a strong ETag, answered with 304
+# when the client has them, and dropped by writes to any row they show.
+#----------------------------------------------------------------------------#
+
+def patch(client, path, values):
+    return client.patch(path, data=json.dumps(values), content_type='application/json')
+
+
+def test_cached_page_is_served_without_queries(client):
+    venue_id = add_venue()
+    first = client.get('/venues/%d' % venue_id)
+    assert first.status_code == 200
+    assert first.headers['ETag'] and not first.headers['ETag'].startswith('W/')
+
+    with assert_num_queries(db.engine, 0):
+        second = client.get('/venues/%d' % venue_id)
+    assert second.get_data() == first.get_data()
+    assert second.headers['ETag'] == first.headers['ETag']
+
+
+def test_if_none_match_gets_a_304(client):
+    venue_id = add_venue()
+    etag = client.get('/venues/%d' % venue_id).headers['ETag']
+    response = client.get('/venues/%d' % venue_id, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert response.headers['ETag'] == etag
+
+    response = client.get('/venues/%d' % venue_id, headers={'If-None-Match': '"stale"'})
+    assert response.status_code == 200
+
+
+def test_edit_changes_the_etag_and_busts_the_page(client):
+    venue_id = add_venue()
+    etag = client.get('/venues/%d' % venue_id).headers['ETag']
+    assert patch(client, '/api/v1/venues/%d' % venue_id, {'name': 'Renamed', 'version': 1}).status_code == 200
+
+    response = client.get('/venues/%d' % venue_id, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert 'Renamed' in response.get_data(as_text=True)
+
+
+def test_editing_an_artist_busts_the_pages_of_its_venues(client):
+    venue_id = add_venue()
+    artist_id = add_artist()
+    response = client.post('/shows/create', data={'venue_id': venue_id, 'artist_id': artist_id,
+                                                   'start_time': SOON.strftime('%Y-%m-%d %H:%M:%S')})
+    assert response.status_code == 302
+    assert 'The Band' in client.get('/venues/%d' % venue_id).get_data(as_text=True)
+
+    assert patch(client, '/api/v1/artists/%d' % artist_id, {'name': 'Renamed Band', 'version': 1}).status_code == 200
+    assert 'Renamed Band' in client.get('/venues/%d' % venue_id).get_data(as_text=True)
+
+
+def test_pages_with_flashed_messages_are_not_cached(client):
+    response = client.post('/artists/create', data={'name': 'The Band', 'city': 'Oakland', 'state': 'CA'})
+    assert response.status_code == 302
+    body = client.get(response.headers['Location']).get_data(as_text=True)
+    assert 'was successfully listed' in body
+    assert page_cache.stats()['size'] == 0
+    assert 'was successfully listed' not in client.get(response.headers['Location']).get_data(as_text=True)
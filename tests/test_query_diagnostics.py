@@ -0,0 +1,54 @@
+import logging
+
+import pytest
+
+from app import db, Venue, query_diagnostics
+from instrumentation import RepeatedQueryError
+from conftest import add_venue
+
+#----------------------------------------------------------------------------#
+# A request running one query per row is flagged: raised with TESTING on,
+# logged otherwise.
+#----------------------------------------------------------------------------#
+
+# Run the request hooks around a loop of one query per venue, as a view with
+# an N+1 loop would
+def per_row_request(app, venue_ids, allow_repeats=False):
+    with app.test_request_context('/venues'):
+        app.preprocess_request()
+        if allow_repeats:
+            query_diagnostics.allow_repeated_statements()
+        for venue_id in venue_ids:
+            db.session.query(Venue.name).filter(Venue.id == venue_id).scalar()
+        return app.process_response(app.response_class())
+
+
+@pytest.fixture
+def venue_ids(app):
+    ids = [add_venue('Venue %d' % i) for i in range(app.config['N_PLUS_ONE_THRESHOLD'] + 2)]
+    db.session.remove()
+    return ids
+
+
+def test_per_row_queries_raise_in_tests(app, venue_ids):
+    with pytest.raises(RepeatedQueryError) as raised:
+        per_row_request(app, venue_ids)
+    message = str(raised.value)
+    assert 'Possible N+1 queries on venues' in message
+    assert '%d x SELECT venues.name' % len(venue_ids) in message
+    assert 'test_query_diagnostics.py' in message
+
+
+def test_queries_up_to_the_threshold_pass(app, venue_ids):
+    assert per_row_request(app, venue_ids[:app.config['N_PLUS_ONE_THRESHOLD']]).status_code == 200
+
+
+def test_allowed_repeats_pass(app, venue_ids):
+    assert per_row_request(app, venue_ids, allow_repeats=True).status_code == 200
+
+
+def test_per_row_queries_are_logged_outside_tests(app, venue_ids, caplog):
+    app.config['TESTING'] = False
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        assert per_row_request(app, venue_ids).status_code == 200
+    assert 'Possible N+1 queries on venues' in caplog.text
@@ -0,0 +1,81 @@
+import json
+import shutil
+
+import pytest
+
+from app import db, Venue, page_cache, database_router
+from conftest import add_venue
+
+#----------------------------------------------------------------------------#
+# With a replica configured, GET requests read from it and writes go to the
+# primary; a client that just wrote reads from the primary too until the lag
+# window ends. The replica here is a copy of the primary's SQLite file taken
+# before the writes, so it lags behind them for good.
+#----------------------------------------------------------------------------#
+
+@pytest.fixture
+def replica(app, tmp_path):
+    venue_id = add_venue('Old Name')
+    db.session.remove()
+    primary = app.config['SQLALCHEMY_DATABASE_URI'][len('sqlite:///'):]
+    shutil.copy(primary, str(tmp_path / 'replica.db'))
+    app.config.update(SQLALCHEMY_BINDS={'replica_0': 'sqlite:///' + str(tmp_path / 'replica.db')},
+                      REPLICA_BINDS=['replica_0'])
+    database_router.last_write = None
+    yield venue_id
+    db.session.remove()
+    db.get_engine(app, bind='replica_0').dispose()
+    database_router.last_write = None
+
+
+def rename_on_primary(venue_id, name):
+    db.session.get(Venue, venue_id).name = name
+    db.session.commit()
+    db.session.remove()
+
+
+def venue_page(client, venue_id):
+    page_cache.clear()
+    return client.get('/venues/%d' % venue_id).get_data(as_text=True)
+
+
+def test_get_reads_the_replica(client, replica):
+    rename_on_primary(replica, 'New Name')
+    body = venue_page(client, replica)
+    assert 'Old Name' in body and 'New Name' not in body
+
+
+def test_edit_form_reads_the_primary(client, replica):
+    rename_on_primary(replica, 'New Name')
+    assert 'New Name' in client.get('/venues/%d/edit' % replica).get_data(as_text=True)
+
+
+def test_get_after_a_write_reads_the_primary(app, client, replica):
+    response = client.patch('/api/v1/venues/%d' % replica, data=json.dumps({'name': 'New Name', 'version': 1}),
+                            content_type='application/json')
+    assert response.status_code == 200
+    assert app.config['REPLICA_PIN_COOKIE'] in response.headers['Set-Cookie']
+    assert 'max-age=%d' % app.config['REPLICA_LAG_WINDOW'] in response.headers['Set-Cookie'].lower()
+
+    assert 'New Name' in venue_page(client, replica)
+    # a client that did not write still reads the replica, and what it reads
+    # is not cached while the replica may lag behind the write
+    other_client = app.test_client()
+    assert 'Old Name' in venue_page(other_client, replica)
+    assert page_cache.stats()['size'] == 0
+
+
+def test_search_posts_read_the_replica(client, replica):
+    rename_on_primary(replica, 'New Name')
+    response = client.post('/venues/search', data={'search_term': 'old'})
+    assert 'Set-Cookie' not in response.headers
+    assert 'Old Name' in response.get_data(as_text=True)
+
+
+def test_search_uses_the_name_index_of_the_replica(app, client, replica):
+    replica_engine = db.get_engine(app, bind='replica_0')
+    with replica_engine.begin() as connection:
+        connection.exec_driver_sql('DROP TABLE IF EXISTS venues_name_fts')
+    response = client.post('/venues/search', data={'search_term': 'old'})
+    assert response.status_code == 200
+    assert 'Old Name' in response.get_data(as_text=True)
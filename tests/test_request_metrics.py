@@ -0,0 +1,72 @@
+import re
+
+from app import db
+from testing import count_queries
+from conftest import add_artist
+
+#----------------------------------------------------------------------------#
+# /metrics exposes per-endpoint histograms in the Prometheus text format, and
+# in debug mode each response reports its query count and timings.
+#----------------------------------------------------------------------------#
+
+SAMPLE = re.compile(r'^([a-z_]+)\{([^}]*)\} (\S+)$')
+SERVER_TIMING = re.compile(r'^db;dur=(\d+\.\d);desc="(\d+) queries", render;dur=(\d+\.\d), total;dur=(\d+\.\d)$')
+
+
+# {(name, labels): value} of every sample of the exposition
+def scrape(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    samples = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if line.startswith('#'):
+            assert re.match(r'^# (HELP|TYPE) fyyur_[a-z_]+ ', line), line
+            continue
+        name, labels, value = SAMPLE.match(line).groups()
+        samples[(name, labels)] = float(value)
+    return samples
+
+
+def test_metrics_exposition(client):
+    add_artist()
+    client.get('/artists')
+    client.get('/artists')
+    body = client.get('/metrics').get_data(as_text=True)
+    for name in ('fyyur_request_duration_seconds', 'fyyur_request_queries',
+                 'fyyur_request_sql_seconds', 'fyyur_request_render_seconds'):
+        assert '# TYPE %s histogram' % name in body
+
+    samples = scrape(client)
+    labels = 'endpoint="artists"'
+    buckets = [value for (name, sample_labels), value in samples.items()
+               if name == 'fyyur_request_queries_bucket' and sample_labels.startswith(labels + ',')]
+    assert buckets == sorted(buckets)
+    count = samples[('fyyur_request_queries_count', labels)]
+    assert count >= 2
+    assert samples[('fyyur_request_queries_bucket', labels + ',le="+Inf"')] == count
+    assert samples[('fyyur_request_queries_sum', labels)] >= count
+    assert samples[('fyyur_request_duration_seconds_count', labels + ',method="GET"')] == count
+
+    client.get('/artists')
+    assert scrape(client)[('fyyur_request_queries_count', labels)] == count + 1
+
+
+def test_debug_headers_report_the_queries_of_the_request(app, client):
+    app.config['DEBUG'] = True
+    add_artist()
+    db.session.remove()
+    with count_queries(db.engine) as counter:
+        response = client.get('/artists')
+    assert int(response.headers['X-Query-Count']) == counter.count > 0
+
+    sql, queries, render, total = SERVER_TIMING.match(response.headers['Server-Timing']).groups()
+    assert int(queries) == counter.count
+    assert float(sql) <= float(total) and float(render) <= float(total)
+
+
+def test_no_debug_headers_outside_debug_mode(app, client):
+    app.config['DEBUG'] = False
+    response = client.get('/artists')
+    assert 'X-Query-Count' not in response.headers
+    assert 'Server-Timing' not in response.headers
@@ -0,0 +1,57 @@
+import pytest
+
+from app import db, Venue, Artist, search_by_name, has_name_fts, name_fts_engines
+from testing import assert_num_queries
+from conftest import add_venue, add_artist
+
+#----------------------------------------------------------------------------#
+# Name searches return their first SEARCH_RESULT_LIMIT matches with the total
+# from one query, through the FTS5 trigram index on SQLite when there is one
+# and a LIKE scan otherwise.
+#----------------------------------------------------------------------------#
+
+NAMES = ['The Band', 'band of gold', 'Husband', 'Bandana Republic', 'The Hall', 'Saint BANDIT', 'Old Time Jazz']
+
+
+@pytest.fixture
+def limit(app):
+    app.config['SEARCH_RESULT_LIMIT'] = 3
+    for name in NAMES:
+        add_artist(name)
+    db.session.remove()
+    return 3
+
+
+def test_total_and_first_matches_come_from_one_query(limit):
+    # whether the database has the name index is looked up once per engine
+    has_name_fts(db.engine)
+    with assert_num_queries(db.engine, 1):
+        total, data = search_by_name(Artist, 'band')
+    assert total == 5
+    assert [artist['name'] for artist in data] == ['Bandana Republic', 'Husband', 'Saint BANDIT']
+
+
+@pytest.mark.parametrize('model, add', [(Artist, add_artist), (Venue, add_venue)])
+@pytest.mark.parametrize('search_term', ['band', 'BAN', 'e b', 'jazz', 'nothing', 'a'])
+def test_name_index_and_like_scan_find_the_same_names(app, model, add, search_term):
+    for name in NAMES:
+        add(name)
+    if not has_name_fts(db.engine):
+        pytest.skip('this SQLite has no FTS5 trigram tokenizer')
+    with_index = search_by_name(model, search_term)
+
+    name_fts_engines[db.engine] = False
+    try:
+        assert search_by_name(model, search_term) == with_index
+    finally:
+        name_fts_engines.pop(db.engine, None)
+
+
+def test_search_page_says_when_it_shows_only_the_first_matches(client, limit):
+    body = client.post('/artists/search', data={'search_term': 'band'}).get_data(as_text=True)
+    assert 'Number of search results for "band": 5' in body
+    assert 'Showing the first 3 results.' in body
+
+    body = client.post('/artists/search', data={'search_term': 'jazz'}).get_data(as_text=True)
+    assert 'Number of search results for "jazz": 1' in body
+    assert 'Showing the first' not in body
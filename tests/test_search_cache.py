@@ -0,0 +1,56 @@
+import json
+
+from app import db, search_cache
+from testing import assert_num_queries
+from conftest import add_venue, add_artist
+
+#----------------------------------------------------------------------------#
+# Searches are cached per entity type and normalized term, and any write to
+# that type of entity drops them.
+#----------------------------------------------------------------------------#
+
+def search(client, resource, search_term):
+    response = client.post('/%s/search' % resource, data={'search_term': search_term})
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    return int(body.split('": ', 1)[1].split('<', 1)[0])
+
+
+def test_terms_differing_in_case_and_spacing_share_an_entry(client):
+    add_artist('The Band')
+    assert search(client, 'artists', 'band') == 1
+    with assert_num_queries(db.engine, 0):
+        assert search(client, 'artists', '  BAND ') == 1
+    assert search_cache.stats()['size'] == 1
+
+
+def test_creating_an_artist_drops_the_artist_searches(client):
+    add_artist('The Band')
+    add_venue('The Band Room')
+    assert search(client, 'artists', 'band') == 1
+    assert search(client, 'venues', 'band') == 1
+
+    response = client.post('/artists/create', data={'name': 'Band Two', 'city': 'Oakland', 'state': 'CA'})
+    assert response.status_code == 302
+    assert search(client, 'artists', 'band') == 2
+    # venue searches are left alone
+    with assert_num_queries(db.engine, 0):
+        assert search(client, 'venues', 'band') == 1
+
+
+def test_renaming_a_venue_drops_the_venue_searches(client):
+    venue_id = add_venue('The Band Room')
+    assert search(client, 'venues', 'band') == 1
+    response = client.patch('/api/v1/venues/%d' % venue_id, data=json.dumps({'name': 'The Hall', 'version': 1}),
+                            content_type='application/json')
+    assert response.status_code == 200
+    assert search(client, 'venues', 'band') == 0
+    assert search(client, 'venues', 'hall') == 1
+
+
+def test_deleting_artists_drops_the_artist_searches(client):
+    artist_id = add_artist('The Band')
+    assert search(client, 'artists', 'band') == 1
+    response = client.delete('/api/v1/artists', data=json.dumps({'ids': [artist_id]}), content_type='application/json')
+    assert response.get_json() == {'deleted': 1}
+    assert search(client, 'artists', 'band') == 0
@@ -0,0 +1,21 @@
+from app import db, Show
+from seed import generate_catalog
+
+#----------------------------------------------------------------------------#
+# The synthetic catalog never double books a venue or an artist, also when
+# it adds shows to venues and artists that already have some.
+#----------------------------------------------------------------------------#
+
+def overlaps(column):
+    other = db.aliased(Show)
+    return db.session.query(db.func.count()).select_from(Show).join(other, db.and_(
+        column == getattr(other, column.key), Show.id < other.id,
+        Show.start_time < other.end_time, other.start_time < Show.end_time)).scalar()
+
+
+def test_seeding_onto_existing_bookings(app):
+    generate_catalog(2, 2, 1000, seed=1)
+    generate_catalog(0, 0, 1000, seed=2)
+    assert db.session.query(db.func.count(Show.id)).scalar() == 2000
+    assert overlaps(Show.venue_id) == 0
+    assert overlaps(Show.artist_id) == 0
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from app import show_filters
+
+
+def test_show_filters():
+    filters = show_filters(MultiDict({'from': '2026-10-17', 'to': '2026-10-18', 'venue_id': '3', 'city': 'Oakland'}))
+    assert filters == {'start': datetime(2026, 10, 17), 'end': datetime(2026, 10, 19),
+                       'venue_id': 3, 'artist_id': None, 'city': 'Oakland'}
+
+
+@pytest.mark.parametrize('args, error', [
+    ({'venue_id': 'abc'}, 'venue_id and artist_id'),
+    ({'artist_id': '1.5'}, 'venue_id and artist_id'),
+    ({'from': 'soon'}, 'from and to'),
+])
+def test_malformed_show_filters(args, error):
+    with pytest.raises(ValueError, match=error):
+        show_filters(MultiDict(args))
+
+
+@pytest.mark.parametrize('path', ['/shows', '/shows/calendar'])
+def test_malformed_show_filters_are_rejected(client, path):
+    assert client.get(path + '?venue_id=abc').status_code == 400
+    assert client.get(path + '?artist_id=abc').status_code == 400
+    assert client.get(path + '?venue_id=1').status_code == 200
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+from app import app as fyyur, db
+from testing import assert_num_queries
+from conftest import add_venue, add_artist, add_show
+
+
+def test_calendar_lists_the_first_shows_of_each_day(client):
+    per_day = fyyur.config['CALENDAR_SHOWS_PER_DAY']
+    venue_id = add_venue()
+    busy = datetime(2100, 3, 14, 12)
+    for i in range(per_day + 3):
+        add_show(venue_id, add_artist('Busy %d' % i), busy + timedelta(minutes=30 * i), minutes=30)
+    add_show(venue_id, add_artist('Quiet'), datetime(2100, 3, 15, 20))
+    add_show(venue_id, add_artist('Next month'), datetime(2100, 4, 1, 20))
+    db.session.remove()
+
+    with assert_num_queries(db.engine, 3):
+        response = client.get('/shows/calendar?month=2100-03')
+    page = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert [name for name in ('Busy %d' % i for i in range(per_day + 3)) if name + '<' in page] == \
+        ['Busy %d' % i for i in range(per_day)]
+    assert '+3 more' in page
+    assert 'Quiet' in page
+    assert 'Next month' not in page
+
+
+def test_calendar_of_this_month_is_modified_when_the_month_changes(client, monkeypatch):
+    class Now(datetime):
+        now = datetime(2100, 3, 31, 23)
+
+        @classmethod
+        def utcnow(cls):
+            return cls.now
+
+    monkeypatch.setattr('app.datetime', Now)
+    add_show(add_venue(), add_artist(), datetime(2000, 1, 1, 20))
+
+    response = client.get('/shows/calendar')
+    assert 'March' in response.get_data(as_text=True)
+    headers = {'If-None-Match': response.headers['ETag'], 'If-Modified-Since': response.headers['Last-Modified']}
+    assert client.get('/shows/calendar', headers=headers).status_code == 304
+
+    Now.now = datetime(2100, 4, 1, 0, 5)
+    response = client.get('/shows/calendar', headers=headers)
+    assert response.status_code == 200
+    assert 'April' in response.get_data(as_text=True)
+    headers = {'If-Modified-Since': response.headers['Last-Modified']}
+    assert client.get('/shows/calendar', headers=headers).status_code == 304
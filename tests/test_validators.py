@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from app import db, Venue, Genre, page_cache
+from conftest import add_venue, add_artist
+
+#----------------------------------------------------------------------------#
+# Every write to a venue or artist moves its updated_at and version, which
+# drive the Last-Modified and ETag headers of the pages showing it.
+#----------------------------------------------------------------------------#
+
+def test_genre_only_change_moves_updated_at_and_version(app):
+    venue_id = add_venue()
+    venue = db.session.get(Venue, venue_id)
+    updated_at, version = venue.updated_at, venue.version
+
+    venue.genres = [Genre(name='Jazz')]
+    db.session.commit()
+    assert venue.updated_at > updated_at
+    assert venue.version == version + 1
+
+
+def test_list_page_answers_if_none_match_with_its_weak_etag(client):
+    add_artist()
+    response = client.get('/artists')
+    etag = response.headers['ETag']
+    assert etag.startswith('W/')
+    assert response.last_modified is not None
+
+    assert client.get('/artists', headers={'If-None-Match': etag}).status_code == 304
+    # another query string is another page
+    assert client.get('/artists?per_page=5', headers={'If-None-Match': etag}).status_code == 200
+
+    add_artist('Another Band')
+    response = client.get('/artists', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_detail_page_answers_if_modified_since(client):
+    venue_id = add_venue()
+    last_modified = client.get('/venues/%d' % venue_id).last_modified
+    assert last_modified is not None
+    # the view itself answers, not only the cached page
+    page_cache.clear()
+
+    headers = {'If-Modified-Since': last_modified.strftime('%a, %d %b %Y %H:%M:%S GMT')}
+    assert client.get('/venues/%d' % venue_id, headers=headers).status_code == 304
+
+    earlier = last_modified - timedelta(seconds=10)
+    headers = {'If-Modified-Since': earlier.strftime('%a, %d %b %Y %H:%M:%S GMT')}
+    assert client.get('/venues/%d' % venue_id, headers=headers).status_code == 200
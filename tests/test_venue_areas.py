@@ -0,0 +1,43 @@
+import re
+
+from app import db, Venue
+from conftest import add_venue
+
+#----------------------------------------------------------------------------#
+# The venues page groups venues by city/state in the database; venues
+# without a city or state get an area of their own instead of disappearing.
+#----------------------------------------------------------------------------#
+
+def add_unplaced_venue(name, **values):
+    venue = Venue(name=name, **values)
+    db.session.add(venue)
+    db.session.commit()
+    return venue.id
+
+
+def test_venue_without_a_city_is_listed(client):
+    add_venue('Known Hall')
+    add_unplaced_venue('Nowhere Hall', state='CA')
+    add_unplaced_venue('Nowhere Club')
+
+    for path in ('/venues', '/venues?top=5'):
+        body = client.get(path).get_data(as_text=True)
+        assert 'Known Hall' in body
+        assert 'Nowhere Hall' in body
+        assert 'Nowhere Club' in body
+        assert len(re.findall(r'<h3>', body)) == 3
+
+
+def test_paging_through_areas_without_a_city(client):
+    add_venue('Known Hall')
+    add_unplaced_venue('Nowhere Hall', state='CA')
+    add_unplaced_venue('Nowhere Club')
+
+    seen = []
+    url = '/venues?per_page=1'
+    while url:
+        body = client.get(url).get_data(as_text=True)
+        seen += re.findall(r'<h5>([^<]+)</h5>', body)
+        link = re.search(r'<li class="next"><a href="([^"]+)"', body)
+        url = link and link.group(1).replace('&amp;', '&')
+    assert sorted(seen) == ['Known Hall', 'Nowhere Club', 'Nowhere Hall']
@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+from app import db, Venue, Artist, Genre
+from conftest import add_venue, add_artist
+
+#----------------------------------------------------------------------------#
+# Edits are one UPDATE guarded by the version the editor loaded: a stale
+# version gets a 409 and nothing is written or inserted.
+#----------------------------------------------------------------------------#
+
+def venue_form(version, **values):
+    form = {'name': 'The Venue', 'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St',
+            'phone': '', 'genres': ['Jazz'], 'version': version}
+    form.update(values)
+    return form
+
+
+def patch(client, path, values, **headers):
+    return client.patch(path, data=json.dumps(values), content_type='application/json', headers=headers)
+
+
+def test_edit_updates_the_row_in_place(client):
+    venue_id = add_venue()
+    response = client.post('/venues/%d/edit' % venue_id, data=venue_form(1, name='Renamed'))
+    assert response.status_code == 302
+
+    venue = db.session.get(Venue, venue_id)
+    assert (venue.name, venue.version) == ('Renamed', 2)
+    assert [genre.name for genre in venue.genres] == ['Jazz']
+    assert Venue.query.count() == 1
+
+
+def test_edit_of_a_stale_version_conflicts(client):
+    venue_id = add_venue()
+    assert client.post('/venues/%d/edit' % venue_id, data=venue_form(1, name='First')).status_code == 302
+    response = client.post('/venues/%d/edit' % venue_id, data=venue_form(1, name='Second'))
+    assert response.status_code == 409
+    assert 'was changed while you were editing it' in response.get_data(as_text=True)
+
+    db.session.remove()
+    venue = db.session.get(Venue, venue_id)
+    assert (venue.name, venue.version) == ('First', 2)
+    assert Venue.query.count() == 1
+
+
+def test_artist_edit_of_a_stale_version_conflicts(client):
+    artist_id = add_artist()
+    form = {'name': 'Renamed', 'city': 'San Francisco', 'state': 'CA', 'phone': '', 'genres': ['Jazz']}
+    assert client.post('/artists/%d/edit' % artist_id, data=dict(form, version=1)).status_code == 302
+    assert client.post('/artists/%d/edit' % artist_id, data=dict(form, version=1)).status_code == 409
+    assert Artist.query.count() == 1
+
+
+def test_patch_with_if_match(client):
+    venue_id = add_venue()
+    response = patch(client, '/api/v1/venues/%d' % venue_id, {'name': 'Renamed'}, **{'If-Match': '"1"'})
+    assert response.status_code == 200
+    assert response.headers['ETag'] == '"2"'
+    assert response.get_json()['name'] == 'Renamed'
+
+    response = patch(client, '/api/v1/venues/%d' % venue_id, {'name': 'Stale'}, **{'If-Match': '"1"'})
+    assert response.status_code == 409
+    db.session.remove()
+    assert db.session.get(Venue, venue_id).name == 'Renamed'
+    assert Venue.query.count() == 1
+
+
+def test_patch_with_version_member(client):
+    venue_id = add_venue()
+    assert patch(client, '/api/v1/venues/%d' % venue_id, {'name': 'Renamed', 'version': 1}).status_code == 200
+    assert patch(client, '/api/v1/venues/%d' % venue_id, {'name': 'Stale', 'version': 1}).status_code == 409
+
+
+def test_patch_needs_a_version(client):
+    venue_id = add_venue()
+    assert patch(client, '/api/v1/venues/%d' % venue_id, {'name': 'Renamed'}).status_code == 428
+
+
+def test_patch_genres_must_be_a_list_of_names(client):
+    venue_id = add_venue()
+    for genres in ('Jazz', [1], {'Jazz': True}):
+        response = patch(client, '/api/v1/venues/%d' % venue_id, {'genres': genres, 'version': 1})
+        assert response.status_code == 400
+    assert Genre.query.count() == 0
+
+    response = patch(client, '/api/v1/venues/%d' % venue_id, {'genres': ['Jazz'], 'version': 1})
+    assert response.status_code == 200
+    assert response.get_json()['genres'] == ['Jazz']
+
+
+@pytest.mark.parametrize('values', [{'name': None}, {'name': ''}, {'city': None, 'state': None}])
+def test_patch_cannot_blank_a_required_field(client, values):
+    venue_id = add_venue()
+    response = patch(client, '/api/v1/venues/%d' % venue_id, dict(values, version=1))
+    assert response.status_code == 400
+    assert set(response.get_json()['errors']) == set(values)
+
+    db.session.remove()
+    venue = db.session.get(Venue, venue_id)
+    assert (venue.name, venue.city, venue.state, venue.version) == ('The Venue', 'San Francisco', 'CA', 1)
+
+
+def test_patch_leaves_out_fields_it_does_not_send(client):
+    venue_id = add_venue()
+    response = patch(client, '/api/v1/venues/%d' % venue_id, {'phone': '', 'version': 1})
+    assert response.status_code == 200
+    assert response.get_json()['city'] == 'San Francisco'